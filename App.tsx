@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { Task } from './types';
+import { Task, TaskEvent } from './types';
 import { AddTodoForm } from './components/AddTodoForm';
 import { TodoList } from './components/TodoList';
 import { GlobalStyles } from './Styles';
@@ -7,17 +7,25 @@ import { apiService } from './api';
 
 const App: React.FC = () => {
   const [tasks, setTasks] = useState<Task[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  // Fetch all tasks on component mount
+  // Replace the list with the newest page; older ones are fetched by loadMoreTasks
+  const loadFirstPage = async () => {
+    const page = await apiService.getTasksPage();
+    setTasks(page.tasks);
+    setNextCursor(page.nextCursor);
+  };
+
+  // Fetch the first page of tasks on component mount
   useEffect(() => {
     const fetchTasks = async () => {
       try {
         setLoading(true);
         setError(null);
-        const fetchedTasks = await apiService.getAllTasks();
-        setTasks(fetchedTasks);
+        await loadFirstPage();
       } catch (err) {
         setError('Failed to load tasks. Please check if the server is running.');
         console.error('Error fetching tasks:', err);
@@ -29,6 +37,33 @@ const App: React.FC = () => {
     fetchTasks();
   }, []);
 
+  // Apply pushed changes instead of re-fetching the whole list after every mutation
+  useEffect(() => {
+    const applyEvent = async (event: TaskEvent) => {
+      if (event.op === 'RESYNC' || event.truncated) {
+        try {
+          await loadFirstPage();
+        } catch (err) {
+          console.error('Error re-syncing tasks:', err);
+        }
+        return;
+      }
+      const changed = event.task!;
+      if (event.op === 'DELETE') {
+        setTasks(prevTasks => prevTasks.filter(task => task.id !== changed.id));
+        return;
+      }
+      setTasks(prevTasks => {
+        if (prevTasks.some(task => task.id === changed.id)) {
+          return prevTasks.map(task => task.id === changed.id ? { ...task, ...changed } : task);
+        }
+        return [changed as Task, ...prevTasks];
+      });
+    };
+
+    return apiService.subscribeToTasks(applyEvent);
+  }, []);
+
   const addTask = async (description: string) => {
     // Create optimistic task with temporary ID
     const tempTask: Task = {
@@ -46,11 +81,15 @@ const App: React.FC = () => {
 
     try {
       setError(null);
-      const realTaskId = await apiService.createTask(description, 'NEW', 0);
+      const realTaskId = await apiService.createTaskStreaming(description, (plan) => {
+        // show the action while the model is still writing it
+        setTasks(prevTasks => prevTasks.map(task => task.id === tempTask.id ? { ...task, action: plan } : task));
+      });
       
-      // Replace with real data from backend
-      const updatedTasks = await apiService.getAllTasks();
-      setTasks(updatedTasks);
+      // Swap in the real id; the INSERT event fills in the rest (and may already have arrived)
+      setTasks(prevTasks => prevTasks.some(task => task.id === realTaskId)
+        ? prevTasks.filter(task => task.id !== tempTask.id)
+        : prevTasks.map(task => task.id === tempTask.id ? { ...task, id: realTaskId } : task));
     } catch (err) {
       // Remove temp task on error
       setTasks(prevTasks => prevTasks.filter(task => task.id !== tempTask.id));
@@ -60,9 +99,27 @@ const App: React.FC = () => {
   };
 
   const handleRefreshTasks = async () => {
-    // Your existing code to fetch tasks
-    const freshTasks = await apiService.getAllTasks();
-    setTasks(freshTasks);
+    await loadFirstPage();
+  };
+
+  const loadMoreTasks = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      setError(null);
+      const page = await apiService.getTasksPage(undefined, nextCursor);
+      // pushed INSERT events may already have added some of these
+      setTasks(prevTasks => {
+        const known = new Set(prevTasks.map(task => task.id));
+        return [...prevTasks, ...page.tasks.filter(task => !known.has(task.id))];
+      });
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      setError('Failed to load more tasks.');
+      console.error('Error loading more tasks:', err);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const deleteTask = async (id: number) => {
@@ -198,6 +255,18 @@ const App: React.FC = () => {
               onRefreshTasks={handleRefreshTasks}
             />
           </div>
+
+          {nextCursor && (
+            <div className="text-center">
+              <button
+                onClick={loadMoreTasks}
+                disabled={loadingMore}
+                className="px-4 py-2 text-sm font-medium text-slate-300 bg-slate-800 border border-slate-700 rounded-lg hover:bg-slate-700 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </main>
 
         <footer className="text-center mt-12 text-slate-600 text-sm">
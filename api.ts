@@ -1,7 +1,15 @@
-import { Task, TaskRequest, ApiResponse } from './types';
+import { Task, TaskRequest, TaskPage, TaskEvent, BatchOutcome, ApiResponse } from './types';
 
 const API_BASE_URL = 'http://localhost:8000';
 
+// columns the task list renders; leaves out the (large) action payload
+const LIST_FIELDS = ['id', 'description', 'status', 'progress', 'created_at', 'updated_at'];
+// tasks per /all page; later pages are only fetched when the user asks for more
+const PAGE_SIZE = 50;
+
+// after the event stream reconnects, wait this long before re-fetching the list
+const RESYNC_DELAY_MS = 1000;
+
 class ApiService {
   private async request<T>(endpoint: string, options: RequestInit = {}): Promise<ApiResponse<T>> {
     const url = `${API_BASE_URL}${endpoint}`;
@@ -29,9 +37,13 @@ class ApiService {
     }
   }
 
-  async getAllTasks(): Promise<Task[]> {
-    const response = await this.request<Task[]>('/all');
-    return response.content;
+  async getTasksPage(limit: number = PAGE_SIZE, cursor?: string | null, status?: string[], fields: string[] = LIST_FIELDS): Promise<TaskPage> {
+    const params = new URLSearchParams({ limit: String(limit), fields: fields.join(',') });
+    if (cursor) params.set('cursor', cursor);
+    status?.forEach(s => params.append('status', s));
+
+    const response = await this.request<Task[]>(`/all?${params}`);
+    return { tasks: response.content, nextCursor: response.next_cursor ?? null };
   }
 
   async createTask(description: string, status: string = 'NEW', progress: number = 0): Promise<number> {
@@ -49,6 +61,39 @@ class ApiService {
     return response.content;
   }
 
+  // createTask over /new/stream: onPlan gets the action as the model writes it
+  async createTaskStreaming(description: string, onPlan: (plan: object) => void, status: string = 'NEW', progress: number = 0): Promise<number> {
+    const taskRequest: TaskRequest = { description, status, progress };
+    const response = await fetch(`${API_BASE_URL}/new/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(taskRequest),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? 'null');
+        if (event === 'partial' || event === 'plan') onPlan(data);
+        if (event === 'created') return data.task_id;
+        if (event === 'error') throw new Error(data.detail);
+      }
+    }
+    throw new Error('Stream ended before the task was created');
+  }
+
   async updateTask(id: number, updates: Partial<TaskRequest>): Promise<void> {
     await this.request(`/update?task_id=${id}`, {
       method: 'POST',
@@ -62,9 +107,60 @@ class ApiService {
     });
   }
 
-  async startTask(id: number): Promise<void> {
+  async createTasks(tasks: TaskRequest[]): Promise<BatchOutcome[]> {
+    const response = await this.request<BatchOutcome[]>('/batch/new', {
+      method: 'POST',
+      body: JSON.stringify({ tasks }),
+    });
+    return response.content;
+  }
+
+  async updateTasks(updates: (Partial<TaskRequest> & { task_id: number })[]): Promise<BatchOutcome[]> {
+    const response = await this.request<BatchOutcome[]>('/batch/update', {
+      method: 'POST',
+      body: JSON.stringify({ tasks: updates }),
+    });
+    return response.content;
+  }
+
+  async deleteTasks(ids: number[]): Promise<BatchOutcome[]> {
+    const response = await this.request<BatchOutcome[]>('/batch/delete', {
+      method: 'POST',
+      body: JSON.stringify({ task_ids: ids }),
+    });
+    return response.content;
+  }
+
+  // Stream of task changes pushed by the server; returns a function that closes the stream.
+  subscribeToTasks(onEvent: (event: TaskEvent) => void): () => void {
+    const source = new EventSource(`${API_BASE_URL}/events`);
+    let disconnected = false;
+    let resync: ReturnType<typeof setTimeout> | undefined;
+    source.addEventListener('task', (message) => {
+      onEvent(JSON.parse((message as MessageEvent).data));
+    });
+    // EventSource reconnects on its own and may fail several times first; changes made while
+    // disconnected are unknown, so resync once the connection is back and has stayed up a moment
+    source.onerror = () => {
+      disconnected = true;
+      clearTimeout(resync);
+    };
+    source.onopen = () => {
+      if (!disconnected) return;
+      disconnected = false;
+      resync = setTimeout(() => onEvent({ op: 'RESYNC' }), RESYNC_DELAY_MS);
+    };
+    return () => {
+      clearTimeout(resync);
+      source.close();
+    };
+  }
+
+  async startTask(id: number, idempotencyKey?: string): Promise<void> {
     await this.request(`/start?task_id=${id}`, {
       method: 'POST',
+      // request() spreads options over its merged headers, so Content-Type has to be repeated here
+      headers: { 'Content-Type': 'application/json', ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}) },
     });
   }
 }
@@ -7,7 +7,7 @@ interface TodoItemProps {
   onUpdateProgress: (id: number, progress: number) => void;
   onDeleteTask: (id: number) => void;
   onUpdateText: (id: number, description: string) => void;
-  onStartTask?: (id: number) => void;
+  onStartTask?: (id: number, idempotencyKey?: string) => void;
   onRefreshTasks?: () => void;
 }
 
@@ -17,6 +17,8 @@ export const TodoItem: React.FC<TodoItemProps> = ({ task, onUpdateProgress, onDe
   const inputRef = useRef<HTMLInputElement>(null);
   const [localProgress, setLocalProgress] = useState(Math.round(task.progress * 100));
   const [isStarting, setIsStarting] = useState(false);
+  // one Idempotency-Key per attempt to start, so a double-click or retry only starts the task once
+  const startKey = useRef<string | null>(null);
 
   useEffect(() => {
     if (isEditing) {
@@ -28,6 +30,11 @@ export const TodoItem: React.FC<TodoItemProps> = ({ task, onUpdateProgress, onDe
     setLocalProgress(Math.round(task.progress * 100));
   }, [task.progress]);
 
+  useEffect(() => {
+    // a new status (e.g. FAILED) makes starting again a new attempt
+    startKey.current = null;
+  }, [task.status]);
+
   const handleProgressChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const newProgress = parseInt(e.target.value, 10);
     setLocalProgress(newProgress);
@@ -44,12 +51,10 @@ export const TodoItem: React.FC<TodoItemProps> = ({ task, onUpdateProgress, onDe
   const handleStartTask = async () => {
     if (onStartTask) {
       setIsStarting(true);
+      startKey.current ??= crypto.randomUUID();
       try {
-        await onStartTask(task.id);
-        // Trigger data refresh after successful start
-        if (onRefreshTasks) {
-          onRefreshTasks();
-        }
+        // the status change arrives over the task event stream, no refresh needed
+        await onStartTask(task.id, startKey.current);
       } catch (error) {
         console.error('Failed to start task:', error);
       } finally {
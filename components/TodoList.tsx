@@ -7,7 +7,7 @@ interface TodoListProps {
   onUpdateProgress: (id: number, progress: number) => void;
   onDeleteTask: (id: number) => void;
   onUpdateText: (id: number, description: string) => void;
-  onStartTask?: (id: number) => void;
+  onStartTask?: (id: number, idempotencyKey?: string) => void;
   onRefreshTasks?: () => void;
 }
 
@@ -28,10 +28,11 @@ export const TodoList: React.FC<TodoListProps> = ({
     );
   }
 
-  const handleStartTask = async (id: number) => {
+  const handleStartTask = async (id: number, idempotencyKey?: string) => {
     try {
       const response = await fetch(`http://localhost:8000/start?task_id=${id}`, {
         method: 'POST',
+        headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
       });
       if (!response.ok) throw new Error('Failed to start task');
       // Handle success - maybe refetch tasks
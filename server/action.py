@@ -25,11 +25,12 @@ n8n.webhook(webhook, action, args)
 
 """
 
-import webhook
 import json
+from registry import REGISTRY
 
 class Action:
-    def __init__(self = None, integration: str = None, action: str = None, args: dict = None, webhook: str = None, model_dump: str = None):
+    def __init__(self = None, integration: str = None, action: str = None, args: dict = None, webhook: str = None, model_dump: str = None,
+                 template: bool = False):
         if model_dump:
             assert(type(model_dump) == dict)
             self.integration = model_dump["integration"]
@@ -45,6 +46,10 @@ class Action:
             self.action = action
             self.args = args
             self.webhook = webhook
+        # unknown tools, wrong webhooks and bad args (missing required ones included) are rejected here,
+        # before anything is dispatched. A template has no args yet (see call_with_args); they're
+        # checked when it's called.
+        self.entry = REGISTRY.resolve(self.to_dict(), check_args=not template)
 
     @classmethod
     def from_dict(cls, data):
@@ -74,18 +79,19 @@ class Action:
             "webhook": self.webhook
         }
 
-    def call(self):
+    def call(self, progress=None):
         """
-        Call the action webhook.
+        Call the action webhook and return its result.
+        progress: optional (fraction, details) callback for long-running local actions
         """
-        webhook.webhook(self.integration, self.action, self.args, self.webhook)
+        return self.entry.call(self.args, progress)
 
-    def call_with_args(self, args: dict):
+    def call_with_args(self, args: dict, progress=None):
         """
         Call with specific arguments
         """
         assert(not self.__dict__.get("args"))
-        webhook.webhook(self.integration, self.action, args, self.webhook)
+        return self.entry.call(args, progress)
 
 
     def __str__(self):
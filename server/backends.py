@@ -0,0 +1,180 @@
+"""
+Text generation backends behind gemini.Model.
+
+Model owns everything around the call (caching, routing, batching, parsing); a backend just turns a
+system instruction, the tools it describes and a prompt into response text. MODEL_BACKEND picks one:
+
+- gemini:  google.generativeai, the default
+- offline: deterministic, network-free plans built from actions.json, with synthetic latency, so /new
+           can be load tested and profiled without spending quota or measuring network jitter
+"""
+
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Protocol
+
+from router import ToolRouter, tool_key
+from schema import response_list_schema, response_plan_schema, response_schema
+
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# set to 0 to let gemini answer in free text instead of constraining it to the action schema
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"
+# streamed plans: JSON, but not schema-constrained. Constrained output comes back with its properties
+# in alphabetical order (this SDK's Schema can't set an order), which puts args before webhook and so
+# holds the early header back until the whole plan is done. The prompt asks for header-first instead
+STREAM_CONFIG = {"response_mime_type": "application/json", "response_schema": None}
+# set to 1 to have the planner answer with a multi-step plan (see plan.py) instead of one action
+PLAN_STEPS = os.getenv("PLAN_STEPS", "0") == "1"
+# distinct system instructions (routed tool sets) to keep a configured GenerativeModel for
+GEMINI_MODELS_KEPT = 32
+# offline backend: delay before the first chunk, and per ~4 characters generated after it
+OFFLINE_LATENCY_MS = float(os.getenv("OFFLINE_LATENCY_MS", "0"))
+OFFLINE_MS_PER_TOKEN = float(os.getenv("OFFLINE_MS_PER_TOKEN", "0"))
+# characters per streamed chunk from the offline backend
+OFFLINE_CHUNK_CHARS = 64
+
+
+class ModelBackend(Protocol):
+    name: str
+
+    def generate(self, instruction: str, tools: List[Dict], prompt: str) -> str:
+        ...
+
+    async def agenerate(self, instruction: str, tools: List[Dict], prompt: str, batch: Optional[List[str]] = None) -> str:
+        """batch: the descriptions when prompt asks for a JSON array of plans, for backends that don't read prompts"""
+        ...
+
+    def astream(self, instruction: str, tools: List[Dict], prompt: str) -> AsyncIterator[str]:
+        ...
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL, steps: bool = PLAN_STEPS):
+        from google import generativeai as genai
+        self.genai = genai
+        self.model_name = model_name
+        self.steps = steps
+        self._models = OrderedDict()  # instruction -> (GenerativeModel, generation config for batches)
+
+    def generate(self, instruction: str, tools: List[Dict], prompt: str) -> str:
+        model, _ = self._model(instruction, tools)
+        return model.generate_content(prompt).text
+
+    async def agenerate(self, instruction: str, tools: List[Dict], prompt: str, batch: Optional[List[str]] = None) -> str:
+        model, list_config = self._model(instruction, tools)
+        if batch is not None and list_config:
+            return (await model.generate_content_async(prompt, generation_config=list_config)).text
+        return (await model.generate_content_async(prompt)).text
+
+    async def astream(self, instruction: str, tools: List[Dict], prompt: str) -> AsyncIterator[str]:
+        model, _ = self._model(instruction, tools)
+        resp = await model.generate_content_async(prompt, stream=True, generation_config=STREAM_CONFIG if STRUCTURED_OUTPUT else None)
+        async for chunk in resp:
+            yield chunk.text
+
+    def _model(self, instruction: str, tools: List[Dict]):
+        entry = self._models.get(instruction)
+        if entry is None:
+            config = list_config = None
+            if STRUCTURED_OUTPUT:
+                schema = response_plan_schema(tools) if self.steps else response_schema(tools)
+                config = {"response_mime_type": "application/json", "response_schema": schema}
+                list_config = {"response_mime_type": "application/json", "response_schema": response_list_schema(tools, self.steps)}
+            try:
+                model = self.genai.GenerativeModel(self.model_name, system_instruction=instruction, generation_config=config)
+            except Exception as e:
+                raise Exception(f"Error during model configuration: {e}")
+            entry = (model, list_config)
+            self._models[instruction] = entry
+            if len(self._models) > GEMINI_MODELS_KEPT:
+                self._models.popitem(last=False)
+        else:
+            self._models.move_to_end(instruction)
+        return entry
+
+
+class OfflineBackend:
+    """
+    Picks the offered action that best matches the prompt (the router's TF-IDF scores) and fills
+    its args from the schema: declared defaults, fixed times for *_time args, the prompt otherwise.
+    Same prompt and tools, same plan. With steps, the action is the only step of a multi-step plan.
+    """
+    name = "offline"
+
+    def __init__(self, actions: List[Dict], latency_ms: float = OFFLINE_LATENCY_MS, ms_per_token: float = OFFLINE_MS_PER_TOKEN,
+                 steps: bool = PLAN_STEPS):
+        self.router = ToolRouter(actions)
+        self.latency = latency_ms / 1000
+        self.per_token = ms_per_token / 1000
+        self.steps = steps
+
+    def plan(self, tools: List[Dict], prompt: str) -> Dict:
+        action = self.action(tools, prompt)
+        if self.steps:
+            return {"steps": [{"id": "step1", **action, "depends_on": []}]}
+        return action
+
+    def action(self, tools: List[Dict], prompt: str) -> Dict:
+        offered = {tool_key(spec) for spec in tools}
+        ranked = [(score, -i, spec) for i, (score, spec) in enumerate(self.router.scores(prompt)) if tool_key(spec) in offered]
+        spec = max(ranked, key=lambda item: item[:2])[2] if ranked else tools[0]
+        # header first, as the prompt asks the model to, so streams can show the chosen tool early
+        return {
+            "integration": spec["integration"],
+            "action": spec["action"],
+            "webhook": spec["webhook"],
+            "args": {name: self._arg(name, arg, prompt) for name, arg in spec.get("args", {}).items()},
+        }
+
+    def generate(self, instruction: str, tools: List[Dict], prompt: str) -> str:
+        text = json.dumps(self.plan(tools, prompt))
+        time.sleep(self._delay(text))
+        return text
+
+    async def agenerate(self, instruction: str, tools: List[Dict], prompt: str, batch: Optional[List[str]] = None) -> str:
+        if batch is not None:
+            text = json.dumps([self.plan(tools, description) for description in batch])
+        else:
+            text = json.dumps(self.plan(tools, prompt))
+        await asyncio.sleep(self._delay(text))
+        return text
+
+    async def astream(self, instruction: str, tools: List[Dict], prompt: str) -> AsyncIterator[str]:
+        text = json.dumps(self.plan(tools, prompt))
+        await asyncio.sleep(self.latency)
+        for i in range(0, len(text), OFFLINE_CHUNK_CHARS):
+            chunk = text[i:i + OFFLINE_CHUNK_CHARS]
+            await asyncio.sleep(self.per_token * len(chunk) / 4)
+            yield chunk
+
+    def _delay(self, text: str) -> float:
+        return self.latency + self.per_token * len(text) / 4
+
+    @staticmethod
+    def _arg(name: str, arg: Dict, prompt: str):
+        if "default" in arg:
+            return arg["default"]
+        kind = arg.get("type", "string")
+        if kind in ("integer", "number"):
+            return 0
+        if kind == "boolean":
+            return False
+        if name == "start_time":
+            return "2030-01-01T10:00:00"
+        if name == "end_time":
+            return "2030-01-01T11:00:00"
+        return prompt
+
+
+def make_backend(name: str, actions: List[Dict]) -> ModelBackend:
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "offline":
+        return OfflineBackend(actions)
+    raise ValueError(f"unknown MODEL_BACKEND {name!r} (expected gemini or offline)")
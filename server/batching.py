@@ -0,0 +1,76 @@
+"""
+Micro-batching of concurrent async calls.
+
+MicroBatcher holds submitted items for a short window, or until max_size have arrived, and hands them
+to run_batch together; each caller gets back its own element of the returned list. run_batch may put
+an Exception in the list to fail just that item, or raise to fail the whole batch.
+
+    batcher = MicroBatcher(plan_many, window=0.01, max_size=8)
+    plan = await batcher.submit(description)
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class MicroBatcher:
+    def __init__(self, run_batch: Callable[[List[Any]], Awaitable[List[Any]]], window: float, max_size: int):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.run_batch = run_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending = []  # (item, future)
+        self._timer = None
+        self._running = set()  # batch tasks; the loop only keeps weak references to them
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def stats(self) -> Dict:
+        return {
+            "window_ms": 1000 * self.window,
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else None,
+            "largest_batch": self.largest,
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(batch))
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"run_batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
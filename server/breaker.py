@@ -0,0 +1,98 @@
+"""
+Per-webhook circuit breakers.
+
+A breaker per webhook key opens after BREAKER_FAILURES consecutive transient failures (connection
+errors, timeouts, 5xx); while open, dispatches to that webhook fail immediately, so a down integration
+doesn't tie up job workers other tasks need. After BREAKER_RESET seconds one trial call is let through
+(half open): success closes the breaker, failure opens it again.
+"""
+
+import os
+import time
+import threading
+from typing import Callable, Dict
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0      # consecutive
+        self.opened_at = None
+        self.rejected = 0      # calls failed fast while open
+        self.times_opened = 0
+        self._trial = False    # a half-open trial call is in flight
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. Counts a rejection if not."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_after - (self.clock() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.max_failures:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self._trial = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "retry_in": self.retry_in(),
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def get(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def states() -> Dict[str, Dict]:
+    return {name: breaker.stats() for name, breaker in list(_breakers.items())}
@@ -60,6 +60,8 @@ def clean_database(force=False):
         tm.drop_tasks_table()
         print("Recreating tasks table...")
         tm.create_tasks_table()
+        tm.create_plan_cache_table()
+        tm.create_task_results_table()
         tm.close()
         print("✅ Database cleaned successfully!")
         return True
@@ -67,6 +69,18 @@ def clean_database(force=False):
         print(f"❌ Error cleaning database: {e}")
         return False
 
+def migrate_database():
+    """Bring an existing database up to the current schema, keeping its data."""
+    try:
+        tm = TaskManager()
+        tm.migrate()
+        tm.close()
+        print("✅ Database migrated successfully!")
+        return True
+    except Exception as e:
+        print(f"❌ Error migrating database: {e}")
+        return False
+
 def setup_database():
     """Create the tasks table and populate it with sample data."""
     tm = TaskManager()
@@ -74,6 +88,8 @@ def setup_database():
     try:
         print("Creating tasks table...")
         tm.create_tasks_table()
+        tm.create_plan_cache_table()
+        tm.create_task_results_table()
         print("✅ Tasks table created successfully")
         
         # Sample task 1: A simple task
@@ -402,12 +418,14 @@ def main():
 Commands:
   clean     Drop and recreate the tasks table (removes all data)
   setup     Create table and populate with sample data
+  migrate   Update an existing database to the current schema (keeps data, no samples)
   test      Run comprehensive database tests
   view      Display current database contents
 
 Examples:
   python db_cli.py clean
   python db_cli.py setup
+  python db_cli.py migrate
   python db_cli.py test
   python db_cli.py view
         """
@@ -415,7 +433,7 @@ Examples:
     
     parser.add_argument(
         'command',
-        choices=['clean', 'setup', 'test', 'view'],
+        choices=['clean', 'setup', 'migrate', 'test', 'view'],
         help='Database command to execute'
     )
     
@@ -442,6 +460,7 @@ Examples:
     commands = {
         'clean': lambda: clean_database(force=args.force),
         'setup': setup_database,
+        'migrate': migrate_database,
         'test': test_database,
         'view': view_database,
     }
@@ -1,64 +1,398 @@
 import os
+import gzip
+import time
+import uuid
+import base64
+import shutil
+import logging
+import threading
 import psycopg2
 import psycopg2.extras
+from contextlib import contextmanager
 from enum import Enum
 from typing import Dict, List, Optional, Union
 from datetime import datetime
 import json
 
+# connection pool sizing: DB_POOL_MIN connections are opened up front, and up to DB_POOL_MAX are
+# opened as needed and then kept; each checkout holds a connection for one query/transaction
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+# seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# connections idle for longer than this are pinged before being handed out
+DB_HEALTHCHECK_INTERVAL = float(os.getenv('DB_HEALTHCHECK_INTERVAL', '30'))
+
+# NOTIFY channel the tasks trigger publishes row changes on
+TASK_EVENTS_CHANNEL = 'task_changes'
+# advisory lock key held while migrating, so concurrent workers don't migrate at once
+MIGRATION_LOCK_ID = 7210531
+
+def connection_params() -> Dict:
+    """psycopg2.connect() keyword arguments from environment variables."""
+    return dict(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'taskmanager'),
+        user=os.getenv('DB_USER', 'dev'),
+        password=os.getenv('DB_PASSWORD', 'devpass'),
+        port=os.getenv('DB_PORT', '5432')
+    )
+
+# page size used by get_tasks_page when the caller doesn't pass one, and the hard cap
+DEFAULT_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('TASKS_MAX_PAGE_SIZE', '500'))
+
+# allowed values of tasks.status (mirrors the tasks_status_check constraint)
+TASK_STATUSES = ('NEW', 'STARTED', 'COMPLETED', 'FAILED')
+
+# columns callers may project; anything else in a field selection is rejected
+TASK_FIELDS = ('id', 'description', 'action', 'status', 'progress', 'created_at', 'updated_at')
+# keyset pagination needs these on every row, so they are always selected for listings
+CURSOR_FIELDS = ('id', 'created_at')
+
+# task_results: results whose JSON is bigger than this are stored gzipped; gzipped results bigger than
+# RESULT_MAX_BYTES go to a file under RESULT_SPILL_DIR instead of the row
+RESULT_COMPRESS_BYTES = int(os.getenv('RESULT_COMPRESS_BYTES', str(16 * 1024)))
+RESULT_MAX_BYTES = int(os.getenv('RESULT_MAX_BYTES', str(1024 * 1024)))
+RESULT_SPILL_DIR = os.getenv('RESULT_SPILL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results'))
+
+RESULT_FIELDS = ('id', 'task_id', 'job_id', 'step', 'status', 'error', 'result_bytes', 'stored_bytes',
+                 'started_at', 'finished_at', 'duration_ms', 'created_at')
+
+def encode_result(task_id: int, result) -> Dict:
+    """
+    task_results storage columns for a result: inline JSONB when small, gzipped bytes when large,
+    a gzipped file under RESULT_SPILL_DIR when even that is over RESULT_MAX_BYTES.
+    """
+    text = json.dumps(result, default=str)
+    data = text.encode()
+    columns = {'result': None, 'result_gz': None, 'result_file': None, 'result_bytes': len(data)}
+    if len(data) <= RESULT_COMPRESS_BYTES:
+        columns['result'] = text
+        columns['stored_bytes'] = len(data)
+        return columns
+    compressed = gzip.compress(data, compresslevel=6)
+    columns['stored_bytes'] = len(compressed)
+    if len(compressed) <= RESULT_MAX_BYTES:
+        columns['result_gz'] = psycopg2.Binary(compressed)
+        return columns
+    directory = os.path.join(RESULT_SPILL_DIR, str(task_id))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.json.gz")
+    with open(path, 'wb') as f:
+        f.write(compressed)
+    columns['result_file'] = path
+    return columns
+
+def decode_result(row: Dict) -> Dict:
+    """
+    A task_results row with its result decoded. Spilled results stay on disk and are flagged with
+    spilled=True; read them with TaskManager.get_result_file().
+    """
+    compressed = row.pop('result_gz', None)
+    if compressed is not None:
+        row['result'] = json.loads(gzip.decompress(bytes(compressed)))
+    if row.pop('result_file', None) is not None:
+        row['spilled'] = True
+    return row
+
+def remove_spilled_results(task_ids: List[int]):
+    """Delete the spill files of the given tasks."""
+    for task_id in task_ids:
+        shutil.rmtree(os.path.join(RESULT_SPILL_DIR, str(task_id)), ignore_errors=True)
+
+def select_columns(fields: Optional[List[str]] = None, required=()) -> str:
+    """Validated, comma-joined column list for a field selection (all columns when fields is empty)."""
+    if not fields:
+        return ", ".join(TASK_FIELDS)
+    unknown = set(fields) - set(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown task fields: {sorted(unknown)}")
+    # keep TASK_FIELDS order so the column list is stable regardless of request order
+    wanted = set(fields) | set(required)
+    return ", ".join(f for f in TASK_FIELDS if f in wanted)
+
+def encode_cursor(row: Dict) -> str:
+    """Opaque keyset cursor pointing just past `row` in (created_at DESC, id DESC) order."""
+    key = json.dumps([row['created_at'].isoformat(), row['id']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Opaque cursor -> (created_at, id). Raises ValueError on anything we didn't hand out."""
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+# schema, every statement idempotent so it can be re-run against an existing database (see migrate())
+TASKS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id SERIAL PRIMARY KEY,
+    description TEXT NOT NULL,
+    action JSONB DEFAULT '{}',  -- Changed from 'actions' to 'action'
+    status VARCHAR(20) DEFAULT 'NEW',
+    progress FLOAT DEFAULT 0.0 CHECK (progress >= 0.0 AND progress <= 1.0),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Recreated so tables from before FAILED existed pick up the new status
+ALTER TABLE tasks DROP CONSTRAINT IF EXISTS tasks_status_check;
+ALTER TABLE tasks ADD CONSTRAINT tasks_status_check
+    CHECK (status IN ('NEW', 'STARTED', 'COMPLETED', 'FAILED'));
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_progress ON tasks(progress);
+CREATE INDEX IF NOT EXISTS idx_tasks_action ON tasks USING GIN (action);  -- Changed index name
+-- Keyset pagination walks these instead of sorting the whole table
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at_id ON tasks(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created_at_id ON tasks(status, created_at DESC, id DESC);
+
+-- Publish every row change so the server can push deltas to clients
+CREATE OR REPLACE FUNCTION notify_task_change() RETURNS trigger AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        payload := jsonb_build_object('op', TG_OP, 'task', jsonb_build_object('id', OLD.id))::text;
+    ELSE
+        payload := jsonb_build_object('op', TG_OP, 'task', to_jsonb(NEW) - 'action')::text;
+    END IF;
+    -- NOTIFY payloads must stay under 8000 bytes; send just the id and let clients fetch the row
+    IF octet_length(payload) > 7900 THEN
+        payload := jsonb_build_object('op', TG_OP, 'task', jsonb_build_object('id', NEW.id), 'truncated', true)::text;
+    END IF;
+    PERFORM pg_notify('%s', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_notify ON tasks;
+CREATE TRIGGER tasks_notify AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_task_change();
+""" % TASK_EVENTS_CHANNEL
+
+PLAN_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_cache (
+    key CHAR(64) PRIMARY KEY,
+    plan JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_plan_cache_created_at ON plan_cache(created_at);
+"""
+
+TASK_RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_results (
+    id BIGSERIAL PRIMARY KEY,
+    task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    job_id TEXT,
+    step TEXT,                          -- plan step id, NULL for a single action
+    status VARCHAR(20) NOT NULL CHECK (status IN ('COMPLETED', 'FAILED', 'SKIPPED')),
+    result JSONB,                       -- small results
+    result_gz BYTEA,                    -- gzipped JSON of large results
+    result_file TEXT,                   -- gzipped JSON on disk, for results over the size cap
+    result_bytes INTEGER NOT NULL,      -- size of the result as JSON
+    stored_bytes INTEGER NOT NULL,      -- size as stored (after compression)
+    error TEXT,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    duration_ms FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_task_results_task_id ON task_results(task_id, created_at DESC, id DESC);
+"""
+
 class DatabaseConnection:
-    def __init__(self):
-        self.conn = None
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX):
+        if not 0 <= minconn <= maxconn or maxconn < 1:
+            raise ValueError("Pool size must satisfy 0 <= min <= max and max >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        # at most maxconn connections exist at once: one per slot
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []   # (connection, time it was returned), most recently used last
+        self._in_use = 0
         self.connect()
-    
+
     def connect(self):
-        """Connect to PostgreSQL database using environment variables."""
+        """Open the first minconn connections to PostgreSQL using environment variables."""
+        self.close()
+        for _ in range(self.minconn):
+            self._checkin(self._open())
+
+    def _open(self):
         try:
-            self.conn = psycopg2.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                database=os.getenv('DB_NAME', 'taskmanager'),
-                user=os.getenv('DB_USER', 'dev'),
-                password=os.getenv('DB_PASSWORD', 'devpass'),
-                port=os.getenv('DB_PORT', '5432')
-            )
-            self.conn.autocommit = True
+            return psycopg2.connect(**connection_params())
         except psycopg2.Error as e:
             raise Exception(f"Failed to connect to database: {e}")
-    
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        """Cheap liveness check, only run on connections that sat idle for a while."""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < DB_HEALTHCHECK_INTERVAL:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _checkout(self):
+        """The most recently used idle connection (dead ones are discarded), or a new one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if self._healthy(conn, last_used):
+                return conn
+            logging.warning("discarding dead database connection")
+            self._discard(conn)
+        return self._open()
+
+    def _checkin(self, conn):
+        # kept however many are idle; the slots already cap the total at maxconn
+        if conn.closed:
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out of the pool for the duration of the block.
+        The block runs as one transaction: committed on success, rolled back on error.
+        """
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise Exception(f"Timed out after {DB_POOL_TIMEOUT}s waiting for a database connection")
+        conn = None
+        try:
+            conn = self._checkout()
+            with self._lock:
+                self._in_use += 1
+            yield conn
+            conn.commit()
+        except Exception:
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    self._discard(conn)
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._in_use -= 1
+                self._checkin(conn)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self, cursor_factory=None):
+        """Shorthand for a single cursor on a freshly checked-out connection."""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            }
+
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
 
 class TaskManager:
     def __init__(self):
         self.db = DatabaseConnection()
     
+    def migrate(self):
+        """
+        Bring an existing database up to the current schema (tables, constraints, indexes, the NOTIFY
+        trigger) without touching data. One transaction, serialized across workers starting together.
+        """
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+                for schema in (TASKS_SCHEMA, PLAN_CACHE_SCHEMA, TASK_RESULTS_SCHEMA):
+                    cursor.execute(schema)
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to migrate database: {e}")
+
     def create_tasks_table(self):
         """Create the tasks table with all required fields."""
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS tasks (
-            id SERIAL PRIMARY KEY,
-            description TEXT NOT NULL,
-            action JSONB DEFAULT '{}',  -- Changed from 'actions' to 'action'
-            status VARCHAR(20) DEFAULT 'NEW' CHECK (status IN ('NEW', 'STARTED', 'COMPLETED')),
-            progress FLOAT DEFAULT 0.0 CHECK (progress >= 0.0 AND progress <= 1.0),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        
-        -- Create indexes for better performance
-        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
-        CREATE INDEX IF NOT EXISTS idx_tasks_progress ON tasks(progress);
-        CREATE INDEX IF NOT EXISTS idx_tasks_action ON tasks USING GIN (action);  -- Changed index name
-        """
+        create_table_query = TASKS_SCHEMA
         try:
-            with self.db.conn.cursor() as cursor:
+            with self.db.cursor() as cursor:
                 cursor.execute(create_table_query)
         except psycopg2.Error as e:
             raise Exception(f"Failed to create tasks table: {e}")
     
 
+    def create_plan_cache_table(self):
+        """Create the table backing the shared plan cache (see plan_cache.py)."""
+        create_table_query = PLAN_CACHE_SCHEMA
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(create_table_query)
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to create plan_cache table: {e}")
+
+    def get_cached_plan(self, key: str, max_age: int) -> Optional[Dict]:
+        """Cached plan for `key` if it was stored less than `max_age` seconds ago."""
+        select_query = """
+        SELECT plan FROM plan_cache
+        WHERE key = %s AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s);
+        """
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(select_query, (key, max_age))
+                result = cursor.fetchone()
+                return result[0] if result else None
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to read cached plan: {e}")
+
+    def put_cached_plan(self, key: str, plan: Dict):
+        """Store (or refresh) the cached plan for `key`."""
+        upsert_query = """
+        INSERT INTO plan_cache (key, plan) VALUES (%s, %s)
+        ON CONFLICT (key) DO UPDATE SET plan = EXCLUDED.plan, created_at = CURRENT_TIMESTAMP;
+        """
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(upsert_query, (key, json.dumps(plan)))
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to write cached plan: {e}")
+
+    def prune_cached_plans(self, max_age: int) -> int:
+        """Delete cached plans older than `max_age` seconds. Returns how many were removed."""
+        delete_query = "DELETE FROM plan_cache WHERE created_at <= CURRENT_TIMESTAMP - make_interval(secs => %s);"
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(delete_query, (max_age,))
+                return cursor.rowcount
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to prune cached plans: {e}")
+
     def create_task(self, description: str, action: Dict = None, 
                    status: str = "NEW", progress: float = 0.0) -> int:
         """Create a new task and return its id."""
@@ -75,7 +409,7 @@ class TaskManager:
         """
         
         try:
-            with self.db.conn.cursor() as cursor:
+            with self.db.cursor() as cursor:
                 cursor.execute(insert_query, (
                     description,
                     json.dumps(action),
@@ -88,16 +422,15 @@ class TaskManager:
             raise Exception(f"Failed to create task: {e}")
     
 
-    def get_task(self, id: int) -> Optional[Dict]:
-        """Retrieve a task by its ID."""
-        select_query = """
-        SELECT id, description, action, status, progress, 
-               created_at, updated_at
+    def get_task(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Retrieve a task by its ID, optionally only the given fields."""
+        select_query = f"""
+        SELECT {select_columns(fields)}
         FROM tasks WHERE id = %s;
         """
         
         try:
-            with self.db.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            with self.db.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
                 cursor.execute(select_query, (id,))
                 result = cursor.fetchone()
                 if result:
@@ -106,21 +439,59 @@ class TaskManager:
         except psycopg2.Error as e:
             raise Exception(f"Failed to retrieve task {id}: {e}")
     
-    def get_all_tasks(self) -> List[Dict]:
-        """Retrieve all tasks."""
-        select_query = """
-        SELECT id, description, action, status, progress,
-               created_at, updated_at
-        FROM tasks ORDER BY created_at DESC;
-        """
-        
+    def get_all_tasks(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        """Retrieve tasks newest first, optionally at most `limit` of them after `cursor`."""
         try:
-            with self.db.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(select_query)
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+            return self._select_tasks("", [], limit, cursor, fields)
         except psycopg2.Error as e:
             raise Exception(f"Failed to retrieve tasks: {e}")
+
+    def get_tasks_page(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                       status: Union[str, List[str], None] = None, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Retrieve one page of tasks, newest first.
+        Returns {"tasks": [...], "next_cursor": str or None}; pass next_cursor back to get the following page.
+        With `fields`, rows only carry those columns plus id and created_at.
+        """
+        limit = limit or DEFAULT_PAGE_SIZE
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        # fetch one extra row to find out whether there is another page
+        if status:
+            tasks = self.get_tasks_by_status(status, limit=limit + 1, cursor=cursor, fields=fields)
+        else:
+            tasks = self.get_all_tasks(limit=limit + 1, cursor=cursor, fields=fields)
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1])
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    def _select_tasks(self, where: str, values: List, limit: Optional[int], cursor: Optional[str],
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        """Shared keyset query behind the task listings. `where` is a trusted SQL fragment."""
+        conditions = [where] if where else []
+        values = list(values)
+        if cursor:
+            conditions.append("(created_at, id) < (%s, %s)")
+            values.extend(decode_cursor(cursor))
+
+        select_query = f"""
+        SELECT {select_columns(fields, required=CURSOR_FIELDS)}
+        FROM tasks
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY created_at DESC, id DESC
+        {"LIMIT %s" if limit is not None else ""};
+        """
+        if limit is not None:
+            values.append(limit)
+
+        with self.db.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(select_query, values)
+            return [dict(row) for row in cursor.fetchall()]
     
     def update_task(self, id: int, **kwargs) -> bool:
         """Update a task with given fields. Returns True if task was found and updated."""
@@ -153,48 +524,298 @@ class TaskManager:
         values.append(id)
         
         try:
-            with self.db.conn.cursor() as cursor:
+            with self.db.cursor() as cursor:
                 cursor.execute(update_query, values)
                 return cursor.rowcount > 0
         except psycopg2.Error as e:
             raise Exception(f"Failed to update task {id}: {e}")
     
+    def transition_task(self, id: int, from_status: Union[str, List[str]], to_status: str,
+                        progress: Optional[float] = None, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Atomically move a task to `to_status` if it is currently in `from_status` (one status or a list),
+        optionally setting progress. Returns the updated row, or None if the task doesn't exist or was
+        in another status, so two concurrent callers can never both win the same transition.
+        """
+        from_statuses = [from_status] if isinstance(from_status, str) else list(from_status)
+        self._check_fields(status=to_status, progress=progress)
+        transition_query = f"""
+        UPDATE tasks SET status = %s, progress = COALESCE(%s, progress), updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND status = ANY(%s)
+        RETURNING {select_columns(fields)};
+        """
+        try:
+            with self.db.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(transition_query, (to_status, progress, id, from_statuses))
+                result = cursor.fetchone()
+                return dict(result) if result else None
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to transition task {id} to {to_status}: {e}")
+
+    def touch_tasks(self, ids: List[int]) -> int:
+        """Bump updated_at of the given tasks that are still STARTED, as a heartbeat. Returns how many."""
+        if not ids:
+            return 0
+        touch_query = "UPDATE tasks SET updated_at = CURRENT_TIMESTAMP WHERE id = ANY(%s) AND status = 'STARTED';"
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(touch_query, (list(ids),))
+                return cursor.rowcount
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to touch tasks: {e}")
+
+    def fail_stale_tasks(self, max_age: int) -> List[int]:
+        """Mark STARTED tasks not updated in `max_age` seconds FAILED. Returns their ids."""
+        fail_query = """
+        UPDATE tasks SET status = 'FAILED', updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'STARTED' AND updated_at <= CURRENT_TIMESTAMP - make_interval(secs => %s)
+        RETURNING id;
+        """
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(fail_query, (max_age,))
+                return [row[0] for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to fail stale tasks: {e}")
+
     def delete_task(self, id: int) -> bool:
         """Delete a task by ID. Returns True if task was found and deleted."""
         delete_query = "DELETE FROM tasks WHERE id = %s;"
         
         try:
-            with self.db.conn.cursor() as cursor:
+            with self.db.cursor() as cursor:
                 cursor.execute(delete_query, (id,))
-                return cursor.rowcount > 0
+                deleted = cursor.rowcount > 0
         except psycopg2.Error as e:
             raise Exception(f"Failed to delete task {id}: {e}")
+        if deleted:
+            remove_spilled_results([id])
+        return deleted
     
-    def get_tasks_by_status(self, status: str) -> List[Dict]:
-        """Get all tasks with a specific status."""
-        select_query = """
-        SELECT id, description, action, status, progress,
-               created_at, updated_at
-        FROM tasks WHERE status = %s ORDER BY created_at DESC;
+    def create_task_results_table(self):
+        """Create the table holding action results, one row per action (or plan step) run."""
+        create_table_query = TASK_RESULTS_SCHEMA
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(create_table_query)
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to create task_results table: {e}")
+
+    def add_task_results(self, results: List[Dict]) -> List[int]:
         """
-        
+        Store results of a job with one multi-row INSERT. Each item has task_id, status and result, and
+        optionally job_id, step, error, started_at and finished_at (epoch seconds). Returns the row ids.
+        """
+        if not results:
+            return []
+        rows = []
+        for item in results:
+            columns = encode_result(item['task_id'], item.get('result'))
+            started, finished = item.get('started_at'), item.get('finished_at')
+            rows.append((
+                item['task_id'], item.get('job_id'), item.get('step'), item['status'],
+                columns['result'], columns['result_gz'], columns['result_file'],
+                columns['result_bytes'], columns['stored_bytes'], item.get('error'),
+                datetime.fromtimestamp(started) if started else None,
+                datetime.fromtimestamp(finished) if finished else None,
+                1000 * (finished - started) if started and finished else None,
+            ))
+        insert_query = """
+        INSERT INTO task_results (task_id, job_id, step, status, result, result_gz, result_file,
+                                  result_bytes, stored_bytes, error, started_at, finished_at, duration_ms)
+        VALUES %s RETURNING id;
+        """
+        try:
+            with self.db.cursor() as cursor:
+                ids = psycopg2.extras.execute_values(cursor, insert_query, rows, page_size=len(rows), fetch=True)
+                return [id for (id,) in ids]
+        except psycopg2.Error as e:
+            for row in rows:
+                if row[6] and os.path.exists(row[6]):
+                    os.remove(row[6])  # spill files of results that were never stored
+            raise Exception(f"Failed to store task results: {e}")
+
+    def get_result_file(self, task_id: int, result_id: int) -> Optional[str]:
+        """Path of a spilled result (gzipped JSON), or None if the result isn't spilled or doesn't exist."""
+        select_query = "SELECT result_file FROM task_results WHERE id = %s AND task_id = %s;"
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(select_query, (result_id, task_id))
+                row = cursor.fetchone()
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to retrieve result {result_id} of task {task_id}: {e}")
+        return row[0] if row else None
+
+    def get_task_results_page(self, task_id: int, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
+        """
+        One page of a task's results, newest first, with results decoded.
+        Returns {"results": [...], "next_cursor": str or None}, like get_tasks_page().
+        """
+        limit = limit or DEFAULT_PAGE_SIZE
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        conditions = ["task_id = %s"]
+        values = [task_id]
+        if cursor:
+            conditions.append("(created_at, id) < (%s, %s)")
+            values.extend(decode_cursor(cursor))
+        select_query = f"""
+        SELECT {", ".join(RESULT_FIELDS)}, result, result_gz, result_file
+        FROM task_results
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s;
+        """
+        values.append(limit + 1)
+        try:
+            with self.db.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(select_query, values)
+                rows = [dict(row) for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to retrieve results for task {task_id}: {e}")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+        return {"results": [decode_result(row) for row in rows], "next_cursor": next_cursor}
+
+    def create_tasks(self, tasks: List[Dict]) -> List[Dict]:
+        """
+        Insert many tasks with one multi-row INSERT in a single transaction.
+        Each item takes the create_task() keyword arguments. Returns one outcome per item, in order:
+        {"ok": True, "id": ...} or {"ok": False, "error": ...} for items rejected before the insert.
+        """
+        outcomes = [None] * len(tasks)
+        rows, positions = [], []
+        for i, task in enumerate(tasks):
+            try:
+                description = task["description"]
+                status = task.get("status", "NEW")
+                progress = task.get("progress", 0.0)
+                self._check_fields(status=status, progress=progress)
+            except (KeyError, TypeError, ValueError) as e:
+                outcomes[i] = {"ok": False, "error": f"Invalid task: {e}"}
+                continue
+            rows.append((description, json.dumps(task.get("action") or {}), status, progress))
+            positions.append(i)
+
+        if rows:
+            insert_query = "INSERT INTO tasks (description, action, status, progress) VALUES %s RETURNING id;"
+            try:
+                with self.db.cursor() as cursor:
+                    # RETURNING yields ids in VALUES order; one page keeps it a single statement
+                    ids = psycopg2.extras.execute_values(cursor, insert_query, rows, page_size=len(rows), fetch=True)
+            except psycopg2.Error as e:
+                raise Exception(f"Failed to create tasks: {e}")
+            for i, (id,) in zip(positions, ids):
+                outcomes[i] = {"ok": True, "id": id}
+        return outcomes
+
+    def update_tasks(self, updates: List[Dict]) -> List[Dict]:
+        """
+        Apply many partial updates with one UPDATE ... FROM (VALUES ...) in a single transaction.
+        Each item is {"id": ..., <field>: <value>, ...} with the fields update_task() accepts;
+        fields left out keep their current value. Returns one outcome per item, in order.
+        """
+        outcomes = [None] * len(updates)
+        rows, positions = [], []
+        for i, update in enumerate(updates):
+            fields = {k: v for k, v in update.items() if k != "id"}
+            try:
+                id = int(update["id"])
+                unknown = set(fields) - {'description', 'action', 'status', 'progress'}
+                if unknown:
+                    raise ValueError(f"Unknown fields {sorted(unknown)}")
+                if not any(v is not None for v in fields.values()):
+                    raise ValueError("No valid fields provided for update")
+                self._check_fields(status=fields.get("status"), progress=fields.get("progress"))
+            except (KeyError, TypeError, ValueError) as e:
+                outcomes[i] = {"ok": False, "id": update.get("id"), "error": f"Invalid update: {e}"}
+                continue
+            action = fields.get("action")
+            rows.append((
+                id,
+                fields.get("description"),
+                json.dumps(action) if action is not None else None,
+                fields.get("status"),
+                fields.get("progress"),
+            ))
+            positions.append(i)
+
+        if rows:
+            update_query = """
+            UPDATE tasks AS t SET
+                description = COALESCE(v.description, t.description),
+                action = COALESCE(v.action, t.action),
+                status = COALESCE(v.status, t.status),
+                progress = COALESCE(v.progress, t.progress),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(id, description, action, status, progress)
+            WHERE t.id = v.id
+            RETURNING t.id;
+            """
+            try:
+                with self.db.cursor() as cursor:
+                    updated = psycopg2.extras.execute_values(
+                        cursor, update_query, rows,
+                        template="(%s::int, %s::text, %s::jsonb, %s::varchar, %s::float8)",
+                        page_size=len(rows), fetch=True,
+                    )
+            except psycopg2.Error as e:
+                raise Exception(f"Failed to update tasks: {e}")
+            updated = {row[0] for row in updated}
+            for i, row in zip(positions, rows):
+                if row[0] in updated:
+                    outcomes[i] = {"ok": True, "id": row[0]}
+                else:
+                    outcomes[i] = {"ok": False, "id": row[0], "error": f"Task {row[0]} not found"}
+        return outcomes
+
+    def delete_tasks(self, ids: List[int]) -> List[Dict]:
+        """Delete many tasks with one DELETE ... WHERE id = ANY(...). Returns one outcome per id, in order."""
+        if not ids:
+            return []
+        delete_query = "DELETE FROM tasks WHERE id = ANY(%s) RETURNING id;"
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(delete_query, (list(ids),))
+                deleted = {row[0] for row in cursor.fetchall()}
+        except psycopg2.Error as e:
+            raise Exception(f"Failed to delete tasks: {e}")
+        remove_spilled_results(deleted)
+        return [
+            {"ok": True, "id": id} if id in deleted else {"ok": False, "id": id, "error": f"Task {id} not found"}
+            for id in ids
+        ]
+
+    @staticmethod
+    def _check_fields(status: Optional[str] = None, progress: Optional[float] = None):
+        """Reject values the table constraints would, before they can abort a whole batch."""
+        if status is not None and status not in TASK_STATUSES:
+            raise ValueError(f"Invalid status {status}")
+        if progress is not None and not 0.0 <= progress <= 1.0:
+            raise ValueError("Progress must be between 0.0 and 1.0")
+    
+    def get_tasks_by_status(self, status: Union[str, List[str]], limit: Optional[int] = None,
+                            cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get tasks with a specific status (or any of a list of statuses), newest first."""
+        statuses = [status] if isinstance(status, str) else list(status)
         try:
-            with self.db.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(select_query, (status,))
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+            return self._select_tasks("status = ANY(%s)", [statuses], limit, cursor, fields)
         except psycopg2.Error as e:
             raise Exception(f"Failed to retrieve tasks by status: {e}")
     
     def drop_tasks_table(self):
         """Drop the tasks table. Use with caution!"""
-        drop_query = "DROP TABLE IF EXISTS tasks CASCADE;"
+        drop_query = "DROP TABLE IF EXISTS task_results; DROP TABLE IF EXISTS tasks CASCADE;"
         
         try:
-            with self.db.conn.cursor() as cursor:
+            with self.db.cursor() as cursor:
                 cursor.execute(drop_query)
         except psycopg2.Error as e:
             raise Exception(f"Failed to drop tasks table: {e}")
+        shutil.rmtree(RESULT_SPILL_DIR, ignore_errors=True)
     
     def close(self):
         """Close database connection."""
@@ -0,0 +1,145 @@
+"""
+Fan-out of task row changes to connected clients.
+
+The tasks table has a trigger that NOTIFYs every INSERT/UPDATE/DELETE on the task_changes channel
+(see TASKS_SCHEMA in db.py). TaskEventListener holds one dedicated LISTEN connection on a background
+thread and pushes each event into an asyncio queue per subscriber. Events look like:
+
+    {"op": "UPDATE", "task": {"id": 3, "status": "STARTED", "progress": 0.02, ...}}
+
+A subscriber that falls too far behind has its queue replaced by a single {"op": "RESYNC"} event,
+telling the client to re-fetch the list rather than apply a gapped stream of deltas.
+"""
+
+import os
+import json
+import time
+import select
+import asyncio
+import logging
+import threading
+import psycopg2
+from typing import Dict
+
+from db.db import connection_params, TASK_EVENTS_CHANNEL
+
+# events buffered per client before it is told to resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+RESYNC = {"op": "RESYNC"}
+
+
+class TaskEventListener:
+    def __init__(self, channel: str = TASK_EVENTS_CHANNEL, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.subscribers = {}  # asyncio.Queue -> the loop it belongs to
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.delivered = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="task-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a queue on the running loop that will receive every change event."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self.subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self.subscribers.pop(queue, None)
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "listening": bool(self._thread and self._thread.is_alive()),
+            "delivered": self.delivered,
+        }
+
+    def publish(self, event: Dict):
+        """Hand an event to every subscriber. Safe to call from any thread."""
+        with self._lock:
+            targets = list(self.subscribers.items())
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # loop already closed; the subscriber is gone
+                self.unsubscribe(queue)
+
+    def _offer(self, queue: asyncio.Queue, event: Dict):
+        # runs on the subscriber's loop
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+            return
+        queue.put_nowait(event)
+        self.delivered += 1
+
+    def _listen_forever(self):
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel};")
+                logging.info(f"listening for task events on {self.channel}")
+                # anything could have changed while we were disconnected
+                if backoff > 1:
+                    self.publish(RESYNC)
+                backoff = 1
+                self._drain(conn)
+            except psycopg2.Error as e:
+                logging.error(f"task event listener error: {e}; reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _drain(self, conn):
+        while not self._stop.is_set():
+            # wake up periodically so stop() is noticed
+            if select.select([conn], [], [], 5) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    event = json.loads(notify.payload)
+                except ValueError:
+                    logging.warning(f"dropping malformed task event: {notify.payload}")
+                    continue
+                self.publish(event)
+
+
+async def event_stream(listener: TaskEventListener, heartbeat: float = 15.0):
+    """
+    Server-sent events for one client: `event: task` frames with JSON data, plus a comment
+    line every `heartbeat` seconds so proxies don't close an idle stream.
+    """
+    queue = listener.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield f": ping {int(time.time())}\n\n"
+                continue
+            yield f"event: task\ndata: {json.dumps(event)}\n\n"
+    finally:
+        listener.unsubscribe(queue)
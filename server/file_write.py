@@ -0,0 +1,233 @@
+"""
+Write engine for file.modify. modify() replaces a file with new `content`, or applies a unified
+diff (`patch`) to it:
+
+- the new contents are streamed into a temp file next to the target, FILE_WRITE_CHUNK bytes at a
+  time, fsynced and renamed over the target, so readers see the old file or the new one
+- hunks are applied line by line while the original is read; a hunk whose context doesn't match
+  fails the write without touching the file
+- the target is left alone (mtime included) when its contents wouldn't change
+"""
+
+import os
+import re
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# characters encoded and written per write() call
+FILE_WRITE_CHUNK = int(os.getenv("FILE_WRITE_CHUNK", str(64 * 1024)))
+# fsync the temp file (and directory) around the rename; off trades durability for speed
+FILE_WRITE_FSYNC = os.getenv("FILE_WRITE_FSYNC", "1") == "1"
+
+# mode a new file gets, as open() would create it; mkstemp's 0600 is only right for the temp file.
+# Reading the umask means setting it, so it's done once here rather than per write from many threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """A patch that can't be parsed or doesn't apply to the file."""
+
+
+class Hunk:
+    __slots__ = ("start", "length", "lines", "no_eol")
+
+    def __init__(self, start: int, length: int):
+        self.start = start      # 1-based first line of the original the hunk covers
+        self.length = length    # original lines it covers
+        self.lines: List[Tuple[str, str]] = []   # (" " | "-" | "+", text without line ending)
+        self.no_eol = False     # the last added line ends the file without a newline
+
+
+def parse_patch(patch: str) -> List[Hunk]:
+    """Hunks of a unified diff; ---/+++ file headers and anything before the first hunk are ignored."""
+    hunks: List[Hunk] = []
+    for line in patch.splitlines():
+        match = HUNK_HEADER.match(line)
+        if match:
+            start, length = int(match.group(1)), int(match.group(2) or 1)
+            # a hunk that only adds lines names the line it goes after ("-3,0"), or 0 at the top
+            hunks.append(Hunk(start + 1 if length == 0 else start, length))
+        elif not hunks:
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file": about the new file only if it follows an added line
+            if hunks[-1].lines and hunks[-1].lines[-1][0] == "+":
+                hunks[-1].no_eol = True
+        elif line[:1] in (" ", "-", "+"):
+            hunks[-1].lines.append((line[0], line[1:]))
+        elif line == "":
+            hunks[-1].lines.append((" ", ""))   # editors strip the space off blank context lines
+        else:
+            raise PatchError(f"unexpected line in hunk: {line[:80]!r}")
+    if not hunks:
+        raise PatchError("patch has no hunks")
+    for hunk in hunks:
+        covered = sum(1 for op, _ in hunk.lines if op != "+")
+        if covered != hunk.length:
+            raise PatchError(f"hunk at line {hunk.start} covers {covered} lines, header says {hunk.length}")
+    return hunks
+
+
+def _strip_eol(line: str) -> str:
+    if line.endswith("\r\n"):
+        return line[:-2]
+    return line[:-1] if line.endswith("\n") else line
+
+
+def apply_patch(original: Iterable[str], hunks: List[Hunk], newline: str = "\n") -> Iterator[str]:
+    """
+    The patched file, line by line, from the original's lines (with their endings). Unchanged lines
+    are passed through as they are; added lines end with `newline`. A line that used to end the file
+    without a newline gets one when something now follows it.
+    """
+    last = None
+    for line in _patched(original, hunks, newline):
+        if last is not None and not last.endswith("\n"):
+            yield newline
+        yield line
+        last = line
+
+
+def _patched(original: Iterable[str], hunks: List[Hunk], newline: str) -> Iterator[str]:
+    lines = iter(original)
+    number = 0      # original lines consumed
+    for hunk in hunks:
+        if hunk.start - 1 < number:
+            raise PatchError(f"hunk at line {hunk.start} overlaps the previous one")
+        while number < hunk.start - 1:
+            line = next(lines, None)
+            if line is None:
+                raise PatchError(f"hunk at line {hunk.start} is past the end of the file ({number} lines)")
+            number += 1
+            yield line
+        last_added = max((i for i, (op, _) in enumerate(hunk.lines) if op == "+"), default=None)
+        for i, (op, text) in enumerate(hunk.lines):
+            if op == "+":
+                yield text if hunk.no_eol and i == last_added else text + newline
+                continue
+            line = next(lines, None)
+            number += 1
+            if line is None or _strip_eol(line) != text:
+                found = "end of file" if line is None else repr(_strip_eol(line)[:80])
+                raise PatchError(f"line {number} doesn't match the patch: expected {text[:80]!r}, found {found}")
+            if op == " ":
+                yield line
+    yield from lines
+
+
+def _chunks(content: str, size: int = FILE_WRITE_CHUNK) -> Iterator[str]:
+    for i in range(0, len(content), size):
+        yield content[i:i + size]
+
+
+def _newline_of(f: TextIO) -> str:
+    first = f.readline()
+    f.seek(0)
+    return "\r\n" if first.endswith("\r\n") else "\n"
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: Path, pieces: Iterable[str]) -> Dict:
+    """
+    Write `pieces` to `path` via a temp file and a rename. If the result is byte-for-byte what's already
+    there, the temp file is dropped and the target isn't touched. Returns bytes, sha256 and changed.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for piece in pieces:
+                data = piece.encode("utf-8")
+                digest.update(data)
+                size += len(data)
+                f.write(data)
+            f.flush()
+            sha256 = digest.hexdigest()
+            try:
+                current = path.stat()
+            except FileNotFoundError:
+                current = None
+            if current is not None and current.st_size == size and file_digest(path) == sha256:
+                os.unlink(tmp)
+                return {"bytes": size, "sha256": sha256, "changed": False}
+            if FILE_WRITE_FSYNC:
+                os.fsync(f.fileno())
+        os.chmod(tmp, current.st_mode & 0o7777 if current is not None else NEW_FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if FILE_WRITE_FSYNC:
+        _fsync_dir(path.parent)
+    return {"bytes": size, "sha256": sha256, "changed": True}
+
+
+def modify(filepath: str, content: Optional[str] = None, patch: Optional[str] = None) -> Dict:
+    """
+    file.modify: replace the file with `content`, or apply the unified diff `patch` to it. Exactly one
+    is needed; content="" is an empty file, content=None with no patch is an error, not a truncation.
+    """
+    path = Path(filepath)
+    if patch:
+        if content:
+            return {"error": "pass either content or patch, not both"}
+        try:
+            hunks = parse_patch(patch)
+            if path.exists():
+                with open(path, "r", encoding="utf-8", newline="") as original:
+                    result = write_atomic(path, apply_patch(original, hunks, _newline_of(original)))
+            else:
+                result = write_atomic(path, apply_patch([], hunks))
+        except PatchError as e:
+            return {"error": f"Failed to patch {filepath}: {e}"}
+        except Exception as e:
+            return {"error": f"Failed to write file {filepath}: {e}"}
+        result["hunks"] = len(hunks)
+        verb = "patched"
+    elif content is None:
+        return {"error": "content or patch is required"}
+    else:
+        try:
+            result = write_atomic(path, _chunks(content))
+        except Exception as e:
+            return {"error": f"Failed to write file {filepath}: {e}"}
+        verb = "created/modified"
+    if result["changed"]:
+        logging.info(f"Successfully wrote {result['bytes']} bytes to {filepath}")
+        message = f"File {filepath} {verb} successfully"
+    else:
+        logging.info(f"{filepath} already up to date, not rewritten")
+        message = f"File {filepath} already up to date"
+    return {"success": True, "filepath": filepath, "message": message, **result}
@@ -1,40 +1,349 @@
-
-
 from action import Action
-from google import generativeai as genai
+from plan_cache import PlanCache
+from batching import MicroBatcher
+from stream_parse import ActionStreamParser
+from router import ToolRouter, build_instruction, estimate_tokens, tool_key
+from backends import MODEL_BACKEND, PLAN_STEPS, ModelBackend, make_backend
+from schema import PlanError, parse
+from registry import ActionRegistry, InvalidAction
+from plan import plan_errors
 from dotenv import load_dotenv
+from collections import OrderedDict
+import asyncio
+import logging
+import time
 import os
 import json
+from pathlib import Path
+from typing import Optional
 
 load_dotenv()
 
-class Model:
+# prompt files live next to this module, whatever the working directory
+PROMPT_DIR = Path(__file__).parent
+
+# max number of planning calls allowed in flight at once (per worker)
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# set to 0 to plan every description from scratch
+PLAN_CACHE = os.getenv("PLAN_CACHE", "1") == "1"
+# set to 0 to always send every tool in actions.json
+TOOL_ROUTING = os.getenv("TOOL_ROUTING", "1") == "1"
+# distinct routed tool sets to keep a built system instruction for
+ROUTED_MODELS = 32
+# set to 1 to plan concurrent descriptions together in one call
+GEMINI_BATCH = os.getenv("GEMINI_BATCH", "0") == "1"
+# how long the first description of a batch waits for company
+GEMINI_BATCH_WINDOW_MS = float(os.getenv("GEMINI_BATCH_WINDOW_MS", "10"))
+# most descriptions planned by one call
+GEMINI_BATCH_MAX = int(os.getenv("GEMINI_BATCH_MAX", "8"))
+
+# extra calls allowed to repair a response that isn't a valid action
+PLAN_REPAIR_RETRIES = int(os.getenv("PLAN_REPAIR_RETRIES", "1"))
+
+REPAIR_PROMPT = """Your response to the task below was not a valid {kind}: {errors}.
+Respond with only the corrected JSON {kind} object.
+
+Task: {task}
+
+Your response:
+{response}"""
+
+BATCH_PROMPT = """Plan each of the following {n} tasks independently, exactly as if each had been sent on its own.
+Respond with only a JSON array of {n} {kind} objects, one per task, in the same order as the tasks.
+
+Tasks (a JSON array of strings):
+{tasks}"""
+
+class CallStats:
+    """Running totals for planning calls made with one kind of system instruction."""
     def __init__(self):
+        self.calls = 0
+        self.instruction_tokens = 0
+        self.seconds = 0.0
+
+    def record(self, instruction_tokens: int, seconds: float):
+        self.calls += 1
+        self.instruction_tokens += instruction_tokens
+        self.seconds += seconds
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "avg_instruction_tokens": self.instruction_tokens / self.calls if self.calls else None,
+            "avg_latency_ms": 1000 * self.seconds / self.calls if self.calls else None,
+        }
+
+class Model:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, cache_store=None, backend: Optional[ModelBackend] = None):
+        """
+        cache_store: optional TaskManager used as the shared tier of the plan cache
+        backend: what generates the text; defaults to the one named by MODEL_BACKEND (see backends.py)
+        """
         GEMINI_API_KEY = os.getenv
-        with open("backbone.txt") as f:
+        # multi-step plans get their own instructions (the default asks for just the first step)
+        self.steps = PLAN_STEPS
+        with open(PROMPT_DIR / ("backbone_steps.txt" if self.steps else "backbone.txt")) as f:
             SYS_INSTR = f.read()
-        with open("actions.json") as f:
-            SYS_INSTR += f.read()
+        self.backbone = SYS_INSTR
+        with open(PROMPT_DIR / "actions.json") as f:
+            actions = f.read()
+            SYS_INSTR += actions
+        self.actions = json.loads(actions)
+        self.registry = ActionRegistry(self.actions)
         
         if not SYS_INSTR:
             raise Exception("where yo prompt at")
         if not GEMINI_API_KEY:
             raise Exception("where yo key at")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
         
+        self.instruction = SYS_INSTR
+        self.backend = backend or make_backend(MODEL_BACKEND, self.actions)
+
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # plans from different backends (offline ones especially) must never be served for each other
+        self.cache = PlanCache(f"{self.backend.name}\n{SYS_INSTR}", store=cache_store) if PLAN_CACHE else None
+
+        self.router = ToolRouter(self.actions) if TOOL_ROUTING else None
+        self._routed_instructions = OrderedDict()
+        self.full_instruction_tokens = estimate_tokens(SYS_INSTR)
+        self.full_stats = CallStats()
+        self.routed_stats = CallStats()
+        self.route_seconds = 0.0
+
+        self.batcher = MicroBatcher(self._plan_batch, GEMINI_BATCH_WINDOW_MS / 1000, GEMINI_BATCH_MAX) if GEMINI_BATCH else None
+        self.batch_fallbacks = 0
+
+        self.parse_failures = 0       # responses that weren't JSON
+        self.validation_failures = 0  # JSON that didn't match the chosen action's schema
+        self.repairs = 0              # repair calls made
+        self.repaired = 0             # repair calls that produced a valid action
+        self.invalid = 0              # plans given up on
+
+    def _select_model(self, q: str):
+        """
+        (tools, system instruction, instruction token estimate, stats bucket) for a query. With routing
+        on, the model only sees the tools the router picked.
+        """
+        if not self.router:
+            return self.actions, self.instruction, self.full_instruction_tokens, self.full_stats
+        start = time.perf_counter()
+        tools = self.router.route(q)
+        self.route_seconds += time.perf_counter() - start
+        return self._model_for(tools)
+
+    def _select_batch_model(self, qs: list):
+        """_select_model() for several queries at once: the model sees every tool any of them was routed to."""
+        if not self.router:
+            return self.actions, self.instruction, self.full_instruction_tokens, self.full_stats
+        start = time.perf_counter()
+        chosen = {tool_key(spec) for q in qs for spec in self.router.route(q)}
+        self.route_seconds += time.perf_counter() - start
+        return self._model_for([spec for spec in self.actions if tool_key(spec) in chosen])
+
+    def _model_for(self, tools: list):
+        if len(tools) == len(self.actions):
+            return self.actions, self.instruction, self.full_instruction_tokens, self.full_stats
+
+        key = tuple(tool_key(spec) for spec in tools)
+        entry = self._routed_instructions.get(key)
+        if entry is None:
+            instruction = build_instruction(self.backbone, tools)
+            # the same string object every time, so backends keyed on it don't rehash it
+            entry = (instruction, estimate_tokens(instruction))
+            self._routed_instructions[key] = entry
+            if len(self._routed_instructions) > ROUTED_MODELS:
+                self._routed_instructions.popitem(last=False)
+        else:
+            self._routed_instructions.move_to_end(key)
+        logging.info(f"routed to {['.'.join(k) for k in key]}: ~{entry[1]} instruction tokens (full ~{self.full_instruction_tokens})")
+        return tools, entry[0], entry[1], self.routed_stats
+
+    def query_action(self, q: str) -> dict:
+        if self.cache:
+            plan = self.cache.get(q)
+            if plan is not None:
+                return plan
+        call = self._select_model(q)
+        tools, instruction, tokens, stats = call
+        start = time.perf_counter()
+        text = self.backend.generate(instruction, tools, q)
+        stats.record(tokens, time.perf_counter() - start)
+        plan, errors = self._check(text)
+        for _ in range(PLAN_REPAIR_RETRIES if errors else 0):
+            self.repairs += 1
+            start = time.perf_counter()
+            text = self.backend.generate(instruction, tools, self._repair_prompt(q, text, errors))
+            stats.record(tokens, time.perf_counter() - start)
+            plan, errors = self._check(text)
+            if not errors:
+                self.repaired += 1
+                break
+        self._give_up(q, errors)
+        if self.cache:
+            self.cache.put(q, plan)
+        return plan
+
+    async def aquery_action(self, q: str) -> dict:
+        """
+        Same as query_action() but awaits the native async client, so planning
+        never blocks the event loop. At most max_concurrency calls run at once.
+        """
+        if self.cache:
+            plan = await self.cache.aget(q)
+            if plan is not None:
+                return plan
+        if self.batcher:
+            plan = await self.batcher.submit(q)
+        else:
+            plan = await self._agenerate(q)
+        if self.cache:
+            await self.cache.aput(q, plan)
+        return plan
+
+    async def _agenerate(self, q: str) -> dict:
+        call = self._select_model(q)
+        text = await self._acall(call, q)
+        return await self._afinish(q, text, call)
+
+    async def _acall(self, call, prompt: str, batch: Optional[list] = None) -> str:
+        tools, instruction, tokens, stats = call
+        async with self._slots:
+            start = time.perf_counter()
+            text = await self.backend.agenerate(instruction, tools, prompt, batch=batch)
+            stats.record(tokens, time.perf_counter() - start)
+        return text
+
+    async def _afinish(self, q: str, text: str, call) -> dict:
+        """
+        Validated plan from a response, asking again with the errors spelled out (at most
+        PLAN_REPAIR_RETRIES times, with the same tools) if it isn't a valid action.
+        """
+        plan, errors = self._check(text)
+        for _ in range(PLAN_REPAIR_RETRIES if errors else 0):
+            self.repairs += 1
+            text = await self._acall(call, self._repair_prompt(q, text, errors))
+            plan, errors = self._check(text)
+            if not errors:
+                self.repaired += 1
+                break
+        self._give_up(q, errors)
+        return plan
+
+    def _check(self, text: str):
+        """(plan, problems with it)"""
         try:
-            self.model = genai.GenerativeModel(
-                'gemini-2.5-flash',
-                system_instruction=SYS_INSTR
-            )
-            assert(self.model)
+            plan = parse(text)
+        except PlanError as e:
+            self.parse_failures += 1
+            return None, [str(e)]
+        errors = plan_errors(plan, self.registry)
+        if errors:
+            self.validation_failures += 1
+        return plan, errors
 
+    def _repair_prompt(self, q: str, text: str, errors: list) -> str:
+        return REPAIR_PROMPT.format(kind=self._kind(), errors="; ".join(errors), task=q, response=text)
+
+    def _kind(self) -> str:
+        return "plan" if self.steps else "action"
+
+    def _give_up(self, q: str, errors: list):
+        if errors:
+            self.invalid += 1
+            logging.warning(f"no valid plan for {q!r}: {errors}")
+            raise PlanError(f"model returned an invalid {self._kind()}: {'; '.join(errors)}")
+
+    async def _plan_batch(self, qs: list) -> list:
+        """
+        Plans for several queries from one call. Items the batched answer doesn't give a usable
+        action for (unparseable response, wrong length, unknown tool) are planned on their own.
+        """
+        if len(qs) == 1:
+            return await asyncio.gather(self._agenerate(qs[0]), return_exceptions=True)
+        call = self._select_batch_model(qs)
+        prompt = BATCH_PROMPT.format(n=len(qs), kind=self._kind(), tasks=json.dumps(qs, indent=2))
+        try:
+            text = await self._acall(call, prompt, batch=qs)
+            try:
+                plans = parse(text)
+            except PlanError:
+                self.parse_failures += 1
+                raise
+            if not isinstance(plans, list) or len(plans) != len(qs):
+                raise ValueError(f"expected a list of {len(qs)} actions")
         except Exception as e:
-            raise Exception(f"Error during model configuration: {e}")
+            logging.warning(f"batched planning of {len(qs)} tasks failed, planning them one by one: {e}")
+            plans = [None] * len(qs)
 
-    def query_action(self, q: str) -> dict:
-        resp = self.model.generate_content(q)
-        resp = resp.text
-        assert(resp)
-        if resp.startswith("```json"):
-            resp = resp.strip("```json\n").strip("`")
-        return json.loads(resp)
+        retry = [i for i, plan in enumerate(plans) if plan is None or plan_errors(plan, self.registry)]
+        self.batch_fallbacks += len(retry)
+        if retry:
+            redone = await asyncio.gather(*(self._agenerate(qs[i]) for i in retry), return_exceptions=True)
+            for i, plan in zip(retry, redone):
+                plans[i] = plan
+        return plans
+
+    async def astream_action(self, q: str):
+        """
+        Streamed aquery_action(). Yields ("header", {integration, action, webhook}) as soon as those
+        three have been generated and checked against actions.json, ("partial", plan so far) after
+        every chunk, and finally ("plan", plan). An unknown tool raises PlanError right away instead
+        of after the rest of the args have been generated.
+        """
+        if self.cache:
+            plan = await self.cache.aget(q)
+            if plan is not None:
+                yield "plan", plan
+                return
+        call = self._select_model(q)
+        tools, instruction, tokens, stats = call
+        parser = ActionStreamParser()
+        header = None
+        async with self._slots:
+            start = time.perf_counter()
+            async for chunk in self.backend.astream(instruction, tools, q):
+                parser.feed(chunk)
+                if header is None:
+                    header = parser.header()
+                    if header is not None:
+                        self._check_header(header)
+                        yield "header", header
+                partial = parser.partial()
+                if partial is not None:
+                    yield "partial", partial
+            stats.record(tokens, time.perf_counter() - start)
+        plan = await self._afinish(q, parser.text, call)
+        if self.cache:
+            await self.cache.aput(q, plan)
+        yield "plan", plan
+
+    def _check_header(self, header: dict):
+        try:
+            self.registry.resolve({**header, "args": {}}, check_args=False)
+        except InvalidAction as e:
+            raise PlanError(f"model chose an invalid action: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "max_concurrency": self.max_concurrency,
+            "plan_cache": self.cache.stats() if self.cache else None,
+            "routing": {
+                "enabled": self.router is not None,
+                "full_instruction_tokens": self.full_instruction_tokens,
+                "full": self.full_stats.to_dict(),
+                "routed": self.routed_stats.to_dict(),
+                "total_route_ms": 1000 * self.route_seconds,
+            },
+            "batching": {**self.batcher.stats(), "fallbacks": self.batch_fallbacks} if self.batcher else None,
+            "validation": {
+                "parse_failures": self.parse_failures,
+                "validation_failures": self.validation_failures,
+                "repairs": self.repairs,
+                "repaired": self.repaired,
+                "invalid": self.invalid,
+            },
+        }
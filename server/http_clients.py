@@ -0,0 +1,63 @@
+"""
+Shared, long-lived HTTP client for webhook dispatch.
+
+session() is a requests.Session shared by the job runner's worker threads, with keep-alive
+connections pooled per host. Dispatch is synchronous only: there is no async client, and requests
+speaks HTTP/1.1.
+
+Timeouts are (connect, read) seconds: WEBHOOK_CONNECT_TIMEOUT / WEBHOOK_TIMEOUT by default, and
+<WEBHOOK>_TIMEOUT (NOTION_TIMEOUT, EMAIL_TIMEOUT, GCAL_TIMEOUT, SHEETS_TIMEOUT, ...) overrides the
+read timeout for one webhook.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# connections kept open per n8n host
+WEBHOOK_POOL_SIZE = int(os.getenv("WEBHOOK_POOL_SIZE", "10"))
+WEBHOOK_CONNECT_TIMEOUT = float(os.getenv("WEBHOOK_CONNECT_TIMEOUT", "5"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "30"))
+
+_lock = threading.Lock()
+_session = None
+
+
+def timeout_for(webhook: str) -> Tuple[float, float]:
+    """(connect, read) timeout in seconds for a webhook env var name."""
+    read = os.getenv(f"{webhook}_TIMEOUT")
+    return (WEBHOOK_CONNECT_TIMEOUT, float(read) if read else WEBHOOK_TIMEOUT)
+
+
+def session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                s = requests.Session()
+                # pool_block: threads beyond the pool size wait for a connection instead of opening
+                # (and then throwing away) an extra one
+                adapter = HTTPAdapter(pool_connections=WEBHOOK_POOL_SIZE, pool_maxsize=WEBHOOK_POOL_SIZE, pool_block=True)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+def stats() -> Dict:
+    return {
+        "pool_size": WEBHOOK_POOL_SIZE,
+        "session_open": _session is not None,
+    }
+
+
+def close():
+    """Close the session; the next use opens a new one."""
+    global _session
+    with _lock:
+        s, _session = _session, None
+    if s is not None:
+        s.close()
@@ -0,0 +1,119 @@
+"""
+Idempotency keys for /start and /new.
+
+A request sent with an `Idempotency-Key` header is run at most once per key:
+
+- a request whose key is already running waits for that run and gets its response, instead of
+  starting its own
+- completed responses (and 4xx errors, which a retry would only repeat) are kept for IDEMPOTENCY_TTL
+  seconds and replayed to retries; 5xx errors and crashes aren't kept, so a retry runs again
+- reusing a key for a different request (another task id or description) is rejected with a 422
+
+Keys live in memory, per worker, like the plan cache's memory tier. /start also claims the task row
+atomically, so duplicates that reach different workers still never dispatch twice.
+"""
+
+import os
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# longest key accepted; keys are client-generated (a UUID is 36 characters)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# ("ok", response body) or ("error", HTTPException)
+Outcome = Tuple[str, object]
+
+
+class IdempotencyStore:
+    def __init__(self, maxsize: int = IDEMPOTENCY_MAX_KEYS, ttl: int = IDEMPOTENCY_TTL):
+        self.completed = TTLCache(maxsize=maxsize, ttl=ttl)   # key -> (fingerprint, outcome)
+        self.in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()  # TTLCache isn't thread safe
+        self.runs = 0
+        self.replayed = 0
+        self.collapsed = 0
+        self.conflicts = 0
+
+    async def run(self, key: Optional[str], fingerprint: str, call: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """
+        (response body, whether it was replayed) for a request: call() once per key, the stored or
+        in-flight outcome for repeats. Without a key, call() just runs.
+        """
+        if not key:
+            return await call(), False
+        outcome = await self.begin(key, fingerprint)
+        if outcome is not None:
+            return self.unwrap(outcome), True
+        try:
+            body = await call()
+        except HTTPException as e:
+            self.finish(key, ("error", e), keep=e.status_code < 500)
+            raise
+        except BaseException:
+            self.finish(key, None, keep=False)
+            raise
+        self.finish(key, ("ok", body))
+        return body, False
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[Outcome]:
+        """
+        The outcome to answer a repeat with, or None if the caller owns the key and must call finish().
+        Waits for an in-flight run of the same key; raises HTTPException for a malformed or reused key.
+        """
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail=f"{HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+        while True:
+            with self._lock:
+                stored = self.completed.get(key)
+                running = self.in_flight.get(key)
+                if stored is None and running is None:
+                    self.in_flight[key] = (fingerprint, asyncio.get_running_loop().create_future())
+                    self.runs += 1
+                    return None
+            theirs, outcome = stored if stored is not None else running
+            if theirs != fingerprint:
+                self.conflicts += 1
+                raise HTTPException(status_code=422, detail=f"{HEADER} {key!r} was already used for a different request")
+            if stored is not None:
+                self.replayed += 1
+                return outcome
+            self.collapsed += 1
+            # shielded so a client hanging up doesn't cancel the run everyone else is waiting on
+            outcome = await asyncio.shield(outcome)
+            if outcome is not None:
+                return outcome
+            # the run failed without a response worth keeping; try it again ourselves
+
+    def finish(self, key: str, outcome: Optional[Outcome], keep: bool = True):
+        """Release a key taken by begin(), storing the outcome for repeats if `keep`."""
+        with self._lock:
+            fingerprint, future = self.in_flight.pop(key)
+            if keep and outcome is not None:
+                self.completed[key] = (fingerprint, outcome)
+        future.set_result(outcome if keep else None)
+
+    @staticmethod
+    def unwrap(outcome: Outcome):
+        kind, value = outcome
+        if kind == "error":
+            raise HTTPException(status_code=value.status_code, detail=value.detail)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "stored": len(self.completed),
+                "in_flight": len(self.in_flight),
+                "runs": self.runs,
+                "replayed": self.replayed,
+                "collapsed": self.collapsed,
+                "conflicts": self.conflicts,
+            }
@@ -0,0 +1,239 @@
+"""
+In-process background runner for task actions.
+
+/start hands the task's Plan (a single action or a DAG of steps, see plan.py) to the runner and gets a
+job id back. A worker thread makes the webhook calls, writes progress to the task row as it goes,
+stores what the action returned in task_results and then sets the task's final status:
+
+    QUEUED -> RUNNING -> COMPLETED   (task: STARTED -> COMPLETED, progress=1.0)
+                      -> FAILED      (task: STARTED -> FAILED)
+
+Job records only live in memory. Tasks of live jobs get a heartbeat, and reap() fails STARTED tasks
+whose heartbeat stopped (their job was lost to a restart or crash).
+"""
+
+import os
+import uuid
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from plan import Plan, failure_message, is_failure
+
+# number of worker threads running actions
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# number of finished jobs kept around for /jobs/{job_id}
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))
+# seconds between heartbeats for the tasks of queued and running jobs
+JOB_HEARTBEAT = int(os.getenv("JOB_HEARTBEAT", "60"))
+# a STARTED task without a heartbeat for this many seconds has lost its job (restart, crash) and is failed
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+
+class Job:
+    def __init__(self, task_id: int, action: Plan):
+        self.id = uuid.uuid4().hex
+        self.task_id = task_id
+        self.action = action
+        self.status = QUEUED
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = None  # latest details from a running action
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "task_id": self.task_id,
+            "status": self.status,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+        }
+
+
+class JobRunner:
+    def __init__(self, task_mgr, workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.task_mgr = task_mgr
+        self.workers = workers
+        self.history = history
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def submit(self, task_id: int, action: Plan) -> str:
+        """Queue an action for a task and return the job id."""
+        job = Job(task_id, action)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._queued += 1
+            self._trim()
+        try:
+            self.executor.submit(self._run, job)
+        except Exception:
+            # shut down: the job will never run, so don't track (or heartbeat) it
+            with self._lock:
+                self.jobs.pop(job.id, None)
+                self._queued -= 1
+            raise
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker."""
+        return self._queued
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queued,
+                "running": self._running,
+                "tracked_jobs": len(self.jobs),
+            }
+
+    def active_task_ids(self) -> List[int]:
+        """Tasks of the jobs that are queued or running here."""
+        with self._lock:
+            return [job.task_id for job in self.jobs.values() if job.status in (QUEUED, RUNNING)]
+
+    def reap(self, stale_after: int = JOB_STALE_AFTER) -> List[int]:
+        """Heartbeat our own tasks, then fail STARTED tasks nobody has heartbeated. Returns the failed ids."""
+        self.task_mgr.touch_tasks(self.active_task_ids())
+        failed = self.task_mgr.fail_stale_tasks(stale_after)
+        if failed:
+            logging.warning(f"failed tasks whose jobs were lost: {failed}")
+        return failed
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        if not wait:
+            # cancelled before they ran; give their tasks back instead of leaving them STARTED
+            with self._lock:
+                cancelled = [job for job in self.jobs.values() if job.status == QUEUED]
+            for job in cancelled:
+                job.status = FAILED
+                job.error = "server shut down before the job ran"
+                try:
+                    self.task_mgr.transition_task(job.task_id, "STARTED", FAILED)
+                except Exception as e:
+                    logging.error(f"job {job.id}: failed to release task {job.task_id}: {e}")
+
+    def _run(self, job: Job):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        job.status = RUNNING
+        job.started_at = time.time()
+        logging.info(f"job {job.id}: running task {job.task_id}: {job.action}")
+        try:
+            result, status = self._call(job)
+            # results are stored before the task is marked done, so they're there once it is
+            self._record(job, result, status, time.time())
+            self._finish(job, status)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _call(self, job: Job):
+        """(what the action returned, COMPLETED or FAILED), with job.error set on failure"""
+        try:
+            result = job.action.call(progress=lambda fraction, details: self._progress(job, fraction, details))
+        except Exception as e:
+            logging.error(f"job {job.id}: task {job.task_id} failed: {e}")
+            job.error = str(e)
+            return None, FAILED
+        if is_failure(result):
+            # a multi-step plan's result carries its own error; otherwise describe the action's failure
+            job.error = failure_message(result, getattr(job.action, "single", None) or job.action)
+            return result, FAILED
+        return result, COMPLETED
+
+    def _progress(self, job: Job, fraction: float, details: Dict):
+        job.progress = details
+        # only while the task is still STARTED; this also bumps updated_at, so it doubles as a heartbeat
+        self.task_mgr.transition_task(job.task_id, "STARTED", "STARTED", progress=fraction)
+
+    def _record(self, job: Job, result, status: str, finished_at: float):
+        """Write what the action returned to task_results: one row, or one per step of a multi-step plan."""
+        steps = result.get("steps") if isinstance(result, dict) and getattr(job.action, "steps", None) else None
+        if steps:
+            rows = [{
+                "task_id": job.task_id,
+                "job_id": job.id,
+                "step": id,
+                "status": step["status"].upper(),
+                "result": step.get("result"),
+                "error": step.get("error"),
+                "started_at": step.get("started_at"),
+                "finished_at": step.get("finished_at"),
+            } for id, step in steps.items()]
+        else:
+            rows = [{
+                "task_id": job.task_id,
+                "job_id": job.id,
+                "status": status,
+                "result": result,
+                "error": job.error,
+                "started_at": job.started_at,
+                "finished_at": finished_at,
+            }]
+        try:
+            self.task_mgr.add_task_results(rows)
+        except Exception as e:
+            logging.error(f"job {job.id}: failed to store results for task {job.task_id}: {e}")
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        try:
+            # only a task still marked STARTED is ours to finish; it may have been edited or reset meanwhile
+            if status == COMPLETED:
+                self.task_mgr.transition_task(job.task_id, "STARTED", COMPLETED, progress=1.0)
+            else:
+                self.task_mgr.transition_task(job.task_id, "STARTED", FAILED)
+        except Exception as e:
+            logging.error(f"job {job.id}: failed to write status back to task {job.task_id}: {e}")
+        logging.info(f"job {job.id}: task {job.task_id} {status} in {job.finished_at - job.started_at:.2f}s")
+
+    def _trim(self):
+        # drop the oldest finished jobs once we are over the history limit
+        excess = len(self.jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].status in (COMPLETED, FAILED):
+                del self.jobs[job_id]
+                excess -= 1
+
+
+async def reap_periodically(runner: JobRunner, interval: float = JOB_HEARTBEAT, stale_after: int = JOB_STALE_AFTER):
+    """runner.reap() now and every `interval` seconds, until cancelled."""
+    while True:
+        try:
+            await asyncio.to_thread(runner.reap, stale_after)
+        except Exception as e:
+            logging.warning(f"task reaper failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,144 @@
+"""
+Execution policy for local (TERMINAL/FILES) actions. Every local side effect goes through
+LOCAL_EXECUTOR.run(directory, fn):
+
+- at most LOCAL_MAX_CONCURRENCY local actions run at once, across all job workers
+- actions on overlapping directories (the same one, or one inside the other) run one at a time, in
+  arrival order; the directory is claimed before a global slot, so queued work never holds a slot
+- terminal commands run in child processes started with limit_child(): CPU seconds, address space
+  and file size rlimits, and a lower scheduling priority than the server. File actions run in the
+  server process and get no rlimits, only the two limits above
+- queue wait and run time are measured per action (added to its result as "timing") and in total
+"""
+
+import os
+import time
+import itertools
+import logging
+import resource
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# local actions running at once
+LOCAL_MAX_CONCURRENCY = int(os.getenv("LOCAL_MAX_CONCURRENCY", "2"))
+# per-command limits for terminal actions; 0 disables a limit. The memory limit is on address space,
+# which runtimes like node reserve generously, so it's set well above what commands actually use
+LOCAL_CPU_SECONDS = int(os.getenv("LOCAL_CPU_SECONDS", "120"))
+LOCAL_MEMORY_MB = int(os.getenv("LOCAL_MEMORY_MB", "4096"))
+LOCAL_FILE_MB = int(os.getenv("LOCAL_FILE_MB", "1024"))
+# added to the server's niceness for terminal commands
+LOCAL_NICE = int(os.getenv("LOCAL_NICE", "10"))
+
+
+# worked out here rather than in limit_child(): the forked child of a multithreaded server must not
+# import anything (another thread may have held the import lock at fork time) and should do little else
+CHILD_LIMITS = [(limit, value) for limit, value in (
+    (resource.RLIMIT_CPU, LOCAL_CPU_SECONDS),
+    (resource.RLIMIT_AS, LOCAL_MEMORY_MB * 1024 * 1024),
+    (resource.RLIMIT_FSIZE, LOCAL_FILE_MB * 1024 * 1024),
+) if value > 0]
+
+
+def limit_child():
+    """preexec_fn for terminal commands; runs in the child between fork and exec."""
+    for limit, value in CHILD_LIMITS:
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (value if hard == resource.RLIM_INFINITY else min(value, hard), hard))
+    if LOCAL_NICE:
+        os.nice(LOCAL_NICE)
+
+
+def overlaps(a: str, b: str) -> bool:
+    """Whether two real paths are the same directory or one contains the other."""
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+class LocalExecutor:
+    def __init__(self, max_concurrency: int = LOCAL_MAX_CONCURRENCY):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._dir_free = threading.Condition(self._lock)
+        self._dirs_held: List[str] = []
+        self._dirs_waiting: List[Tuple[int, str]] = []   # (ticket, directory) in arrival order
+        self._tickets = itertools.count()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def run(self, directory: str, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) under the concurrency cap, with `directory` claimed."""
+        key = os.path.realpath(directory or ".")
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        self._acquire_dir(key)
+        try:
+            with self._slots:
+                started = time.perf_counter()
+                with self._lock:
+                    self.waiting -= 1
+                    self.running += 1
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    finished = time.perf_counter()
+                    self._record(started - queued, finished - started)
+        finally:
+            self._release_dir(key)
+        wait, run = started - queued, finished - started
+        if wait > 1:
+            logging.info(f"local action on {key} waited {wait:.1f}s for a slot")
+        if isinstance(result, dict):
+            result["timing"] = {"queue_ms": round(1000 * wait, 1), "run_ms": round(1000 * run, 1)}
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "waiting": self.waiting,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_queue_ms": 1000 * self.total_wait / self.completed if self.completed else None,
+                "max_queue_ms": 1000 * self.max_wait,
+                "avg_run_ms": 1000 * self.total_run / self.completed if self.completed else None,
+                "max_run_ms": 1000 * self.max_run,
+            }
+
+    def _acquire_dir(self, key: str):
+        """Wait until no running action, and no earlier waiting one, is on an overlapping directory."""
+        with self._dir_free:
+            ticket = (next(self._tickets), key)
+            self._dirs_waiting.append(ticket)
+            while self._dir_blocked(ticket):
+                self._dir_free.wait()
+            self._dirs_waiting.remove(ticket)
+            self._dirs_held.append(key)
+
+    def _dir_blocked(self, ticket: Tuple[int, str]) -> bool:
+        earlier = [key for other, key in self._dirs_waiting if other < ticket[0]]
+        return any(overlaps(ticket[1], key) for key in self._dirs_held + earlier)
+
+    def _release_dir(self, key: str):
+        with self._dir_free:
+            self._dirs_held.remove(key)
+            self._dir_free.notify_all()
+
+    def _record(self, wait: float, run: float):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run
+            self.max_run = max(self.max_run, run)
+
+
+LOCAL_EXECUTOR = LocalExecutor()
@@ -0,0 +1,329 @@
+"""
+Multi-step plans: a DAG of actions run as one task.
+
+With PLAN_STEPS=1 the planner returns every step with its dependencies:
+
+    {"steps": [
+        {"id": "events", "integration": "gcal", "action": "search", "args": {...}, "webhook": "GCAL"},
+        {"id": "mail", "integration": "email", "action": "search", "args": {...}, "webhook": "EMAIL"},
+        {"id": "notes", "integration": "notion", "action": "create", "webhook": "NOTION",
+         "args": {"page_name": "Today", "page_content": "Events: {{events}}\\nMail: {{mail.0.subject}}"},
+         "depends_on": ["events", "mail"]}
+    ]}
+
+- a step starts as soon as every step it depends on has completed, so independent steps (events and
+  mail above) are dispatched concurrently, on a pool of PLAN_STEP_WORKERS threads
+- "{{id}}" / "{{id.key.0.key}}" in a string arg is replaced with (part of) that step's output; an arg
+  that is nothing but a template gets the value itself, anything else gets it as text. Referring to a
+  step makes it a dependency. Outputs are data, never code: what goes into a terminal command is
+  shell-quoted, and paths (working_dir, filepath) can't be templated at all
+- once a step fails nothing new is started, and the steps that were waiting on it are skipped
+- progress is the average over steps (running local steps report their own), with per-step status
+
+A plain action is a one-step plan, so single-action tasks and planners work unchanged.
+"""
+
+import os
+import re
+import json
+import shlex
+import time
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from action import Action
+from registry import REGISTRY, ActionRegistry, InvalidAction
+from schema import ACTION_KEYS
+
+# most steps one plan may have
+PLAN_MAX_STEPS = int(os.getenv("PLAN_MAX_STEPS", "10"))
+# threads dispatching steps, shared by every running plan
+PLAN_STEP_WORKERS = int(os.getenv("PLAN_STEP_WORKERS", "8"))
+
+TEMPLATE = re.compile(r"\{\{\s*([\w-]+)((?:\.[\w-]+)*)\s*\}\}")
+
+# args whose templates are filled in shell-quoted, so an earlier step's output can't run as shell code
+SHELL_ARGS = {("TERMINAL", "command")}
+# args that can't be templated: an earlier step's output mustn't pick where a command runs or a file is written
+UNTEMPLATED_ARGS = {("TERMINAL", "working_dir"), ("FILES", "filepath")}
+
+# stand-ins for templated args while checking types; the real value is checked when the step runs
+PLACEHOLDERS = {"string": "", "integer": 0, "number": 0, "boolean": False, "array": [], "object": {}}
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+STEP_EXECUTOR = ThreadPoolExecutor(max_workers=PLAN_STEP_WORKERS, thread_name_prefix="step")
+
+
+class StepFailed(RuntimeError):
+    """A step whose action ran but reported failure; keeps what it returned."""
+
+    def __init__(self, message: str, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def is_failure(result) -> bool:
+    """webhook() returns None on transport errors and local handlers return {"error": ...}."""
+    if result is None:
+        return True
+    if isinstance(result, dict):
+        return "error" in result or result.get("success") is False
+    return False
+
+
+def failure_message(result, action: Action) -> str:
+    """What went wrong, for a result is_failure() accepted, in terms of the action that returned it."""
+    if isinstance(result, dict) and "error" in result:
+        return str(result["error"])
+    if isinstance(result, dict) and "return_code" in result:
+        stderr = (result.get("stderr") or "").strip().splitlines()
+        return f"command exited with code {result['return_code']}" + (f": {stderr[-1]}" if stderr else "")
+    if result is None:
+        return f"{action.integration}.{action.action}: no usable response from the {action.webhook} webhook"
+    return f"{action.integration}.{action.action} reported failure"
+
+
+def is_plan(data) -> bool:
+    """Whether data is a multi-step plan rather than a single action."""
+    return isinstance(data, dict) and "steps" in data
+
+
+def references(args: Dict) -> List[str]:
+    """Ids of the steps an args dict refers to with templates."""
+    return [match.group(1) for value in args.values() if isinstance(value, str) for match in TEMPLATE.finditer(value)]
+
+
+def plan_errors(data, registry: ActionRegistry = REGISTRY) -> List[str]:
+    """Problems with a single action or multi-step plan, [] if it can be run."""
+    if not is_plan(data):
+        return registry.errors(data)
+    steps = data["steps"]
+    if not isinstance(steps, list) or not steps:
+        return ["steps must be a non-empty list"]
+    if len(steps) > PLAN_MAX_STEPS:
+        return [f"at most {PLAN_MAX_STEPS} steps are allowed, got {len(steps)}"]
+    errors = []
+    ids = [step.get("id") if isinstance(step, dict) else None for step in steps]
+    for i, (step, id) in enumerate(zip(steps, ids)):
+        if not isinstance(step, dict):
+            errors.append(f"step {i + 1}: expected a JSON object")
+            continue
+        if not isinstance(id, str) or not id:
+            errors.append(f"step {i + 1}: id must be a non-empty string")
+            continue
+        if ids.count(id) > 1:
+            errors.append(f"step {id}: duplicate id")
+        depends_on = step.get("depends_on", [])
+        if not isinstance(depends_on, list):
+            errors.append(f"step {id}: depends_on must be a list of step ids")
+            continue
+        args = step.get("args")
+        for dep in depends_on + (references(args) if isinstance(args, dict) else []):
+            if dep == id or dep not in ids:
+                errors.append(f"step {id}: depends on unknown step {dep}")
+        if isinstance(args, dict):
+            errors += [f"step {id}: {name} can't refer to other steps' outputs" for name, value in args.items()
+                       if (step.get("webhook"), name) in UNTEMPLATED_ARGS and isinstance(value, str) and TEMPLATE.search(value)]
+        errors += [f"step {id}: {error}" for error in registry.errors(_checkable(step, registry))]
+    if not errors and _has_cycle(steps):
+        errors.append("steps depend on each other in a cycle")
+    return errors
+
+
+def _checkable(step: Dict, registry: ActionRegistry) -> Dict:
+    """The step as an action, with templated args swapped for a value of the arg's declared type."""
+    action = {key: step[key] for key in ACTION_KEYS if key in step}
+    args = action.get("args")
+    entry = registry.get(step.get("integration"), step.get("action"))
+    if isinstance(args, dict) and entry is not None:
+        declared = entry.spec.get("args", {})
+        action["args"] = {
+            name: PLACEHOLDERS.get(declared[name].get("type", "string"), value)
+            if name in declared and isinstance(value, str) and TEMPLATE.search(value) else value
+            for name, value in args.items()
+        }
+    return action
+
+
+def _has_cycle(steps: List[Dict]) -> bool:
+    deps = {step["id"]: set(step.get("depends_on", [])) | set(references(step["args"])) for step in steps}
+    done = set()
+    while len(done) < len(deps):
+        ready = [id for id, needs in deps.items() if id not in done and needs <= done]
+        if not ready:
+            return True
+        done.update(ready)
+    return False
+
+
+def lookup(outputs: Dict, id: str, path: str):
+    value = outputs[id]
+    for key in path.split(".")[1:] if path else []:
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise ValueError(f"{{{{{id}{path}}}}}: output of step {id} has no {key!r}")
+    return value
+
+
+def render(args: Dict, outputs: Dict, webhook: Optional[str] = None) -> Dict:
+    """args with the templates filled in from earlier steps' outputs (shell-quoted in SHELL_ARGS)."""
+    rendered = {}
+    for name, value in args.items():
+        if isinstance(value, str) and (webhook, name) in UNTEMPLATED_ARGS and TEMPLATE.search(value):
+            raise ValueError(f"{name} can't refer to other steps' outputs")
+        if isinstance(value, str) and (webhook, name) in SHELL_ARGS:
+            value = TEMPLATE.sub(lambda m: shlex.quote(_text(lookup(outputs, m.group(1), m.group(2)))), value)
+        elif isinstance(value, str):
+            whole = TEMPLATE.fullmatch(value.strip())
+            if whole:
+                value = lookup(outputs, whole.group(1), whole.group(2))
+            else:
+                value = TEMPLATE.sub(lambda m: _text(lookup(outputs, m.group(1), m.group(2))), value)
+        rendered[name] = value
+    return rendered
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+class Step:
+    def __init__(self, data: Dict):
+        self.id = data["id"]
+        self.args = data["args"]
+        self.depends_on = list(dict.fromkeys(data.get("depends_on", []) + references(self.args)))
+        # an args-less Action is a template: its args are checked once they're filled in
+        self.action = Action(data["integration"], data["action"], {}, data["webhook"], template=True)
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, **self.action.to_dict(), "args": self.args, "depends_on": self.depends_on}
+
+    def __str__(self):
+        return f"{self.id}: {self.action.integration}.{self.action.action}"
+
+
+class Plan:
+    def __init__(self, steps: List[Step], single: Optional[Action] = None):
+        self.steps = steps
+        self.single = single   # the action, for a plain single-action plan
+
+    @classmethod
+    def from_dict(cls, data) -> "Plan":
+        """A stored or planned single action or multi-step plan; raises InvalidAction if it can't be run."""
+        errors = plan_errors(data)
+        if errors:
+            raise InvalidAction("; ".join(errors))
+        if not is_plan(data):
+            return cls([], single=Action.from_dict(data))
+        return cls([Step(step) for step in data["steps"]])
+
+    def to_dict(self) -> Dict:
+        if self.single is not None:
+            return self.single.to_dict()
+        return {"steps": [step.to_dict() for step in self.steps]}
+
+    def call(self, progress: Optional[Callable[[float, Dict], None]] = None, executor: ThreadPoolExecutor = STEP_EXECUTOR):
+        """
+        Run the plan and return its result: the action's own for a single action, otherwise
+        {"success", "steps": {id: {"status", "result", "error", "started_at", "finished_at"}}} plus
+        "error" if a step failed.
+        progress: optional (fraction, details) callback, called as steps start, report and finish
+        """
+        if self.single is not None:
+            return self.single.call(progress)
+        return PlanRun(self, progress).run(executor)
+
+    def __str__(self):
+        if self.single is not None:
+            return f"{self.single.integration}.{self.single.action}"
+        return ", ".join(str(step) for step in self.steps)
+
+
+class PlanRun:
+    """State of one execution of a multi-step plan."""
+
+    def __init__(self, plan: Plan, progress: Optional[Callable[[float, Dict], None]] = None):
+        self.plan = plan
+        self.on_progress = progress
+        self.status = {step.id: PENDING for step in plan.steps}
+        self.fraction = {step.id: 0.0 for step in plan.steps}
+        self.results: Dict[str, Dict] = {}
+        self.outputs: Dict[str, object] = {}
+        self.started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def run(self, executor: ThreadPoolExecutor) -> Dict:
+        waiting = list(self.plan.steps)
+        running = {}
+        failed = False
+        while True:
+            if not failed:
+                for step in [step for step in waiting if all(self.status[dep] == COMPLETED for dep in step.depends_on)]:
+                    waiting.remove(step)
+                    self._set(step.id, RUNNING)
+                    running[executor.submit(self._run_step, step)] = step
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                if self._finish(step, future):
+                    failed = True
+        for step in waiting:
+            self.results[step.id] = {"status": SKIPPED}
+            self._set(step.id, SKIPPED)
+
+        result = {"success": not failed, "steps": {step.id: self.results[step.id] for step in self.plan.steps}}
+        if failed:
+            errors = [f"step {id}: {r['error']}" for id, r in result["steps"].items() if r["status"] == FAILED]
+            result["error"] = "; ".join(errors)
+        return result
+
+    def _run_step(self, step: Step):
+        self.started[step.id] = time.time()
+        args = render(step.args, self.outputs, step.action.webhook)
+        result = step.action.call_with_args(args, progress=lambda fraction, details: self._set(step.id, RUNNING, fraction))
+        if is_failure(result):
+            raise StepFailed(failure_message(result, step.action), result)
+        return result
+
+    def _finish(self, step: Step, future) -> bool:
+        """Record a finished step; True if it failed."""
+        timing = {"started_at": self.started.get(step.id), "finished_at": time.time()}
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.warning(f"plan step {step} failed: {e}")
+            self.results[step.id] = {"status": FAILED, "error": str(e), **timing}
+            if getattr(e, "result", None) is not None:
+                self.results[step.id]["result"] = e.result
+            self._set(step.id, FAILED)
+            return True
+        self.outputs[step.id] = result
+        self.results[step.id] = {"status": COMPLETED, "result": result, **timing}
+        self._set(step.id, COMPLETED, 1.0)
+        return False
+
+    def _set(self, id: str, status: str, fraction: Optional[float] = None):
+        with self._lock:
+            self.status[id] = status
+            if fraction is not None:
+                self.fraction[id] = fraction
+            overall = sum(self.fraction.values()) / len(self.fraction)
+            details = {"steps": {id: {"status": self.status[id], "progress": self.fraction[id]} for id in self.status}}
+            # under the lock, so updates from concurrent steps are reported in order
+            if self.on_progress:
+                try:
+                    self.on_progress(overall, details)
+                except Exception as e:
+                    logging.warning(f"plan progress update failed: {e}")
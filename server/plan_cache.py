@@ -0,0 +1,135 @@
+"""
+Cache of planned actions in front of Model.query_action.
+
+Keys are sha256(normalized description + hash of the system instruction), so editing backbone.txt or
+actions.json invalidates every entry without a flush. Two tiers:
+- memory: LRU with a TTL, per worker
+- store: the plan_cache table (TaskManager.get_cached_plan / put_cached_plan), shared across workers
+  and restarts. Store errors are logged and treated as misses; the cache never fails a plan.
+  Expired rows are only skipped on lookup, so prune_periodically() (started by the server) deletes
+  them every PLAN_CACHE_PRUNE_INTERVAL seconds.
+"""
+
+import os
+import copy
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+from cachetools import TTLCache
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "1024"))
+# seconds a cached plan stays valid, in both tiers
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", str(7 * 24 * 3600)))
+# seconds between deletes of expired plans from the store
+PLAN_CACHE_PRUNE_INTERVAL = int(os.getenv("PLAN_CACHE_PRUNE_INTERVAL", "3600"))
+
+
+def normalize(description: str) -> str:
+    """Case and whitespace shouldn't produce a new plan."""
+    return " ".join(description.lower().split())
+
+
+async def prune_periodically(store, ttl: int = PLAN_CACHE_TTL, interval: float = PLAN_CACHE_PRUNE_INTERVAL):
+    """Delete plans older than `ttl` from the store now and every `interval` seconds, until cancelled."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(store.prune_cached_plans, ttl)
+            if removed:
+                logging.info(f"pruned {removed} expired cached plans")
+        except Exception as e:
+            logging.warning(f"plan cache prune failed: {e}")
+        await asyncio.sleep(interval)
+
+
+class PlanCache:
+    def __init__(self, instruction: str, store=None, maxsize: int = PLAN_CACHE_SIZE, ttl: int = PLAN_CACHE_TTL):
+        self.instruction_hash = hashlib.sha256(instruction.encode()).hexdigest()
+        self.store = store
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()  # TTLCache isn't thread safe
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.store_errors = 0
+
+    def key(self, description: str) -> str:
+        return hashlib.sha256(f"{self.instruction_hash}\n{normalize(description)}".encode()).hexdigest()
+
+    def get(self, description: str) -> Optional[Dict]:
+        key = self.key(description)
+        plan = self._get_memory(key)
+        if plan is None:
+            plan = self._get_store(key)
+        if plan is None:
+            self.misses += 1
+        return copy.deepcopy(plan)
+
+    async def aget(self, description: str) -> Optional[Dict]:
+        """get() that only leaves the event loop for the store lookup."""
+        key = self.key(description)
+        plan = self._get_memory(key)
+        if plan is None and self.store is not None:
+            plan = await asyncio.to_thread(self._get_store, key)
+        if plan is None:
+            self.misses += 1
+        return copy.deepcopy(plan)
+
+    def put(self, description: str, plan: Dict):
+        key = self.key(description)
+        self._put_memory(key, plan)
+        self._put_store(key, plan)
+
+    async def aput(self, description: str, plan: Dict):
+        key = self.key(description)
+        self._put_memory(key, plan)
+        if self.store is not None:
+            await asyncio.to_thread(self._put_store, key, plan)
+
+    def stats(self) -> Dict:
+        hits = self.memory_hits + self.store_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "store_errors": self.store_errors,
+            "memory_size": len(self.memory),
+        }
+
+    def _get_memory(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            plan = self.memory.get(key)
+        if plan is not None:
+            self.memory_hits += 1
+        return plan
+
+    def _put_memory(self, key: str, plan: Dict):
+        with self._lock:
+            self.memory[key] = copy.deepcopy(plan)
+
+    def _get_store(self, key: str) -> Optional[Dict]:
+        if self.store is None:
+            return None
+        try:
+            plan = self.store.get_cached_plan(key, max_age=self.ttl)
+        except Exception as e:
+            self.store_errors += 1
+            logging.warning(f"plan cache store lookup failed: {e}")
+            return None
+        if plan is not None:
+            self.store_hits += 1
+            self._put_memory(key, plan)
+        return plan
+
+    def _put_store(self, key: str, plan: Dict):
+        if self.store is None:
+            return
+        try:
+            self.store.put_cached_plan(key, plan)
+        except Exception as e:
+            self.store_errors += 1
+            logging.warning(f"plan cache store write failed: {e}")
@@ -0,0 +1,112 @@
+"""
+actions.json compiled into a dispatch table.
+
+Each (integration, action) maps to a RegisteredAction holding its webhook, a precompiled arg checker
+(schema.compile_args) and the handler that runs it: one of the local processors for TERMINAL/FILES,
+the n8n webhook otherwise. Plans are checked against it before anything is dispatched.
+
+    entry = REGISTRY.resolve(plan)   # raises InvalidAction
+    result = entry.call(plan["args"])
+"""
+
+import json
+import functools
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import webhook
+from schema import ACTION_KEYS, compile_args
+
+ACTIONS_FILE = Path(__file__).parent / "actions.json"
+
+
+def _terminal_execute(args: Dict, progress=None) -> Dict:
+    return webhook.process_terminal("execute", args, progress=progress)
+
+
+def _file(action: str):
+    return lambda args, progress=None: webhook.process_file(action, args)
+
+
+# (integration, action) -> local processor taking (args, progress callback); everything else goes to
+# its n8n webhook
+LOCAL_HANDLERS: Dict[Tuple[str, str], Callable[..., Dict]] = {
+    ("terminal", "execute"): _terminal_execute,
+    ("file", "modify"): _file("modify"),
+    ("file", "open"): _file("open"),
+}
+
+
+class InvalidAction(ValueError):
+    pass
+
+
+class RegisteredAction:
+    __slots__ = ("integration", "action", "webhook", "spec", "check_args", "local", "handler")
+
+    def __init__(self, spec: Dict):
+        self.integration = spec["integration"]
+        self.action = spec["action"]
+        self.webhook = spec["webhook"]
+        self.spec = spec
+        self.check_args = compile_args(spec.get("args", {}))
+        local = LOCAL_HANDLERS.get((self.integration, self.action))
+        self.local = local is not None
+        if self.local:
+            self.handler = local
+        else:
+            self.handler = functools.partial(webhook.webhook, self.integration, self.action, webhook=self.webhook)
+
+    def validate(self, args: Dict):
+        errors = self.check_args(args)
+        if errors:
+            raise InvalidAction(f"{self.integration}.{self.action}: {'; '.join(errors)}")
+
+    def call(self, args: Dict, progress=None):
+        """progress: optional (fraction, details) callback, for local handlers that can report it"""
+        self.validate(args)
+        if self.local:
+            return self.handler(args, progress)
+        return self.handler(args)
+
+
+class ActionRegistry:
+    def __init__(self, actions: List[Dict]):
+        self.entries: Dict[Tuple[str, str], RegisteredAction] = {}
+        for spec in actions:
+            self.entries[(spec["integration"], spec["action"])] = RegisteredAction(spec)
+
+    @classmethod
+    def load(cls, path: Path = ACTIONS_FILE) -> "ActionRegistry":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def get(self, integration: str, action: str) -> Optional[RegisteredAction]:
+        return self.entries.get((integration, action))
+
+    def errors(self, plan, check_args: bool = True) -> List[str]:
+        """Problems with a plan, [] if it can be dispatched."""
+        if not isinstance(plan, dict):
+            return ["expected a JSON object"]
+        missing = [key for key in ACTION_KEYS if key not in plan]
+        if missing:
+            return [f"missing keys: {', '.join(missing)}"]
+        entry = self.entries.get((plan["integration"], plan["action"]))
+        if entry is None:
+            return [f"unknown action {plan['integration']}.{plan['action']}"]
+        errors = []
+        if plan["webhook"] != entry.webhook:
+            errors.append(f"webhook must be {entry.webhook} for {entry.integration}.{entry.action}")
+        if check_args:
+            errors += entry.check_args(plan["args"])
+        return errors
+
+    def resolve(self, plan, check_args: bool = True) -> RegisteredAction:
+        """The entry a plan dispatches to; raises InvalidAction if the plan can't be dispatched."""
+        errors = self.errors(plan, check_args)
+        if errors:
+            raise InvalidAction("; ".join(errors))
+        return self.entries[(plan["integration"], plan["action"])]
+
+
+REGISTRY = ActionRegistry.load()
@@ -0,0 +1,105 @@
+"""
+Per-query tool routing for the planner.
+
+ToolRouter scores the actions against the query with a small local TF-IDF index (same hashed n-gram
+features as similarity.py) over each action's integration, name, description, args and a few
+hand-written keyword hints, then keeps every action of the top integrations.
+
+It only narrows the list when it's sure, since the model can't pick a tool it wasn't offered: the best
+integration must score at least ROUTER_CONFIDENT_SCORE, and no integration outside the top
+ROUTER_TOP_K may come within ROUTER_MARGIN of it. Anything else gets the full tool list.
+"""
+
+import os
+import json
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from similarity import features
+
+# number of integrations whose actions are offered to the model per query
+ROUTER_TOP_K = int(os.getenv("ROUTER_TOP_K", "2"))
+# minimum cosine for an integration to be offered at all
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.05"))
+# below this best score the router isn't sure enough to leave any tool out
+ROUTER_CONFIDENT_SCORE = float(os.getenv("ROUTER_CONFIDENT_SCORE", "0.2"))
+# an integration scoring within this fraction of the best one is a close call; if it didn't make the
+# top ROUTER_TOP_K, every tool is offered
+ROUTER_MARGIN = float(os.getenv("ROUTER_MARGIN", "0.5"))
+
+# words people use for a tool that rarely appear in its schema
+ROUTING_HINTS = {
+    "notion": "note notes page pages doc document write essay journal wiki summary outline research",
+    "terminal": "run command shell install setup project init create folder directory mkdir npm pip python venv script build clone repo git app",
+    "file": "file code edit open vscode source script write update fix typo bug rename variable function refactor line comment py js ts",
+    "email": "email mail inbox send reply replied draft message gmail said wrote get back",
+    "gcal": "calendar meeting event schedule appointment call tomorrow week today remind",
+    "sheets": "spreadsheet sheet sheets table csv budget tracker track expenses rows columns",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token) without a round trip to count_tokens."""
+    return math.ceil(len(text) / 4)
+
+
+def tool_key(spec: Dict) -> Tuple[str, str]:
+    return (spec["integration"], spec["action"])
+
+
+class ToolRouter:
+    def __init__(self, actions: List[Dict], top_k: int = ROUTER_TOP_K, min_score: float = ROUTER_MIN_SCORE,
+                 confident_score: float = ROUTER_CONFIDENT_SCORE, margin: float = ROUTER_MARGIN):
+        self.actions = actions
+        self.top_k = top_k
+        self.min_score = min_score
+        self.confident_score = confident_score
+        self.margin = margin
+        self.docs = [features(self._document(spec)) for spec in actions]
+        df = Counter(f for doc in self.docs for f in doc)
+        n = len(self.docs)
+        self.idf = {f: math.log((1 + n) / (1 + count)) + 1 for f, count in df.items()}
+        self.vectors = [self._weigh(doc) for doc in self.docs]
+
+    def scores(self, query: str) -> List[Tuple[float, Dict]]:
+        """(cosine, action spec) for every action, in actions.json order."""
+        query_vector = self._weigh(features(query))
+        return [(self._cosine(query_vector, vector), spec) for spec, vector in zip(self.actions, self.vectors)]
+
+    def route(self, query: str) -> List[Dict]:
+        """Action specs to offer the model for this query, in actions.json order."""
+        best = {}
+        for score, spec in self.scores(query):
+            best[spec["integration"]] = max(best.get(spec["integration"], 0.0), score)
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        top = ranked[0][1] if ranked else 0.0
+        if top < self.confident_score or any(score >= top * self.margin for _, score in ranked[self.top_k:]):
+            return list(self.actions)
+        chosen = {integration for integration, score in ranked[:self.top_k] if score >= self.min_score}
+        return [spec for spec in self.actions if spec["integration"] in chosen]
+
+    @staticmethod
+    def _document(spec: Dict) -> str:
+        parts = [spec["integration"], spec["action"], spec.get("description", "")]
+        for name, arg in spec.get("args", {}).items():
+            parts += [name.replace("_", " "), arg.get("description", "")]
+        parts.append(ROUTING_HINTS.get(spec["integration"], ""))
+        return " ".join(parts)
+
+    def _weigh(self, tf: Counter) -> Dict[int, float]:
+        # features no tool has can't contribute to any dot product
+        return {f: count * self.idf[f] for f, count in tf.items() if f in self.idf}
+
+    @staticmethod
+    def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+        if not a or not b:
+            return 0.0
+        dot = sum(weight * b.get(f, 0.0) for f, weight in a.items())
+        norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+        return dot / norm if norm else 0.0
+
+
+def build_instruction(backbone: str, tools: List[Dict]) -> str:
+    return backbone + json.dumps(tools, indent=2)
@@ -0,0 +1,106 @@
+"""
+Schemas for planner output, generated from actions.json.
+
+- response_schema(tools): a JSON schema the model's output is constrained to (Gemini's
+  response_schema), with the integration/action/webhook names of the offered tools as enums;
+  response_plan_schema(tools) is the same for multi-step plans
+- compile_args(args): per-action checks the constrained decoder can't express (the args belong to
+  the chosen action, required args present, arg types); registry.py compiles one per action
+- parse(text): JSON out of a response, with or without a ```json fence
+"""
+
+import re
+import json
+from typing import Callable, Dict, List
+
+ACTION_KEYS = ("integration", "action", "args", "webhook")
+
+# actions.json arg types -> python types
+ARG_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+
+class PlanError(ValueError):
+    """The model's output isn't a usable action."""
+
+
+def response_schema(tools: List[Dict]) -> Dict:
+    """
+    Schema for one action over the offered tools. args is the union of every offered action's args,
+    all optional; validate() checks them against the action that was actually chosen.
+    """
+    properties = {}
+    for spec in tools:
+        for name, arg in spec.get("args", {}).items():
+            properties.setdefault(name, {"type": arg.get("type", "string")})
+    args = {"type": "object", "properties": properties} if properties else {"type": "object"}
+    return {
+        "type": "object",
+        "properties": {
+            "integration": {"type": "string", "enum": sorted({spec["integration"] for spec in tools})},
+            "action": {"type": "string", "enum": sorted({spec["action"] for spec in tools})},
+            "args": args,
+            "webhook": {"type": "string", "enum": sorted({spec["webhook"] for spec in tools})},
+        },
+        "required": list(ACTION_KEYS),
+    }
+
+
+def response_plan_schema(tools: List[Dict]) -> Dict:
+    """Schema for a multi-step plan (see plan.py): response_schema()'s action plus an id and depends_on per step."""
+    step = response_schema(tools)
+    step["properties"] = {"id": {"type": "string"}, **step["properties"], "depends_on": {"type": "array", "items": {"type": "string"}}}
+    step["required"] = ["id", *ACTION_KEYS]
+    return {"type": "object", "properties": {"steps": {"type": "array", "items": step}}, "required": ["steps"]}
+
+
+def response_list_schema(tools: List[Dict], steps: bool = False) -> Dict:
+    return {"type": "array", "items": response_plan_schema(tools) if steps else response_schema(tools)}
+
+
+def parse(text: str):
+    if not text or not text.strip():
+        raise PlanError("empty response")
+    match = FENCE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise PlanError(f"response is not valid JSON: {e}")
+
+
+def compile_args(arg_schema: Dict) -> Callable[[Dict], List[str]]:
+    """
+    Checker for one action's args, with the schema lookups done once: the returned function lists the
+    problems with an args dict (unexpected or missing args, wrong types), [] if there are none.
+    """
+    types = {name: ARG_TYPES.get(arg.get("type", "string"), object) for name, arg in arg_schema.items()}
+    numeric = {name for name, arg in arg_schema.items() if arg.get("type") in ("integer", "number")}
+    required = [name for name, arg in arg_schema.items() if "default" not in arg]
+    type_names = {name: arg.get("type", "string") for name, arg in arg_schema.items()}
+
+    def check(args: Dict) -> List[str]:
+        if not isinstance(args, dict):
+            return ["args must be an object"]
+        errors = []
+        for name, value in args.items():
+            expected = types.get(name)
+            if expected is None:
+                errors.append(f"unexpected arg {name}")
+            elif not isinstance(value, expected) or (name in numeric and isinstance(value, bool)):
+                errors.append(f"arg {name} must be a {type_names[name]}")
+        for name in required:
+            if name not in args:
+                errors.append(f"missing arg {name}")
+        return errors
+
+    return check
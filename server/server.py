@@ -1,19 +1,111 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+import time
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import uvicorn
 from dotenv import load_dotenv
 import logging
-from action import Action
-from gemini import Model
-from db.db import TaskManager
+import os
+import json
+import asyncio
+import breaker
+import http_clients
+from local_exec import LOCAL_EXECUTOR
+from idempotency import REPLAYED_HEADER, IdempotencyStore
+from plan import Plan
+from plan_cache import prune_periodically
+from jobs import JobRunner, reap_periodically
+from similarity import PlanIndex
+from schema import PlanError
+from registry import InvalidAction
+from services import LazyService, ServiceUnavailable, timed_import, IMPORT_TIMES
 from pydantic import BaseModel
+from typing import List, Optional
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Gemini API Backend", version="1.0.0")
+# bring the database schema up to date at startup (see TaskManager.migrate)
+DB_MIGRATE = os.getenv("DB_MIGRATE", "1") == "1"
+
+# Heavy clients (google.generativeai, postgres) are imported and built in the background once the
+# app is up; see services.py. Factories that need the database wait for it inside their thread.
+
+def build_task_mgr():
+    task_mgr = timed_import("db.db").TaskManager()
+    if DB_MIGRATE:
+        task_mgr.migrate()
+    return task_mgr
+
+def build_model():
+    gemini = timed_import("gemini")
+    if gemini.MODEL_BACKEND == "gemini":
+        timed_import("google.generativeai")  # the slow import overlaps with connecting to postgres
+    return gemini.Model(cache_store=task_mgr_svc.wait())
+
+def build_job_runner():
+    return JobRunner(task_mgr_svc.wait())
+
+def build_task_events():
+    listener = timed_import("events").TaskEventListener()
+    listener.start()
+    return listener
+
+def load_plan_index():
+    plan_index.load(task_mgr_svc.wait())
+    return plan_index
+
+task_mgr_svc = LazyService("task_mgr", build_task_mgr)
+model_svc = LazyService("model", build_model)
+job_runner_svc = LazyService("job_runner", build_job_runner)
+task_events_svc = LazyService("task_events", build_task_events)
+# usable (empty) right away; the service only tracks the initial load from the tasks table
+plan_index = PlanIndex()
+plan_index_svc = LazyService("plan_index", load_plan_index)
+
+SERVICES = [task_mgr_svc, model_svc, job_runner_svc, task_events_svc, plan_index_svc]
+
+async def prune_plan_cache():
+    while True:
+        try:
+            task_mgr = await task_mgr_svc.get()
+            break
+        except ServiceUnavailable:
+            continue
+    await prune_periodically(task_mgr)
+
+async def reap_tasks():
+    """Fail STARTED tasks whose jobs were lost to a restart or crash (see JobRunner.reap)."""
+    while True:
+        try:
+            job_runner = await job_runner_svc.get()
+            break
+        except ServiceUnavailable:
+            continue
+    await reap_periodically(job_runner)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for service in SERVICES:
+        service.start()
+    background = [asyncio.create_task(prune_plan_cache()), asyncio.create_task(reap_tasks())]
+    yield
+    for task in background:
+        task.cancel()
+    if job_runner_svc.ready:
+        job_runner_svc.value.shutdown(wait=False)
+    if task_events_svc.ready:
+        task_events_svc.value.stop()
+    if task_mgr_svc.ready:
+        task_mgr_svc.value.close()
+    http_clients.close()
+
+app = FastAPI(title="Gemini API Backend", version="1.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Add your frontend URL
@@ -23,9 +115,16 @@ app.add_middleware(
 )
 logging.info('app started')
 
-model = Model()
+@app.exception_handler(ServiceUnavailable)
+async def service_unavailable(request: Request, e: ServiceUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "1"})
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """'id, description' -> ['id', 'description']"""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()]
 
-task_mgr = TaskManager()
 
 @app.get("/")
 async def root():
@@ -36,50 +135,210 @@ class TaskRequest(BaseModel):
     status: str
     progress: float
 
+class TaskUpdate(BaseModel):
+    task_id: int
+    description: Optional[str] = None
+    status: Optional[str] = None
+    progress: Optional[float] = None
+
+class BatchCreateRequest(BaseModel):
+    tasks: List[TaskRequest]
+
+class BatchUpdateRequest(BaseModel):
+    tasks: List[TaskUpdate]
+
+class BatchDeleteRequest(BaseModel):
+    task_ids: List[int]
+
+# most items accepted by one /batch call
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+async def plan(description: str) -> dict:
+    """
+    Action (or multi-step plan, see plan.py) for a description: adapted from a near-duplicate past
+    task when one is similar enough, otherwise planned by the model (which has its own exact-match cache)
+    """
+    resp = plan_index.best_match(description)
+    if resp is None:
+        model = await model_svc.get()
+        resp = await model.aquery_action(description)
+        logging.info(f"received gemini response: {resp}")
+    return resp
+
+
+# Idempotency-Key handling for /new, /new/stream and /start (see idempotency.py)
+IDEMPOTENCY = IdempotencyStore()
+
+
+def new_fingerprint(request: TaskRequest) -> str:
+    """What an Idempotency-Key for /new stands for; /new and /new/stream share keys."""
+    return "new:" + json.dumps(request.model_dump(), sort_keys=True)
+
+
 @app.post("/new")
-async def create_task(request: TaskRequest):
+async def create_task(request: TaskRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
     """
-    Receives task, pings gemini, processes, commits to DB
+    Receives task, pings gemini, processes, commits to DB.
+    Repeats with the same Idempotency-Key get the first call's task instead of creating another.
     """
-    logging.info(f"/new: {request.description}")
-    resp: dict = model.query_action(request.description)
-    logging.info(f"received gemini response: {resp}")
+    body, replayed = await IDEMPOTENCY.run(idempotency_key, new_fingerprint(request), lambda: new_task(request))
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return body
 
-    action = Action(model_dump=resp)
 
-    task_id = task_mgr.create_task(
+async def new_task(request: TaskRequest) -> dict:
+    logging.info(f"/new: {request.description}")
+    try:
+        resp = await plan(request.description)
+        action = Plan.from_dict(resp)
+    except (PlanError, InvalidAction) as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    task_mgr = await task_mgr_svc.get()
+    task_id = await run_in_threadpool(
+        task_mgr.create_task,
         description=request.description,
         action=action.to_dict(),
         status=request.status,
         progress=request.progress,
     )
+    plan_index.add(task_id, request.description, action.to_dict())
 
     return {"status_code": 200, "content": task_id}
 
 
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/new/stream")
+async def create_task_streaming(request: TaskRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    /new as server-sent events, so the client can show the plan while the model is still writing it:
+    `header` (integration/action/webhook, validated; single actions only), `partial` (plan so far,
+    repeated), `plan`, then `created` with the task id, or `error`. A repeated Idempotency-Key
+    gets just the `created` of the first call (marked replayed).
+    """
+    logging.info(f"/new/stream: {request.description}")
+    # fail fast with a plain 503 rather than an error frame if the planner isn't up yet
+    model = await model_svc.get()
+    task_mgr = await task_mgr_svc.get()
+
+    async def frames():
+        owner = False
+        try:
+            if idempotency_key:
+                outcome = await IDEMPOTENCY.begin(idempotency_key, new_fingerprint(request))
+                if outcome is not None:
+                    task_id = IdempotencyStore.unwrap(outcome)["content"]
+                    yield sse("created", {"task_id": task_id, "replayed": True})
+                    return
+                owner = True
+            resp = plan_index.best_match(request.description)
+            if resp is None:
+                async for kind, payload in model.astream_action(request.description):
+                    yield sse(kind, payload)
+                    if kind == "plan":
+                        resp = payload
+            else:
+                yield sse("plan", resp)
+
+            action = Plan.from_dict(resp)
+            task_id = await run_in_threadpool(
+                task_mgr.create_task,
+                description=request.description,
+                action=action.to_dict(),
+                status=request.status,
+                progress=request.progress,
+            )
+            plan_index.add(task_id, request.description, action.to_dict())
+            if owner:
+                # stored before the client hears about it, so a retry after a dropped connection finds it
+                IDEMPOTENCY.finish(idempotency_key, ("ok", {"status_code": 200, "content": task_id}))
+                owner = False
+            yield sse("created", {"task_id": task_id})
+        except Exception as e:
+            logging.error(f"/new/stream failed: {e}")
+            yield sse("error", {"detail": f"Failed to plan task: {e}"})
+        finally:
+            if owner:
+                IDEMPOTENCY.finish(idempotency_key, None, keep=False)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# statuses a task can be (re)started from
+STARTABLE_STATUSES = ["NEW", "FAILED"]
+
 @app.post("/start")
-async def start_task(task_id: int):
+async def start_task(task_id: int, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """
+    Claims the task and hands it to the job runner. Repeats with the same Idempotency-Key (a
+    double-click, a client retry) get the first call's job instead of a 409 or a second dispatch.
+    """
+    body, replayed = await IDEMPOTENCY.run(idempotency_key, f"start:{task_id}", lambda: run_in_threadpool(start, task_id))
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return body
+
+
+def start(task_id: int) -> dict:
     logging.info(f"/start_task: {task_id}")
-    # Get the task first to check if it exists
-    task = task_mgr.get_task(task_id)
+    task_mgr = task_mgr_svc.wait()
+    # before claiming, so a runner that isn't up yet can't leave the task STARTED with no job
+    job_runner = job_runner_svc.wait()
+    # Claim the task and read its action in one statement; only one caller can win
+    task = task_mgr.transition_task(task_id, STARTABLE_STATUSES, "STARTED", progress=0.02)
     if not task:
-        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-    
-    updated = task_mgr.update_task(task_id, status="STARTED", progress=0.02)
-    if not updated:
-        raise HTTPException(status_code=500, detail="Failed to update task status")
+        existing = task_mgr.get_task(task_id, fields=["status"])
+        if not existing:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+        raise HTTPException(status_code=409, detail=f"Task {task_id} is already {existing['status']}")
     
     logger.info(task)
-    action = Action.from_dict(task["action"])
-    action.call()
-    
-    return {"message": f"Task {task_id} started", "task_id": task_id}
+    try:
+        action = Plan.from_dict(task["action"])
+    except ValueError as e:
+        # the stored plan can't be dispatched; don't leave the task claimed
+        task_mgr.transition_task(task_id, "STARTED", "FAILED")
+        raise HTTPException(status_code=422, detail=f"Task {task_id} has an invalid action: {e}")
+    try:
+        job_id = job_runner.submit(task_id, action)
+    except Exception as e:
+        # e.g. the runner is shutting down; give the claim back so the task can be started again
+        task_mgr.transition_task(task_id, "STARTED", "FAILED")
+        raise HTTPException(status_code=503, detail=f"Task {task_id} could not be queued: {e}")
+
+    return {"message": f"Task {task_id} started", "task_id": task_id, "job_id": job_id}
+
+
+@app.get("/jobs")
+async def get_job_stats():
+    """
+    Returns worker count and queue depth of the background job runner
+    """
+    job_runner = await job_runner_svc.get()
+    return {"status_code": 200, "content": job_runner.stats()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = (await job_runner_svc.get()).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"status_code": 200, "content": job}
 
 
 @app.delete("/delete")
-async def delete_task(task_id: int):
+def delete_task(task_id: int):
     logging.info(f"/delete_task: {task_id}")
-    deleted = task_mgr.delete_task(task_id)
+    deleted = task_mgr_svc.wait().delete_task(task_id)
+    plan_index.remove(task_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
     
@@ -87,39 +346,213 @@ async def delete_task(task_id: int):
 
 
 @app.post("/update")
-async def update_task(task_id: int, request: TaskRequest):
+def update_task(task_id: int, request: TaskRequest):
     logging.info(f"/update_task: {task_id}, {request.description}")
-    # Check if task exists first
-    existing_task = task_mgr.get_task(task_id)
-    if not existing_task:
-        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-    
-    # Update the task
-    updated = task_mgr.update_task(
-        task_id,
-        description=request.description,
-        status=request.status,
-        progress=request.progress
-    )
+    # A single UPDATE; no matching row means the task doesn't exist
+    try:
+        updated = task_mgr_svc.wait().update_task(
+            task_id,
+            description=request.description,
+            status=request.status,
+            progress=request.progress
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     if not updated:
-        raise HTTPException(status_code=500, detail="Failed to update task")
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    plan_index.description_changed(task_id, request.description)
     
     return {"message": f"Task {task_id} updated", "task_id": task_id}
 
 
+def check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+
+def with_index(outcomes: List[dict]) -> List[dict]:
+    return [{"index": i, **outcome} for i, outcome in enumerate(outcomes)]
+
+
+@app.post("/batch/new")
+async def create_tasks(request: BatchCreateRequest):
+    """
+    Plans every description concurrently, then inserts all planned tasks in one statement.
+    Returns one outcome per item: {"index", "ok", "id"} or {"index", "ok": false, "error"}
+    """
+    check_batch_size(request.tasks)
+    logging.info(f"/batch/new: {len(request.tasks)} tasks")
+    plans = await asyncio.gather(
+        *(plan(task.description) for task in request.tasks),
+        return_exceptions=True,
+    )
+
+    outcomes = [None] * len(request.tasks)
+    rows, positions = [], []
+    for i, (task, resp) in enumerate(zip(request.tasks, plans)):
+        try:
+            if isinstance(resp, Exception):
+                raise resp
+            action = Plan.from_dict(resp)
+        except Exception as e:
+            outcomes[i] = {"ok": False, "error": f"Failed to plan task: {e}"}
+            continue
+        rows.append({
+            "description": task.description,
+            "action": action.to_dict(),
+            "status": task.status,
+            "progress": task.progress,
+        })
+        positions.append(i)
+
+    task_mgr = await task_mgr_svc.get()
+    created = await run_in_threadpool(task_mgr.create_tasks, rows) if rows else []
+    for i, row, outcome in zip(positions, rows, created):
+        outcomes[i] = outcome
+        if outcome["ok"]:
+            plan_index.add(outcome["id"], row["description"], row["action"])
+    return {"status_code": 200, "content": with_index(outcomes)}
+
+
+@app.post("/batch/update")
+def update_tasks(request: BatchUpdateRequest):
+    """
+    Applies partial updates to many tasks in one statement; omitted fields are left unchanged
+    """
+    check_batch_size(request.tasks)
+    logging.info(f"/batch/update: {len(request.tasks)} tasks")
+    updates = [
+        {"id": task.task_id, **task.model_dump(exclude={"task_id"}, exclude_none=True)}
+        for task in request.tasks
+    ]
+    outcomes = task_mgr_svc.wait().update_tasks(updates)
+    for update, outcome in zip(updates, outcomes):
+        if outcome["ok"] and "description" in update:
+            plan_index.description_changed(update["id"], update["description"])
+    return {"status_code": 200, "content": with_index(outcomes)}
+
+
+@app.post("/batch/delete")
+def delete_tasks(request: BatchDeleteRequest):
+    check_batch_size(request.task_ids)
+    logging.info(f"/batch/delete: {request.task_ids}")
+    outcomes = task_mgr_svc.wait().delete_tasks(request.task_ids)
+    for id in request.task_ids:
+        plan_index.remove(id)
+    return {"status_code": 200, "content": with_index(outcomes)}
+
+
 @app.get("/all")
-async def get_all_tasks():
+def get_all_tasks(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
+):
     """
-    Returns all tasks from the database
+    Returns a page of tasks, newest first. Pass the returned next_cursor back as `cursor`
+    for the next page; `status` may be repeated to filter on several statuses.
+    `fields` is a comma-separated column list (e.g. id,description,status,progress).
     """
-    logging.info("/all: fetching all tasks")
+    logging.info(f"/all: limit={limit} cursor={cursor} status={status} fields={fields}")
+    task_mgr = task_mgr_svc.wait()
     try:
-        tasks = task_mgr.get_all_tasks()
-        return {"status_code": 200, "content": tasks}
+        page = task_mgr.get_tasks_page(limit=limit, cursor=cursor, status=status, fields=parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Failed to fetch all tasks: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve tasks")
+    return {"status_code": 200, "content": page["tasks"], "next_cursor": page["next_cursor"]}
+
+
+@app.get("/tasks/{task_id}/results")
+def get_task_results(task_id: int, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None):
+    """
+    Stored results of a task's runs (one per action, or per step of a multi-step plan), newest first
+    and paged like /all. Large results come back decompressed; ones over the size cap are left out
+    and have a result_url to fetch them from instead.
+    """
+    task_mgr = task_mgr_svc.wait()
+    try:
+        page = task_mgr.get_task_results_page(task_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page["results"] and not cursor and not task_mgr.get_task(task_id, fields=["id"]):
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    for result in page["results"]:
+        if result.pop("spilled", False):
+            result["result_url"] = f"/tasks/{task_id}/results/{result['id']}"
+    return {"status_code": 200, "content": page["results"], "next_cursor": page["next_cursor"]}
+
+
+@app.get("/tasks/{task_id}/results/{result_id}")
+def get_spilled_result(task_id: int, result_id: int):
+    """The JSON of a result too large to be returned inline, served gzip-encoded from its spill file."""
+    path = task_mgr_svc.wait().get_result_file(task_id, result_id)
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Result {result_id} of task {task_id} not found")
+    return FileResponse(path, media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+
+def if_ready(service: LazyService, stats):
+    return stats(service.value) if service.ready else None
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Counters from the planner, job runner, connection pools and event stream
+    """
+    return {
+        "status_code": 200,
+        "content": {
+            "model": if_ready(model_svc, lambda model: model.stats()),
+            "plan_index": plan_index.stats(),
+            "jobs": if_ready(job_runner_svc, lambda runner: runner.stats()),
+            "db_pool": if_ready(task_mgr_svc, lambda task_mgr: task_mgr.db.stats()),
+            "events": if_ready(task_events_svc, lambda listener: listener.stats()),
+            "webhooks": {**http_clients.stats(), "breakers": breaker.states()},
+            "local_actions": LOCAL_EXECUTOR.stats(),
+            "idempotency": IDEMPOTENCY.stats(),
+        },
+    }
+
+
+@app.get("/ready")
+def get_readiness():
+    """
+    200 once every background service is up, 503 while any is still starting.
+    Includes per-service build times and the import times of the heavy modules.
+    """
+    content = {
+        "ready": all(service.ready for service in SERVICES),
+        "services": {service.name: service.status() for service in SERVICES},
+        "import_ms": IMPORT_TIMES,
+    }
+    status_code = 200 if content["ready"] else 503
+    return JSONResponse(status_code=status_code, content={"status_code": status_code, "content": content})
+
+
+@app.get("/events")
+async def stream_task_events():
+    """
+    Server-sent events with every task insert/update/delete, so clients can apply deltas
+    instead of re-fetching /all after each mutation
+    """
+    listener = await task_events_svc.get()
+    from events import event_stream
+    return StreamingResponse(
+        event_stream(listener),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+IMPORT_TIMES["server"] = 1000 * (time.perf_counter() - _import_start)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""
+Lazily constructed heavy dependencies for the server.
+
+Each slow-to-build dependency (the model, which imports google.generativeai, and the postgres-backed
+TaskManager) is wrapped in a LazyService: the app's lifespan starts all of them concurrently in
+background threads right after uvicorn binds, failures are retried with backoff, and handlers wait
+(bounded) for the one they need.
+
+    task_mgr_svc = LazyService("task_mgr", build_task_mgr)
+    ...
+    task_mgr = await task_mgr_svc.get()   # async handlers
+    task_mgr = task_mgr_svc.wait()        # sync handlers (they run on the thread pool)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import importlib
+import threading
+from typing import Callable, Dict
+
+# seconds a request waits for a service that is still starting before getting a 503
+SERVICE_WAIT_TIMEOUT = float(os.getenv("SERVICE_WAIT_TIMEOUT", "15"))
+# longest pause between attempts to build a service that keeps failing
+SERVICE_MAX_BACKOFF = float(os.getenv("SERVICE_MAX_BACKOFF", "30"))
+
+# module name -> milliseconds its first import took
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+def timed_import(name: str):
+    """importlib.import_module that records how long the first import took."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.setdefault(name, 1000 * (time.perf_counter() - start))
+    return module
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class LazyService:
+    def __init__(self, name: str, factory: Callable):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.error = None
+        self.attempts = 0
+        self.build_ms = None
+        self._ready = threading.Event()
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """Begin building in the background on the running loop. Idempotent."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._build())
+
+    async def get(self, timeout: float = SERVICE_WAIT_TIMEOUT):
+        if self.ready:
+            return self.value
+        self.start()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            raise ServiceUnavailable(f"{self.name} is still starting: {self.error or 'not ready yet'}")
+        return self.value
+
+    def wait(self, timeout: float = SERVICE_WAIT_TIMEOUT):
+        """Blocking get() for code running off the event loop."""
+        if not self._ready.wait(timeout):
+            raise ServiceUnavailable(f"{self.name} is still starting: {self.error or 'not ready yet'}")
+        return self.value
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "build_ms": self.build_ms,
+            "error": self.error,
+        }
+
+    async def _build(self):
+        backoff = 1.0
+        while True:
+            self.attempts += 1
+            start = time.perf_counter()
+            try:
+                self.value = await asyncio.to_thread(self.factory)
+            except Exception as e:
+                self.error = str(e)
+                logging.error(f"{self.name} failed to start (attempt {self.attempts}): {e}; retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, SERVICE_MAX_BACKOFF)
+                continue
+            self.build_ms = 1000 * (time.perf_counter() - start)
+            self.error = None
+            self._ready.set()
+            logging.info(f"{self.name} ready in {self.build_ms:.0f}ms")
+            return
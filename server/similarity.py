@@ -0,0 +1,205 @@
+"""
+Local similarity index over past task descriptions, used to reuse a stored action instead of asking
+the model again for a near-duplicate task ("email Sam the weekly status" vs "email sam weekly status").
+
+Descriptions become sparse TF-IDF vectors over hashed features (word unigrams, word bigrams and
+character trigrams), kept in an inverted index so a lookup only touches tasks sharing a feature with
+the query. IDF is computed at query time from live document frequencies, so adding a task is O(features)
+and never rebuilds anything.
+
+Similar wording doesn't mean the same task: "set up ~/code/alpha" and "set up ~/code/beta" score
+0.95. So a match is only reused when the wording differs in nothing but case, punctuation and word
+order, or when the action only reads (search, open) and none of the words the new description dropped
+are in its args.
+"""
+
+import os
+import re
+import copy
+import json
+import math
+import zlib
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from plan_cache import normalize
+
+# cosine similarity at or above which a past task's action is reused
+PLAN_REUSE_THRESHOLD = float(os.getenv("PLAN_REUSE_THRESHOLD", "0.9"))
+# actions that don't change anything, so a close match is safe to reuse
+READ_ONLY_ACTIONS = {"search", "open"}
+# number of hash buckets features are folded into
+FEATURE_BUCKETS = 1 << 20
+# candidates (by partial dot product) that get an exact cosine score
+TOP_CANDIDATES = 20
+# posting entries visited per lookup; rare features are visited first, so common words
+# ("the", "email") stop costing anything once a large index has plenty of candidates
+POSTINGS_BUDGET = 2000
+
+
+def features(description: str) -> Counter:
+    """Hashed n-gram term frequencies of a description."""
+    words = re.findall(r"\w+", description.lower())
+    grams = list(words)
+    grams += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        grams += [f"~{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # crc32 is stable across processes, unlike hash()
+    return Counter(zlib.crc32(gram.encode()) % FEATURE_BUCKETS for gram in grams)
+
+
+def words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def reusable(action: Dict, old_description: str, new_description: str) -> bool:
+    """Whether an action (already adapted) planned for the old description also does the new one."""
+    old, new = words(old_description), words(new_description)
+    if old == new:
+        return True
+    if action.get("action") not in READ_ONLY_ACTIONS:
+        return False
+    # a word only the old description had (a path, a day, a name) must not end up in the args
+    return not (old - new) & words(json.dumps(action.get("args", {})))
+
+
+def adapt(action: Dict, old_description: str, new_description: str) -> Dict:
+    """
+    Copy of a past task's action for a new description. String args that were just the old
+    description verbatim (page names, search queries) are swapped for the new one.
+    """
+    adapted = copy.deepcopy(action)
+    old = normalize(old_description)
+    for key, value in adapted.get("args", {}).items():
+        if isinstance(value, str) and normalize(value) == old:
+            adapted["args"][key] = new_description
+    return adapted
+
+
+class PlanIndex:
+    def __init__(self, threshold: float = PLAN_REUSE_THRESHOLD):
+        self.threshold = threshold
+        self.docs: Dict[int, Tuple[str, Dict, Counter]] = {}  # task id -> (description, action, tf)
+        self.postings: Dict[int, set] = defaultdict(set)       # feature -> task ids
+        self.df: Counter = Counter()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, task_id: int, description: str, action: Dict):
+        """Index a task; tasks without a usable action are ignored."""
+        if not action or not all(k in action for k in ("integration", "action", "args", "webhook")):
+            return
+        tf = features(description)
+        with self._lock:
+            if task_id in self.docs:
+                self._remove(task_id)
+            self.docs[task_id] = (description, action, tf)
+            for feature in tf:
+                self.postings[feature].add(task_id)
+                self.df[feature] += 1
+
+    def remove(self, task_id: int):
+        with self._lock:
+            self._remove(task_id)
+
+    def description_changed(self, task_id: int, description: str):
+        """A task's stored action was planned for its old description, so stop reusing it once that changes."""
+        with self._lock:
+            doc = self.docs.get(task_id)
+            if doc is not None and normalize(doc[0]) != normalize(description):
+                self._remove(task_id)
+
+    def load(self, task_mgr, page_size: int = 500):
+        """Index every stored task, a page at a time."""
+        cursor = None
+        while True:
+            page = task_mgr.get_tasks_page(limit=page_size, cursor=cursor, fields=["id", "description", "action"])
+            for task in page["tasks"]:
+                self.add(task["id"], task["description"], task["action"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        logging.info(f"plan index loaded {len(self)} tasks")
+
+    def search(self, description: str, k: int = 1) -> List[Tuple[float, int]]:
+        """Top-k (cosine, task id) pairs for a description, best first."""
+        query = features(description)
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            idf = lambda f: math.log((1 + n) / (1 + self.df[f])) + 1
+            weights = {f: tf * idf(f) * idf(f) for f, tf in query.items()}
+
+            # candidate generation: partial dot products from the rarest shared features
+            dots = defaultdict(float)
+            visited = 0
+            for f in sorted((f for f in query if f in self.postings), key=lambda f: self.df[f]):
+                if dots and visited + len(self.postings[f]) > POSTINGS_BUDGET:
+                    break
+                for task_id in self.postings[f]:
+                    dots[task_id] += weights[f] * self.docs[task_id][2][f]
+                visited += len(self.postings[f])
+            candidates = sorted(dots, key=dots.get, reverse=True)[:TOP_CANDIDATES]
+
+            # exact cosine for the shortlist
+            query_norm = math.sqrt(sum((tf * idf(f)) ** 2 for f, tf in query.items()))
+            scored = []
+            for task_id in candidates:
+                tf_doc = self.docs[task_id][2]
+                dot = sum(weight * tf_doc.get(f, 0) for f, weight in weights.items())
+                doc_norm = math.sqrt(sum((tf * idf(f)) ** 2 for f, tf in tf_doc.items()))
+                scored.append((dot / (query_norm * doc_norm), task_id))
+        scored.sort(reverse=True)
+        return scored[:k]
+
+    def best_match(self, description: str) -> Optional[Dict]:
+        """
+        Action adapted from the most similar past task if it clears the threshold and is
+        reusable() for the description, else None.
+        """
+        matches = self.search(description)
+        if not matches or matches[0][0] < self.threshold:
+            self.misses += 1
+            return None
+        score, task_id = matches[0]
+        with self._lock:
+            doc = self.docs.get(task_id)
+        if doc is None:
+            self.misses += 1
+            return None
+        adapted = adapt(doc[1], doc[0], description)
+        if not reusable(adapted, doc[0], description):
+            self.misses += 1
+            logging.info(f"not reusing plan of task {task_id} (similarity {score:.3f}), details differ: {description}")
+            return None
+        self.hits += 1
+        logging.info(f"reusing plan of task {task_id} (similarity {score:.3f}) for: {description}")
+        return adapted
+
+    def stats(self) -> Dict:
+        return {
+            "indexed": len(self.docs),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _remove(self, task_id: int):
+        doc = self.docs.pop(task_id, None)
+        if doc is None:
+            return
+        for feature in doc[2]:
+            self.postings[feature].discard(task_id)
+            if not self.postings[feature]:
+                del self.postings[feature]
+            self.df[feature] -= 1
+            if self.df[feature] <= 0:
+                del self.df[feature]
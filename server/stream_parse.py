@@ -0,0 +1,150 @@
+"""
+Incremental parsing of a streamed action object.
+
+ActionStreamParser is fed chunks as they arrive and scans each character exactly once, keeping just
+enough state (open containers, whether we're inside a key or value string) to
+
+- report top-level string fields the moment their closing quote arrives (`fields`), and
+- produce a best-effort snapshot of the object so far (`partial()`), with an in-progress string value
+  cut at the current position and open containers closed.
+
+    parser = ActionStreamParser()
+    for chunk in stream:
+        parser.feed(chunk.text)
+        if parser.header(): ...          # integration/action/webhook known
+    plan = parser.result()               # json.loads of the full text
+"""
+
+import json
+from typing import Dict, Optional
+
+HEADER_FIELDS = ("integration", "action", "webhook")
+
+
+class ActionStreamParser:
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, str] = {}  # completed top-level string values
+        self._pos = 0                     # next index of self.text to scan
+        self._started = False             # seen the opening "{" (anything before it is a code fence)
+        self._start = 0
+        self._stack = []                  # open "{" / "["
+        self._in_string = False
+        self._escape = False
+        self._unicode_left = 0            # hex digits still to come in a \uXXXX escape
+        self._string_start = 0
+        self._string_is_key = False
+        self._expect_key = False          # inside an object, next string is a key
+        self._last_key = None
+        self._scalar_start = None         # start of a number/true/false/null being scanned
+        self._safe_end = 0                # end of the last complete value
+        self._safe_stack = []
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._start = self._pos
+                    self._open("{")
+                self._pos += 1
+                continue
+            if self._in_string:
+                self._scan_string(ch)
+            else:
+                self._scan_structure(ch)
+            self._pos += 1
+
+    def header(self) -> Optional[Dict[str, str]]:
+        """integration/action/webhook once all three have been streamed, else None."""
+        if all(field in self.fields for field in HEADER_FIELDS):
+            return {field: self.fields[field] for field in HEADER_FIELDS}
+        return None
+
+    def partial(self) -> Optional[Dict]:
+        """Best-effort parse of everything streamed so far, or None before the object starts."""
+        if not self._started:
+            return None
+        if self._in_string and not self._string_is_key:
+            end = self._pos
+            # don't cut an escape sequence in half
+            if self._escape:
+                end -= 1
+            elif self._unicode_left:
+                end -= 6 - self._unicode_left
+            body = self.text[self._start:end]
+            snapshot = body + '"' + _closers(self._stack)
+        else:
+            snapshot = self.text[self._start:self._safe_end] + _closers(self._safe_stack)
+        try:
+            return json.loads(snapshot)
+        except ValueError:
+            return None
+
+    def result(self) -> Dict:
+        """The complete object; raises ValueError if the stream didn't contain one."""
+        if not self._started or self._stack:
+            raise ValueError("stream ended before the action object was complete")
+        return json.loads(self.text[self._start:self._safe_end])
+
+    # -- scanning ---------------------------------------------------------------------------------
+
+    def _open(self, container: str):
+        self._stack.append(container)
+        self._expect_key = container == "{"
+        # an empty container is complete once closed
+        self._safe_end = self._pos + 1
+        self._safe_stack = list(self._stack)
+
+    def _value_done(self, end: int):
+        self._safe_end = end
+        self._safe_stack = list(self._stack)
+        self._expect_key = False
+
+    def _scan_string(self, ch: str):
+        if self._unicode_left:
+            self._unicode_left -= 1
+        elif self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode_left = 4
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            raw = self.text[self._string_start:self._pos + 1]
+            if self._string_is_key:
+                self._last_key = json.loads(raw)
+            else:
+                if len(self._stack) == 1 and self._last_key is not None:
+                    self.fields[self._last_key] = json.loads(raw)
+                self._value_done(self._pos + 1)
+
+    def _scan_structure(self, ch: str):
+        if self._scalar_start is not None and ch in ",}] \t\r\n":
+            self._scalar_start = None
+            self._value_done(self._pos)
+        if ch == '"':
+            self._in_string = True
+            self._string_start = self._pos
+            self._string_is_key = bool(self._stack) and self._stack[-1] == "{" and self._expect_key
+        elif ch in "{[":
+            self._open(ch)
+        elif ch in "}]":
+            if self._stack:
+                self._stack.pop()
+            self._value_done(self._pos + 1)
+        elif ch == ",":
+            self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+        elif ch == ":":
+            self._expect_key = False
+        elif not ch.isspace() and self._scalar_start is None:
+            self._scalar_start = self._pos
+
+
+def _closers(stack) -> str:
+    return "".join("}" if container == "{" else "]" for container in reversed(stack))
+
@@ -0,0 +1,151 @@
+"""
+Streaming executor for terminal.execute. run_command() reads stdout/stderr as they're produced:
+
+- each stream goes into an OutputBuffer that keeps the last TERMINAL_BUFFER_BYTES in memory; once
+  that overflows, the whole stream is written to a file under TERMINAL_SPILL_DIR instead of being lost
+- every TERMINAL_HEARTBEAT seconds `on_progress` is called with an estimated progress and counters,
+  which the job runner writes to the task row
+- on timeout or cancellation the process group is killed and whatever output was read is returned
+"""
+
+import os
+import time
+import uuid
+import signal
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# seconds a command may run
+TERMINAL_TIMEOUT = float(os.getenv("TERMINAL_TIMEOUT", "60"))
+# bytes of each stream kept in memory (the tail); the rest goes to a spill file
+TERMINAL_BUFFER_BYTES = int(os.getenv("TERMINAL_BUFFER_BYTES", str(64 * 1024)))
+# seconds between progress updates while a command runs
+TERMINAL_HEARTBEAT = float(os.getenv("TERMINAL_HEARTBEAT", "2"))
+TERMINAL_SPILL_DIR = Path(os.getenv("TERMINAL_SPILL_DIR", os.path.join(tempfile.gettempdir(), "zygonic-output")))
+READ_CHUNK = 8192
+
+
+class OutputBuffer:
+    """The last `cap` bytes of a stream in memory; the complete stream on disk once it outgrows that."""
+
+    def __init__(self, name: str, cap: int = TERMINAL_BUFFER_BYTES, spill_dir: Path = TERMINAL_SPILL_DIR):
+        self.name = name
+        self.cap = cap
+        self.spill_dir = spill_dir
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path: Optional[Path] = None
+        self._spill = None
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        self.tail += data
+        overflow = len(self.tail) - self.cap
+        if overflow > 0:
+            if self._spill is None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                self.spill_path = self.spill_dir / f"{uuid.uuid4().hex}.{self.name}"
+                self._spill = open(self.spill_path, "wb")
+            self._spill.write(self.tail[:overflow])
+            del self.tail[:overflow]
+
+    def close(self):
+        """Finish the spill file (if any) so it holds the whole stream."""
+        if self._spill is not None:
+            self._spill.write(self.tail)
+            self._spill.close()
+            self._spill = None
+
+    def text(self) -> str:
+        return self.tail.decode("utf-8", errors="replace")
+
+    def describe(self, result: Dict):
+        result[self.name] = self.text()
+        result[f"{self.name}_bytes"] = self.total
+        if self.spill_path is not None:
+            result[f"{self.name}_truncated"] = True
+            result[f"{self.name}_file"] = str(self.spill_path)
+
+
+async def _pump(stream: asyncio.StreamReader, buffer: OutputBuffer):
+    while True:
+        data = await stream.read(READ_CHUNK)
+        if not data:
+            return
+        buffer.write(data)
+
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_command(command: str, working_dir: str = ".", timeout: float = TERMINAL_TIMEOUT,
+                      on_progress: Optional[Callable[[float, Dict], None]] = None,
+                      heartbeat: float = TERMINAL_HEARTBEAT, preexec_fn: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Run a shell command, streaming its output. Returns process_terminal()'s result shape, plus
+    byte counts and spill file paths; timeouts and cancellation return the partial output with an error.
+    """
+    stdout, stderr = OutputBuffer("stdout"), OutputBuffer("stderr")
+    result = {"command": command, "working_dir": working_dir}
+    start = time.monotonic()
+    # its own session, so a timeout kills everything the shell started, not just the shell
+    process = await asyncio.create_subprocess_shell(
+        command, cwd=working_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        start_new_session=True, preexec_fn=preexec_fn,
+    )
+    pumps = asyncio.gather(_pump(process.stdout, stdout), _pump(process.stderr, stderr))
+
+    async def beat():
+        while True:
+            await asyncio.sleep(heartbeat)
+            elapsed = time.monotonic() - start
+            # no way to know how far along a command is; creep towards (not to) done as the timeout nears
+            estimate = min(0.95, 0.02 + 0.93 * elapsed / timeout)
+            try:
+                on_progress(estimate, {"elapsed": elapsed, "stdout_bytes": stdout.total, "stderr_bytes": stderr.total})
+            except Exception as e:
+                logging.warning(f"terminal progress update failed: {e}")
+
+    beats = asyncio.ensure_future(beat()) if on_progress else None
+    try:
+        await asyncio.wait_for(asyncio.shield(pumps), timeout)
+        await process.wait()
+        result["success"] = process.returncode == 0
+        result["return_code"] = process.returncode
+    except asyncio.TimeoutError:
+        _kill(process)
+        result["error"] = f"Command timed out after {timeout:g} seconds"
+    except asyncio.CancelledError:
+        _kill(process)
+        result["error"] = "Command was cancelled"
+    finally:
+        if beats:
+            beats.cancel()
+        # the pipes close once the process group is gone; collect what's left
+        try:
+            await asyncio.wait_for(pumps, 5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pumps.cancel()
+        if process.returncode is None:
+            _kill(process)
+            await process.wait()
+        stdout.close()
+        stderr.close()
+    stdout.describe(result)
+    stderr.describe(result)
+    result["duration"] = time.monotonic() - start
+    return result
+
+
+def execute(command: str, working_dir: str = ".", timeout: float = TERMINAL_TIMEOUT,
+            on_progress: Optional[Callable[[float, Dict], None]] = None,
+            preexec_fn: Optional[Callable[[], None]] = None) -> Dict:
+    """run_command() for a worker thread (no running event loop)."""
+    return asyncio.run(run_command(command, working_dir, timeout, on_progress, preexec_fn=preexec_fn))
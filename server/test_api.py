@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import server
+from test_db import task_manager
+
+def client():
+    """TestClient for the app over a mocked TaskManager; returns it and the cursor its queries run on."""
+    tm, cursor = task_manager()
+    patchers = [
+        mock.patch.object(server.task_mgr_svc, "wait", return_value=tm),
+        mock.patch.object(server.task_mgr_svc, "get", mock.AsyncMock(return_value=tm)),
+        mock.patch.object(server, "plan_index", mock.MagicMock()),
+    ]
+    for patcher in patchers:
+        patcher.start()
+    return TestClient(server.app), cursor, lambda: [patcher.stop() for patcher in patchers]
+
+class ApiTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client, self.cursor, stop = client()
+        self.addCleanup(stop)
+
+class TestAllTasks(ApiTestCase):
+
+    def test_malformed_cursor(self):
+        response = self.client.get("/all", params={"cursor": "garbage"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid cursor", response.json()["detail"])
+
+    def test_limit_out_of_range(self):
+        self.assertEqual(self.client.get("/all", params={"limit": 0}).status_code, 422)
+        self.assertEqual(self.client.get("/all", params={"limit": 100000}).status_code, 400)
+
+    def test_last_page(self):
+        self.cursor.fetchall.return_value = []
+        response = self.client.get("/all")
+        self.assertEqual(response.json(), {"status_code": 200, "content": [], "next_cursor": None})
+
+    def test_unknown_field(self):
+        response = self.client.get("/all", params={"fields": "id,nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("nope", response.json()["detail"])
+
+    def test_fields(self):
+        self.cursor.fetchall.return_value = []
+        self.client.get("/all", params={"fields": " description , status,"})
+        query = self.cursor.execute.call_args.args[0]
+        self.assertIn("SELECT id, description, status, created_at", query)
+
+class TestBatch(ApiTestCase):
+
+    def test_create_maps_outcomes_to_items(self):
+        async def plan(description):
+            if description == "bad":
+                raise ValueError("no plan")
+            return {"integration": "notion", "action": "search", "webhook": "NOTION", "args": {"query": description}}
+        with mock.patch.object(server, "plan", plan), mock.patch("db.db.psycopg2.extras.execute_values", return_value=[(11,), (12,)]):
+            response = self.client.post("/batch/new", json={"tasks": [
+                {"description": "one", "status": "NEW", "progress": 0.0},
+                {"description": "bad", "status": "NEW", "progress": 0.0},
+                {"description": "three", "status": "NEW", "progress": 0.0},
+            ]})
+        content = response.json()["content"]
+        self.assertEqual([item["index"] for item in content], [0, 1, 2])
+        self.assertEqual([item.get("id") for item in content], [11, None, 12])
+        self.assertFalse(content[1]["ok"])
+        self.assertIn("no plan", content[1]["error"])
+
+    def test_delete_reports_missing_ids(self):
+        self.cursor.fetchall.return_value = [(2,)]
+        response = self.client.post("/batch/delete", json={"task_ids": [1, 2]})
+        self.assertEqual(response.json()["content"], [
+            {"index": 0, "ok": False, "id": 1, "error": "Task 1 not found"},
+            {"index": 1, "ok": True, "id": 2},
+        ])
+
+    def test_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.post("/batch/delete", json={"task_ids": []}).status_code, 400)
+        too_many = list(range(server.BATCH_MAX_ITEMS + 1))
+        self.assertEqual(self.client.post("/batch/delete", json={"task_ids": too_many}).status_code, 400)
+
+class TestReady(unittest.TestCase):
+
+    def test_not_ready_until_every_service_is(self):
+        response = TestClient(server.app).get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status_code"], 503)
+        self.assertFalse(response.json()["content"]["ready"])
+        with mock.patch.object(server.LazyService, "ready", mock.PropertyMock(return_value=True)):
+            response = TestClient(server.app).get("/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status_code"], 200)
+
+class TestResults(ApiTestCase):
+
+    def test_spilled_result_links_to_its_file(self):
+        self.cursor.fetchall.return_value = [
+            {"id": 8, "task_id": 4, "result": None, "result_gz": None, "result_file": "/spill/4/a.json.gz"},
+            {"id": 7, "task_id": 4, "result": {"ok": True}, "result_gz": None, "result_file": None},
+        ]
+        content = self.client.get("/tasks/4/results").json()["content"]
+        self.assertEqual(content[0], {"id": 8, "task_id": 4, "result": None, "result_url": "/tasks/4/results/8"})
+        self.assertEqual(content[1], {"id": 7, "task_id": 4, "result": {"ok": True}})
+
+    def test_missing_spill_file(self):
+        self.cursor.fetchone.return_value = None
+        self.assertEqual(self.client.get("/tasks/4/results/8").status_code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import json
+import asyncio
+import unittest
+from collections import OrderedDict
+from backends import GeminiBackend, OfflineBackend, make_backend
+from gemini import Model
+from schema import PlanError
+from plan import plan_errors
+
+with open("actions.json") as f:
+    ACTIONS = json.load(f)
+
+class TestOfflineBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = OfflineBackend(ACTIONS)
+
+    def test_picks_a_matching_action(self):
+        plan = self.backend.plan(ACTIONS, "schedule a meeting with sam tomorrow")
+        self.assertEqual((plan["integration"], plan["action"]), ("gcal", "create"))
+        self.assertEqual(plan["webhook"], "GCAL")
+        self.assertEqual(plan["args"]["title"], "schedule a meeting with sam tomorrow")
+
+    def test_only_picks_offered_tools(self):
+        sheets = [spec for spec in ACTIONS if spec["integration"] == "sheets"]
+        plan = self.backend.plan(sheets, "schedule a meeting with sam tomorrow")
+        self.assertEqual(plan["integration"], "sheets")
+        self.assertEqual(plan["args"]["sheet1name"], "Sheet1")
+
+    def test_deterministic(self):
+        text = self.backend.generate("", ACTIONS, "write notes on Socrates")
+        self.assertEqual(text, self.backend.generate("", ACTIONS, "write notes on Socrates"))
+
+    def test_steps(self):
+        plan = OfflineBackend(ACTIONS, steps=True).plan(ACTIONS, "schedule a meeting with sam tomorrow")
+        self.assertEqual(plan["steps"][0]["integration"], "gcal")
+        self.assertEqual(plan_errors(plan), [])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_backend("nope", ACTIONS)
+
+class TestModelWithOfflineBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.model = Model(backend=OfflineBackend(ACTIONS))
+
+    def test_query_action(self):
+        plan = self.model.query_action("draft an email to my boss")
+        self.assertEqual((plan["integration"], plan["action"]), ("email", "draft"))
+        self.assertEqual(asyncio.run(self.model.aquery_action("draft an email to my boss")), plan)
+        self.assertEqual(self.model.stats()["backend"], "offline")
+
+    def test_stream_action(self):
+        async def events():
+            return [event async for event in self.model.astream_action("write notes on Socrates and Plato")]
+        events = asyncio.run(events())
+        self.assertEqual(events[-1][0], "plan")
+        self.assertIn("header", [kind for kind, _ in events])
+
+    def test_stream_header_before_args(self):
+        async def events():
+            return [event async for event in self.model.astream_action("write notes on Socrates and Plato")]
+        events = asyncio.run(events())
+        kinds = [kind for kind, _ in events]
+        with_args = [i for i, (kind, payload) in enumerate(events) if kind == "partial" and "args" in payload]
+        self.assertLess(kinds.index("header"), with_args[0])
+
+class CountingBackend(OfflineBackend):
+    """OfflineBackend that records how many agenerate() calls overlap."""
+
+    def __init__(self, actions):
+        super().__init__(actions)
+        self.running = 0
+        self.peak = 0
+
+    async def agenerate(self, instruction, tools, prompt, batch=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return await super().agenerate(instruction, tools, prompt, batch=batch)
+
+class TestModelConcurrency(unittest.TestCase):
+
+    def test_aquery_action_caps_concurrent_calls(self):
+        backend = CountingBackend(ACTIONS)
+        model = Model(max_concurrency=2, backend=backend)
+        model.cache = model.batcher = None
+        async def plan_all():
+            return await asyncio.gather(*(model.aquery_action(f"write notes on topic {i}") for i in range(6)))
+        plans = asyncio.run(plan_all())
+        self.assertEqual(len(plans), 6)
+        self.assertEqual(backend.peak, 2)
+
+    def test_rejects_zero_concurrency(self):
+        with self.assertRaises(ValueError):
+            Model(max_concurrency=0, backend=OfflineBackend(ACTIONS))
+
+class FakeGenai:
+    """google.generativeai stand-in that records the generation config of every streamed request."""
+
+    def __init__(self):
+        self.stream_configs = []
+        genai = self
+
+        class GenerativeModel:
+            def __init__(self, name, system_instruction=None, generation_config=None):
+                self.config = generation_config
+
+            async def generate_content_async(self, prompt, stream=False, generation_config=None):
+                genai.stream_configs.append({**(self.config or {}), **(generation_config or {})})
+                async def chunks():
+                    yield type("Chunk", (), {"text": "{}"})()
+                return chunks()
+
+        self.GenerativeModel = GenerativeModel
+
+class TestGeminiBackend(unittest.TestCase):
+
+    def test_stream_is_not_schema_constrained(self):
+        # constrained output is alphabetical (args before webhook), which would hold back the header
+        backend = GeminiBackend.__new__(GeminiBackend)
+        backend.genai, backend.model_name, backend.steps, backend._models = FakeGenai(), "fake", False, OrderedDict()
+        async def stream():
+            return [chunk async for chunk in backend.astream("instruction", ACTIONS, "prompt")]
+        asyncio.run(stream())
+        config = backend.genai.stream_configs[0]
+        self.assertEqual(config["response_mime_type"], "application/json")
+        self.assertIsNone(config["response_schema"])
+
+class GarbledBackend(OfflineBackend):
+    """Answers the first `bad` calls with broken JSON."""
+    def __init__(self, bad):
+        super().__init__(ACTIONS)
+        self.bad = bad
+
+    async def agenerate(self, instruction, tools, prompt, batch=None):
+        if self.bad:
+            self.bad -= 1
+            return '```json\n{"integration": "notion", "act'
+        return await super().agenerate(instruction, tools, prompt, batch)
+
+class TestPlanRepair(unittest.TestCase):
+
+    def test_invalid_response_is_repaired_once(self):
+        model = Model(backend=GarbledBackend(bad=1))
+        plan = asyncio.run(model.aquery_action("draft an email to my boss"))
+        self.assertEqual(model.registry.errors(plan), [])
+        validation = model.stats()["validation"]
+        self.assertEqual((validation["parse_failures"], validation["repairs"], validation["repaired"]), (1, 1, 1))
+
+    def test_gives_up_after_bounded_retries(self):
+        model = Model(backend=GarbledBackend(bad=10))
+        with self.assertRaises(PlanError):
+            asyncio.run(model.aquery_action("draft an email to my boss"))
+        self.assertEqual(model.stats()["validation"]["invalid"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
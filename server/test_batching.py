@@ -0,0 +1,63 @@
+import gc
+import asyncio
+import unittest
+from batching import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def run_all(self, batcher, items):
+        async def go():
+            return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True)
+        return asyncio.run(go())
+
+    def test_concurrent_submits_share_a_batch(self):
+        calls = []
+        async def run_batch(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+        batcher = MicroBatcher(run_batch, window=0.01, max_size=10)
+        self.assertEqual(self.run_all(batcher, [1, 2, 3]), [2, 4, 6])
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def test_batch_task_kept_until_done(self):
+        async def run_batch(items):
+            await asyncio.sleep(0.02)
+            return items
+        batcher = MicroBatcher(run_batch, window=0, max_size=1)
+        async def main():
+            pending = asyncio.ensure_future(batcher.submit("x"))
+            await asyncio.sleep(0.005)
+            self.assertEqual(len(batcher._running), 1)
+            gc.collect()
+            result = await pending
+            await asyncio.sleep(0)
+            return result
+        self.assertEqual(asyncio.run(main()), "x")
+        self.assertEqual(batcher._running, set())
+
+    def test_max_size_splits_batches(self):
+        calls = []
+        async def run_batch(items):
+            calls.append(len(items))
+            return items
+        batcher = MicroBatcher(run_batch, window=10, max_size=2)
+        self.assertEqual(self.run_all(batcher, [1, 2, 3, 4]), [1, 2, 3, 4])
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual(batcher.stats()["largest_batch"], 2)
+
+    def test_per_item_errors(self):
+        async def run_batch(items):
+            return [ValueError("bad") if item == 2 else item for item in items]
+        results = self.run_all(MicroBatcher(run_batch, window=0.01, max_size=10), [1, 2, 3])
+        self.assertEqual(results[0], 1)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 3)
+
+    def test_batch_failure_fails_every_item(self):
+        async def run_batch(items):
+            return items[:1]
+        results = self.run_all(MicroBatcher(run_batch, window=0.01, max_size=10), [1, 2])
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest import mock
+import requests
+import breaker
+import webhook
+from breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("GCAL", failures=3, reset_after=10, clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(3)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self.fail(3)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_in(), 10)
+
+def response(status, body=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = b"{}" if body is None else body
+    return r
+
+class TestWebhookRetries(unittest.TestCase):
+
+    def dispatch(self, action, *statuses):
+        session = mock.Mock()
+        session.post.side_effect = [response(status) for status in statuses]
+        with mock.patch.dict(os.environ, {"RETRY_TEST": "http://n8n.invalid/hook"}), \
+                mock.patch("http_clients.session", return_value=session), mock.patch("webhook.backoff", return_value=0):
+            result = webhook.webhook("notion", action, {}, "RETRY_TEST")
+        return result, session.post.call_count
+
+    def tearDown(self):
+        breaker._breakers.pop("RETRY_TEST", None)
+
+    def test_idempotent_action_retried_on_transient_failure(self):
+        self.assertEqual(self.dispatch("search", 503, 429, 200), ({}, 3))
+
+    def test_rejection_and_side_effects_not_retried(self):
+        self.assertEqual(self.dispatch("search", 400), (None, 1))
+        self.assertEqual(self.dispatch("create", 503), (None, 1))
+        self.assertEqual(breaker.get("RETRY_TEST").stats()["consecutive_failures"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
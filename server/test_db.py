@@ -0,0 +1,290 @@
+import os
+import gzip
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import psycopg2
+from db.db import (DatabaseConnection, TaskManager, encode_cursor, decode_cursor, encode_result, decode_result,
+                   select_columns, MAX_PAGE_SIZE, TASK_FIELDS, MIGRATION_LOCK_ID, PLAN_CACHE_SCHEMA, TASK_RESULTS_SCHEMA, TASKS_SCHEMA)
+
+def task_manager():
+    """TaskManager over a mocked connection; returns it and the cursor its queries run on."""
+    with mock.patch("db.db.DatabaseConnection") as connection:
+        tm = TaskManager()
+    cursor = mock.MagicMock()
+    connection.return_value.cursor.return_value.__enter__.return_value = cursor
+    return tm, cursor
+
+class TestMigrate(unittest.TestCase):
+
+    def test_runs_every_schema_under_the_lock(self):
+        tm, cursor = task_manager()
+        tm.migrate()
+        statements = [call.args for call in cursor.execute.call_args_list]
+        self.assertEqual(statements[0], ("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,)))
+        self.assertEqual(statements[1:], [(TASKS_SCHEMA,), (PLAN_CACHE_SCHEMA,), (TASK_RESULTS_SCHEMA,)])
+
+    def test_schema_is_rerunnable(self):
+        # every statement must be safe against a database that already has (an older) schema
+        for statement in (TASKS_SCHEMA + PLAN_CACHE_SCHEMA + TASK_RESULTS_SCHEMA).split(";"):
+            statement = " ".join(line.split("--")[0] for line in statement.splitlines()).strip().upper()
+            if statement.startswith("CREATE TABLE") or statement.startswith("CREATE INDEX"):
+                self.assertIn("IF NOT EXISTS", statement)
+            elif statement.startswith("DROP"):
+                self.assertIn("IF EXISTS", statement)
+
+class TestCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        row = {"id": 42, "created_at": datetime(2026, 10, 1, 12, 30, 5, 123456)}
+        self.assertEqual(decode_cursor(encode_cursor(row)), (row["created_at"], 42))
+
+    def test_malformed(self):
+        for cursor in ("garbage", "W10=", "WyJub3QgYSBkYXRlIiwgMV0="):
+            with self.assertRaisesRegex(ValueError, "Invalid cursor"):
+                decode_cursor(cursor)
+
+    def test_page_hands_out_cursor_of_last_row(self):
+        tm, cursor = task_manager()
+        rows = [{"id": id, "created_at": datetime(2026, 10, 1, 12, id)} for id in (3, 2, 1)]
+        cursor.fetchall.return_value = rows
+        page = tm.get_tasks_page(limit=2)
+        self.assertEqual([task["id"] for task in page["tasks"]], [3, 2])
+        self.assertEqual(decode_cursor(page["next_cursor"]), (rows[1]["created_at"], 2))
+        query, values = cursor.execute.call_args.args
+        self.assertIn("LIMIT %s", query)
+        self.assertEqual(values, [3])
+
+    def test_next_page_starts_after_cursor(self):
+        tm, cursor = task_manager()
+        cursor.fetchall.return_value = []
+        created_at = datetime(2026, 10, 1, 12, 2)
+        page = tm.get_tasks_page(limit=2, cursor=encode_cursor({"id": 2, "created_at": created_at}), status="NEW")
+        self.assertEqual(page, {"tasks": [], "next_cursor": None})
+        query, values = cursor.execute.call_args.args
+        self.assertIn("(created_at, id) < (%s, %s)", query)
+        self.assertEqual(values, [["NEW"], created_at, 2, 3])
+
+    def test_limit_out_of_range(self):
+        tm, _ = task_manager()
+        with self.assertRaises(ValueError):
+            tm.get_tasks_page(limit=MAX_PAGE_SIZE + 1)
+
+class TestSelectColumns(unittest.TestCase):
+
+    def test_all_columns_by_default(self):
+        self.assertEqual(select_columns(), ", ".join(TASK_FIELDS))
+        self.assertEqual(select_columns([]), ", ".join(TASK_FIELDS))
+
+    def test_table_order_with_required_columns(self):
+        self.assertEqual(select_columns(["status", "description"], required=("id", "created_at")),
+                         "id, description, status, created_at")
+
+    def test_rejects_unknown_fields(self):
+        with self.assertRaisesRegex(ValueError, "Unknown task fields"):
+            select_columns(["id", "action; DROP TABLE tasks"])
+
+    def test_page_selects_only_requested_fields(self):
+        tm, cursor = task_manager()
+        cursor.fetchall.return_value = []
+        tm.get_tasks_page(fields=["status"])
+        query = cursor.execute.call_args.args[0]
+        self.assertIn("SELECT id, status, created_at", query)
+        self.assertNotIn("action", query)
+
+class TestBatchOutcomes(unittest.TestCase):
+
+    def test_create_skips_invalid_items(self):
+        tm, _ = task_manager()
+        with mock.patch("db.db.psycopg2.extras.execute_values", return_value=[(5,), (6,)]) as execute_values:
+            outcomes = tm.create_tasks([
+                {"description": "a"},
+                {"description": "b", "progress": 2.0},
+                {"status": "NEW"},
+                {"description": "c", "status": "DONE"},
+                {"description": "d", "status": "COMPLETED"},
+            ])
+        self.assertEqual(len(execute_values.call_args.args[2]), 2)
+        self.assertEqual(outcomes[0], {"ok": True, "id": 5})
+        self.assertEqual(outcomes[4], {"ok": True, "id": 6})
+        for outcome in outcomes[1:4]:
+            self.assertFalse(outcome["ok"])
+            self.assertTrue(outcome["error"].startswith("Invalid task"))
+
+    def test_update_reports_missing_and_invalid(self):
+        tm, _ = task_manager()
+        with mock.patch("db.db.psycopg2.extras.execute_values", return_value=[(1,)]):
+            outcomes = tm.update_tasks([{"id": 1, "status": "STARTED"}, {"id": 2, "progress": 0.5}, {"id": 3}, {"id": 4, "owner": "x"}])
+        self.assertEqual(outcomes[0], {"ok": True, "id": 1})
+        self.assertEqual(outcomes[1], {"ok": False, "id": 2, "error": "Task 2 not found"})
+        self.assertIn("No valid fields", outcomes[2]["error"])
+        self.assertIn("Unknown fields", outcomes[3]["error"])
+
+    def test_nothing_valid_runs_no_query(self):
+        tm, cursor = task_manager()
+        with mock.patch("db.db.psycopg2.extras.execute_values") as execute_values:
+            self.assertFalse(tm.create_tasks([{"description": "a", "status": "nope"}])[0]["ok"])
+        execute_values.assert_not_called()
+        self.assertEqual(tm.delete_tasks([]), [])
+        cursor.execute.assert_not_called()
+
+def fake_connection():
+    conn = mock.MagicMock()
+    conn.closed = 0
+    return conn
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("db.db.psycopg2.connect", side_effect=lambda **_: fake_connection())
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_min_up_front_and_keeps_up_to_max(self):
+        pool = DatabaseConnection(minconn=1, maxconn=3)
+        self.assertEqual(self.connect.call_count, 1)
+        with pool.connection() as a, pool.connection() as b, pool.connection() as c:
+            self.assertEqual(pool.stats()["in_use"], 3)
+        self.assertEqual(pool.stats(), {"min": 1, "max": 3, "in_use": 0, "idle": 3})
+        # the extra connections are reused rather than reopened
+        with pool.connection() as a, pool.connection() as b, pool.connection() as c:
+            pass
+        self.assertEqual(self.connect.call_count, 3)
+
+    def test_commits_on_success(self):
+        pool = DatabaseConnection(minconn=1, maxconn=1)
+        with pool.connection() as conn:
+            pass
+        conn.commit.assert_called_once()
+        conn.rollback.assert_not_called()
+
+    def test_rolls_back_and_returns_connection_on_error(self):
+        pool = DatabaseConnection(minconn=1, maxconn=1)
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError("boom")
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+        self.assertEqual(pool.stats()["idle"], 1)
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+
+    def test_discards_connection_when_rollback_fails(self):
+        pool = DatabaseConnection(minconn=1, maxconn=1)
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.connection() as conn:
+                conn.rollback.side_effect = psycopg2.OperationalError("server closed the connection")
+                conn.close.side_effect = lambda: setattr(conn, "closed", 2)
+                raise psycopg2.OperationalError("server closed the connection")
+        conn.close.assert_called_once()
+        self.assertEqual(pool.stats()["idle"], 0)
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
+
+    def test_discards_closed_idle_connection(self):
+        pool = DatabaseConnection(minconn=1, maxconn=1)
+        with pool.connection() as dead:
+            pass
+        dead.closed = 2
+        with self.assertLogs(level="WARNING"):
+            with pool.connection() as conn:
+                self.assertIsNot(conn, dead)
+
+    def test_pings_stale_idle_connection(self):
+        pool = DatabaseConnection(minconn=1, maxconn=1)
+        with pool.connection() as dead:
+            pass
+        dead.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("gone")
+        with mock.patch("db.db.DB_HEALTHCHECK_INTERVAL", 0), self.assertLogs(level="WARNING"):
+            with pool.connection() as conn:
+                self.assertIsNot(conn, dead)
+        dead.close.assert_called_once()
+
+    def test_times_out_when_every_slot_is_taken(self):
+        pool = DatabaseConnection(minconn=0, maxconn=1)
+        with mock.patch("db.db.DB_POOL_TIMEOUT", 0.01), pool.connection():
+            with self.assertRaisesRegex(Exception, "Timed out"):
+                with pool.connection():
+                    pass
+
+    def test_close_closes_idle_connections(self):
+        pool = DatabaseConnection(minconn=2, maxconn=2)
+        idle = [conn for conn, _ in pool._idle]
+        pool.close()
+        for conn in idle:
+            conn.close.assert_called_once()
+        self.assertEqual(pool.stats()["idle"], 0)
+
+class TestResultEncoding(unittest.TestCase):
+
+    def test_small_result_inline(self):
+        columns = encode_result(1, {"ok": True})
+        self.assertEqual(json.loads(columns["result"]), {"ok": True})
+        self.assertIsNone(columns["result_gz"])
+        self.assertIsNone(columns["result_file"])
+        self.assertEqual(columns["result_bytes"], columns["stored_bytes"])
+
+    def test_large_result_gzipped(self):
+        result = {"text": "lorem ipsum " * 5000}
+        with mock.patch("db.db.RESULT_COMPRESS_BYTES", 1024):
+            columns = encode_result(1, result)
+        self.assertIsNone(columns["result"])
+        self.assertIsNone(columns["result_file"])
+        self.assertLess(columns["stored_bytes"], columns["result_bytes"])
+        row = decode_result({"id": 1, "result": None, "result_gz": columns["result_gz"].adapted, "result_file": None})
+        self.assertEqual(row, {"id": 1, "result": result})
+
+    def test_store_and_read_back(self):
+        tm, cursor = task_manager()
+        result = {"text": "lorem ipsum " * 5000}
+        with mock.patch("db.db.RESULT_COMPRESS_BYTES", 1024), \
+             mock.patch("db.db.psycopg2.extras.execute_values", return_value=[(3,)]) as execute_values:
+            self.assertEqual(tm.add_task_results([{"task_id": 1, "status": "COMPLETED", "result": result}]), [3])
+        stored = execute_values.call_args.args[2][0]
+        cursor.fetchall.return_value = [{"id": 3, "task_id": 1, "result": stored[4], "result_gz": stored[5].adapted, "result_file": stored[6]}]
+        page = tm.get_task_results_page(1)
+        self.assertEqual(page["results"][0]["result"], result)
+        self.assertIsNone(page["next_cursor"])
+
+class TestSpilledResults(unittest.TestCase):
+
+    def setUp(self):
+        spill_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spill_dir.cleanup)
+        self.spill_dir = spill_dir.name
+        for name, value in (("RESULT_SPILL_DIR", self.spill_dir), ("RESULT_COMPRESS_BYTES", 0), ("RESULT_MAX_BYTES", 0)):
+            patcher = mock.patch(f"db.db.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_spill_file_holds_the_gzipped_result(self):
+        columns = encode_result(7, {"rows": list(range(100))})
+        self.assertIsNone(columns["result"])
+        self.assertIsNone(columns["result_gz"])
+        self.assertEqual(os.path.dirname(columns["result_file"]), os.path.join(self.spill_dir, "7"))
+        with open(columns["result_file"], "rb") as f:
+            self.assertEqual(json.loads(gzip.decompress(f.read())), {"rows": list(range(100))})
+        row = decode_result({"id": 1, "result": None, "result_gz": None, "result_file": columns["result_file"]})
+        self.assertEqual(row, {"id": 1, "result": None, "spilled": True})
+
+    def test_delete_removes_spill_files(self):
+        path = encode_result(7, "x" * 100)["result_file"]
+        tm, cursor = task_manager()
+        cursor.fetchall.return_value = [(7,)]
+        tm.delete_tasks([7, 8])
+        self.assertFalse(os.path.exists(path))
+
+    def test_delete_keeps_spill_files_of_missing_tasks(self):
+        path = encode_result(7, "x" * 100)["result_file"]
+        tm, cursor = task_manager()
+        cursor.rowcount = 0
+        self.assertFalse(tm.delete_task(7))
+        self.assertTrue(os.path.exists(path))
+        cursor.rowcount = 1
+        self.assertTrue(tm.delete_task(7))
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == "__main__":
+    unittest.main()
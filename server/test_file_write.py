@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import file_write
+from action import Action
+from registry import InvalidAction
+from file_write import PatchError, apply_patch, parse_patch
+
+PATCH = """--- a/app.py
++++ b/app.py
+@@ -1,3 +1,3 @@
+ import os
+-DEBUG = True
++DEBUG = False
+
+@@ -5,2 +5,3 @@
+ def main():
+     pass
++    return 0
+"""
+
+ORIGINAL = "import os\nDEBUG = True\n\n\ndef main():\n    pass\n"
+
+class TestFileWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "sub" / "app.py"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_content_write_is_atomic_and_chunked(self):
+        content = "x" * 10 + "é" * 10
+        result = file_write.modify(str(self.path), content)
+        self.assertTrue(result["success"])
+        self.assertEqual(self.path.read_text(encoding="utf-8"), content)
+        self.assertEqual(result["bytes"], 30)
+        self.assertEqual(os.listdir(self.path.parent), ["app.py"])
+
+    def test_unchanged_write_is_skipped(self):
+        file_write.modify(str(self.path), ORIGINAL)
+        os.utime(self.path, (0, 0))
+        result = file_write.modify(str(self.path), ORIGINAL)
+        self.assertFalse(result["changed"])
+        self.assertEqual(self.path.stat().st_mtime, 0)
+        self.assertEqual(os.listdir(self.path.parent), ["app.py"])
+
+    def test_patch(self):
+        file_write.modify(str(self.path), ORIGINAL)
+        self.path.chmod(0o755)
+        result = file_write.modify(str(self.path), patch=PATCH)
+        self.assertTrue(result["changed"], result)
+        self.assertEqual(result["hunks"], 2)
+        self.assertEqual(self.path.read_text(), "import os\nDEBUG = False\n\n\ndef main():\n    pass\n    return 0\n")
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o755)
+
+    def test_patch_keeps_crlf(self):
+        self.path.parent.mkdir()
+        self.path.write_bytes(ORIGINAL.replace("\n", "\r\n").encode())
+        file_write.modify(str(self.path), patch=PATCH)
+        self.assertEqual(self.path.read_bytes(), b"import os\r\nDEBUG = False\r\n\r\n\r\ndef main():\r\n    pass\r\n    return 0\r\n")
+
+    def test_mismatched_patch_leaves_file_alone(self):
+        file_write.modify(str(self.path), ORIGINAL.replace("True", "None"))
+        result = file_write.modify(str(self.path), patch=PATCH)
+        self.assertIn("line 2 doesn't match", result["error"])
+        self.assertIn("DEBUG = None", self.path.read_text())
+        self.assertEqual(os.listdir(self.path.parent), ["app.py"])
+
+    def test_patch_creates_file(self):
+        result = file_write.modify(str(self.path), patch="@@ -0,0 +1,2 @@\n+a\n+b\n")
+        self.assertTrue(result["success"], result)
+        self.assertEqual(self.path.read_text(), "a\nb\n")
+
+    def test_new_file_mode_follows_umask(self):
+        umask = os.umask(0)
+        os.umask(umask)
+        file_write.modify(str(self.path), ORIGINAL)
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o666 & ~umask)
+
+    def test_patch_after_last_line_without_newline(self):
+        file_write.modify(str(self.path), "a\nb")
+        file_write.modify(str(self.path), patch="@@ -1,2 +1,3 @@\n a\n b\n\\ No newline at end of file\n+c\n")
+        self.assertEqual(self.path.read_text(), "a\nb\nc\n")
+        file_write.modify(str(self.path), patch="@@ -3,0 +4,1 @@\n+d\n\\ No newline at end of file\n")
+        self.assertEqual(self.path.read_text(), "a\nb\nc\nd")
+
+    def test_neither_content_nor_patch_leaves_file_alone(self):
+        file_write.modify(str(self.path), ORIGINAL)
+        self.assertIn("error", file_write.modify(str(self.path)))
+        self.assertIn("error", file_write.modify(str(self.path), None, ""))
+        self.assertEqual(self.path.read_text(), ORIGINAL)
+        with self.assertRaises(InvalidAction):
+            Action(integration="file", action="modify", args={"filepath": str(self.path)}, webhook="FILES")
+        self.assertEqual(self.path.read_text(), ORIGINAL)
+        # an explicit empty string is a request for an empty file
+        self.assertTrue(file_write.modify(str(self.path), "")["success"])
+        self.assertEqual(self.path.read_text(), "")
+
+    def test_content_and_patch_together(self):
+        self.assertIn("error", file_write.modify(str(self.path), "x", PATCH))
+
+class TestParsePatch(unittest.TestCase):
+
+    def test_counts_checked(self):
+        with self.assertRaises(PatchError):
+            parse_patch("@@ -1,3 +1,3 @@\n a\n-b\n+c\n")
+
+    def test_no_hunks(self):
+        with self.assertRaises(PatchError):
+            parse_patch("just some text")
+
+    def test_past_end(self):
+        with self.assertRaises(PatchError):
+            list(apply_patch(["a\n"], parse_patch("@@ -5,1 +5,1 @@\n-x\n+y\n")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import os
+import unittest
+from unittest import mock
+import http_clients
+
+class TestHttpClients(unittest.TestCase):
+
+    def test_per_webhook_read_timeout(self):
+        with mock.patch.dict(os.environ, {"GCAL_TIMEOUT": "4.5"}):
+            self.assertEqual(http_clients.timeout_for("GCAL"), (http_clients.WEBHOOK_CONNECT_TIMEOUT, 4.5))
+        self.assertEqual(http_clients.timeout_for("NO_SUCH_WEBHOOK")[1], http_clients.WEBHOOK_TIMEOUT)
+
+    def test_session_is_shared(self):
+        self.assertIs(http_clients.session(), http_clients.session())
+        adapter = http_clients.session().get_adapter("https://n8n.example.com")
+        self.assertEqual(adapter._pool_maxsize, http_clients.WEBHOOK_POOL_SIZE)
+
+if __name__ == "__main__":
+    unittest.main()
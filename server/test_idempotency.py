@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from fastapi import HTTPException
+from idempotency import IdempotencyStore
+
+class TestIdempotencyStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = IdempotencyStore(maxsize=10, ttl=60)
+        self.calls = 0
+
+    async def call(self, result="job-1", delay=0.1, error=None):
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return {"job_id": result, "call": self.calls}
+
+    def test_concurrent_duplicates_collapse(self):
+        async def main():
+            return await asyncio.gather(*(self.store.run("k", "start:1", self.call) for _ in range(5)))
+        outcomes = asyncio.run(main())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({outcome[0]["call"] for outcome in outcomes}, {1})
+        self.assertEqual(sorted(replayed for _, replayed in outcomes), [False, True, True, True, True])
+        self.assertEqual(self.store.stats()["collapsed"], 4)
+
+    def test_completed_response_replayed(self):
+        async def main():
+            first = await self.store.run("k", "start:1", self.call)
+            again = await self.store.run("k", "start:1", self.call)
+            return first, again
+        first, again = asyncio.run(main())
+        self.assertEqual(again, (first[0], True))
+        self.assertEqual(self.calls, 1)
+
+    def test_key_reused_for_another_request(self):
+        async def main():
+            await self.store.run("k", "start:1", self.call)
+            await self.store.run("k", "start:2", self.call)
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(main())
+        self.assertEqual(raised.exception.status_code, 422)
+
+    def test_client_errors_replayed_server_errors_retried(self):
+        async def main():
+            for code in (409, 409, 503, 503):
+                try:
+                    await self.store.run(f"k{code}", "start:1", lambda: self.call(error=HTTPException(status_code=code)))
+                except HTTPException as e:
+                    self.assertEqual(e.status_code, code)
+        asyncio.run(main())
+        self.assertEqual(self.calls, 3)
+
+    def test_waiters_retry_after_a_crash(self):
+        async def main():
+            async def crash():
+                self.calls += 1
+                await asyncio.sleep(0.05)
+                raise RuntimeError("boom")
+            first = asyncio.ensure_future(self.store.run("k", "start:1", crash))
+            await asyncio.sleep(0.01)
+            second = await self.store.run("k", "start:1", self.call)
+            with self.assertRaises(RuntimeError):
+                await first
+            return second
+        body, replayed = asyncio.run(main())
+        self.assertEqual((body["call"], replayed), (2, False))
+
+    def test_no_key(self):
+        async def main():
+            await self.store.run(None, "start:1", self.call)
+            await self.store.run(None, "start:1", self.call)
+        asyncio.run(main())
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.store.stats()["stored"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import time
+import unittest
+from action import Action
+from plan import Plan, failure_message
+from jobs import JobRunner, COMPLETED, FAILED, RUNNING
+
+class FakeTaskManager:
+    """Records status transitions instead of writing to postgres"""
+    def __init__(self):
+        self.updates = []
+        self.results = []
+        self.touched = []
+        self.stale_checks = []
+
+    def transition_task(self, id, from_status, to_status, progress=None):
+        self.updates.append((id, to_status, progress))
+        return {"id": id, "status": to_status}
+
+    def touch_tasks(self, ids):
+        self.touched.append(sorted(ids))
+        return len(ids)
+
+    def fail_stale_tasks(self, max_age):
+        self.stale_checks.append(max_age)
+        return []
+
+    def add_task_results(self, results):
+        self.results += results
+        return list(range(len(results)))
+
+class TestJobRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.task_mgr = FakeTaskManager()
+        self.runner = JobRunner(self.task_mgr, workers=2)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def wait_for(self, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.runner.get(job_id)
+            if job["status"] in (COMPLETED, FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish")
+
+    def test_completed_job_writes_back(self):
+        action = Action(integration="terminal", action="execute",
+                        args={"command": "echo hi"}, webhook="TERMINAL")
+        job_id = self.runner.submit(7, action)
+        job = self.wait_for(job_id)
+        self.assertEqual(job["status"], COMPLETED)
+        self.assertIn((7, COMPLETED, 1.0), self.task_mgr.updates)
+        [row] = self.task_mgr.results
+        self.assertEqual((row["task_id"], row["status"], row["result"]["stdout"]), (7, COMPLETED, "hi\n"))
+
+    def test_failed_job_writes_back(self):
+        action = Action(integration="terminal", action="execute",
+                        args={"command": "exit 3"}, webhook="TERMINAL")
+        job_id = self.runner.submit(8, action)
+        job = self.wait_for(job_id)
+        self.assertEqual(job["status"], FAILED)
+        self.assertIn((8, FAILED, None), self.task_mgr.updates)
+        self.assertEqual(job["error"], "command exited with code 3")
+
+    def test_failure_message_fits_the_action(self):
+        action = Action(integration="terminal", action="execute",
+                        args={"command": "echo oops >&2; exit 2"}, webhook="TERMINAL")
+        self.assertEqual(self.wait_for(self.runner.submit(10, action))["error"], "command exited with code 2: oops")
+        notion = Action(integration="notion", action="create", args={"page_name": "x", "page_content": "y"}, webhook="NOTION")
+        self.assertEqual(failure_message(None, notion), "notion.create: no usable response from the NOTION webhook")
+
+    def test_plan_reports_progress(self):
+        step = {"integration": "terminal", "action": "execute", "webhook": "TERMINAL", "depends_on": []}
+        plan = Plan.from_dict({"steps": [
+            {**step, "id": "a", "args": {"command": "echo a"}},
+            {**step, "id": "b", "args": {"command": "echo {{a.stdout}}"}},
+        ]})
+        job = self.wait_for(self.runner.submit(9, plan))
+        self.assertEqual(job["status"], COMPLETED)
+        self.assertEqual(job["progress"]["steps"]["b"]["status"], "completed")
+        progress = [p for id, status, p in self.task_mgr.updates if status == "STARTED"]
+        self.assertEqual(progress, sorted(progress))
+        self.assertIn((9, COMPLETED, 1.0), self.task_mgr.updates)
+        self.assertEqual([(row["step"], row["status"]) for row in self.task_mgr.results], [("a", COMPLETED), ("b", COMPLETED)])
+
+    def test_reap_heartbeats_active_tasks(self):
+        action = Action(integration="terminal", action="execute", args={"command": "sleep 0.5"}, webhook="TERMINAL")
+        job_id = self.runner.submit(11, action)
+        self.runner.reap(stale_after=60)
+        self.assertEqual((self.task_mgr.touched, self.task_mgr.stale_checks), ([[11]], [60]))
+        self.wait_for(job_id)
+        self.runner.reap(stale_after=60)
+        self.assertEqual(self.task_mgr.touched[-1], [])
+
+    def test_shutdown_releases_queued_tasks(self):
+        runner = JobRunner(self.task_mgr, workers=1)
+        slow = Action(integration="terminal", action="execute", args={"command": "sleep 0.3"}, webhook="TERMINAL")
+        running = runner.submit(12, slow)
+        while runner.get(running)["status"] != RUNNING:
+            time.sleep(0.01)
+        queued = runner.submit(13, slow)
+        runner.shutdown(wait=False)
+        self.assertEqual(runner.get(queued)["status"], FAILED)
+        self.assertIn((13, FAILED, None), self.task_mgr.updates)
+        with self.assertRaises(RuntimeError):
+            runner.submit(14, slow)
+        self.assertEqual(runner.active_task_ids(), [12])
+
+    def test_stats(self):
+        stats = self.runner.stats()
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(self.runner.queue_depth(), 0)
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
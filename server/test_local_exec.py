@@ -0,0 +1,80 @@
+import time
+import threading
+import unittest
+import terminal
+from local_exec import LocalExecutor, limit_child, overlaps
+
+class TestLocalExecutor(unittest.TestCase):
+
+    def run_concurrently(self, executor, directories, seconds=0.1):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+        def work():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(seconds)
+            with lock:
+                active[0] -= 1
+            return {}
+        threads = [threading.Thread(target=executor.run, args=(d, work)) for d in directories]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return peak[0]
+
+    def test_global_cap(self):
+        executor = LocalExecutor(max_concurrency=2)
+        self.assertEqual(self.run_concurrently(executor, [f"/tmp/d{i}" for i in range(6)]), 2)
+        stats = executor.stats()
+        self.assertEqual(stats["completed"], 6)
+        self.assertGreater(stats["max_queue_ms"], 50)
+
+    def test_same_directory_is_serialized(self):
+        executor = LocalExecutor(max_concurrency=4)
+        self.assertEqual(self.run_concurrently(executor, ["/tmp/same", "/tmp/same/", "/tmp/same"]), 1)
+        self.assertEqual((executor._dirs_held, executor._dirs_waiting), ([], []))
+
+    def test_nested_directories_are_serialized(self):
+        executor = LocalExecutor(max_concurrency=4)
+        self.assertEqual(self.run_concurrently(executor, ["/tmp/ws", "/tmp/ws/src", "/tmp/ws/src/lib"]), 1)
+
+    def test_sibling_directories_run_concurrently(self):
+        executor = LocalExecutor(max_concurrency=4)
+        self.assertEqual(self.run_concurrently(executor, ["/tmp/ws/src", "/tmp/ws/srcs", "/tmp/ws/docs"]), 3)
+
+    def test_overlaps(self):
+        self.assertTrue(overlaps("/tmp/ws", "/tmp/ws/src"))
+        self.assertTrue(overlaps("/tmp/ws/src", "/tmp/ws"))
+        self.assertTrue(overlaps("/", "/tmp"))
+        self.assertFalse(overlaps("/tmp/ws/src", "/tmp/ws/srcs"))
+
+    def test_waiting_parent_is_not_starved(self):
+        # /tmp/ws arrives while /tmp/ws/a runs; /tmp/ws/b arrives later and must wait behind it
+        executor = LocalExecutor(max_concurrency=4)
+        order = []
+        def work(name):
+            order.append(name)
+            time.sleep(0.05)
+        threads = []
+        for directory in ("/tmp/ws/a", "/tmp/ws", "/tmp/ws/b"):
+            threads.append(threading.Thread(target=executor.run, args=(directory, work, directory)))
+            threads[-1].start()
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        self.assertEqual(order, ["/tmp/ws/a", "/tmp/ws", "/tmp/ws/b"])
+
+    def test_timing_added_to_results(self):
+        result = LocalExecutor().run(".", lambda: {"success": True})
+        self.assertEqual(set(result["timing"]), {"queue_ms", "run_ms"})
+
+    def test_rlimits_apply_to_commands(self):
+        result = terminal.execute("ulimit -t; ulimit -v", preexec_fn=limit_child)
+        cpu, memory = result["stdout"].split()
+        self.assertNotEqual(cpu, "unlimited")
+        self.assertNotEqual(memory, "unlimited")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import time
+import tempfile
+import unittest
+from plan import Plan, plan_errors, render, COMPLETED, FAILED, SKIPPED
+from registry import ActionRegistry, InvalidAction
+
+def step(id, command, depends_on=(), working_dir="."):
+    return {"id": id, "integration": "terminal", "action": "execute", "webhook": "TERMINAL",
+            "args": {"command": command, "working_dir": working_dir}, "depends_on": list(depends_on)}
+
+NOTION = {"integration": "notion", "action": "create", "args": {"page_name": "x", "page_content": "y"}, "webhook": "NOTION"}
+
+class TestPlanErrors(unittest.TestCase):
+
+    def test_single_action(self):
+        self.assertEqual(plan_errors(NOTION), [])
+        self.assertTrue(plan_errors({**NOTION, "action": "explode"}))
+
+    def test_valid_plan(self):
+        self.assertEqual(plan_errors({"steps": [step("a", "true"), step("b", "echo {{a.stdout}}", ["a"])]}), [])
+
+    def test_invalid_plans(self):
+        self.assertTrue(plan_errors({"steps": []}))
+        self.assertTrue(plan_errors({"steps": [step("a", "true"), step("a", "true")]}))
+        self.assertTrue(plan_errors({"steps": [step("a", "true", ["nope"])]}))
+        self.assertTrue(plan_errors({"steps": [step("a", "echo {{nope}}")]}))
+        self.assertTrue(plan_errors({"steps": [{**step("a", "true"), "action": "explode"}]}))
+        self.assertEqual(plan_errors({"steps": [step("a", "true", ["b"]), step("b", "true", ["a"])]}),
+                         ["steps depend on each other in a cycle"])
+
+    def test_templated_args_checked_by_declared_type(self):
+        registry = ActionRegistry([
+            {"integration": "x", "action": "count", "webhook": "X", "args": {"n": {"type": "integer"}}},
+        ])
+        plan = {"steps": [
+            {"id": "a", "integration": "x", "action": "count", "webhook": "X", "args": {"n": 1}},
+            {"id": "b", "integration": "x", "action": "count", "webhook": "X", "args": {"n": "{{a.n}}"}},
+        ]}
+        self.assertEqual(plan_errors(plan, registry), [])
+
+    def test_paths_cant_be_templated(self):
+        errors = plan_errors({"steps": [step("a", "pwd"), step("b", "ls", ["a"], working_dir="{{a.stdout}}")]})
+        self.assertEqual(errors, ["step b: working_dir can't refer to other steps' outputs"])
+        with self.assertRaises(ValueError):
+            render({"filepath": "{{a.path}}"}, {"a": {"path": "/etc/passwd"}}, "FILES")
+
+    def test_render(self):
+        outputs = {"a": {"items": [{"title": "one"}], "n": 2}}
+        args = {"whole": "{{a.n}}", "text": "first: {{ a.items.0.title }}", "raw": "{{a.items}}"}
+        self.assertEqual(render(args, outputs), {"whole": 2, "text": "first: one", "raw": [{"title": "one"}]})
+        with self.assertRaises(ValueError):
+            render({"x": "{{a.missing}}"}, outputs)
+
+class TestPlanRun(unittest.TestCase):
+
+    def test_single_action_round_trips(self):
+        plan = Plan.from_dict(NOTION)
+        self.assertEqual(plan.to_dict(), NOTION)
+        with self.assertRaises(InvalidAction):
+            Plan.from_dict({"steps": [step("a", "true", ["a"])]})
+
+    def test_independent_steps_run_concurrently(self):
+        with tempfile.TemporaryDirectory() as one, tempfile.TemporaryDirectory() as two:
+            plan = Plan.from_dict({"steps": [
+                step("a", "sleep 0.5; printf hello", working_dir=one),
+                step("b", "sleep 0.5; printf world", working_dir=two),
+                step("c", "echo {{a.stdout}} {{b.stdout}}", ["a", "b"]),
+            ]})
+            updates = []
+            start = time.perf_counter()
+            result = plan.call(progress=lambda fraction, details: updates.append(fraction))
+            elapsed = time.perf_counter() - start
+        self.assertTrue(result["success"], result)
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(result["steps"]["c"]["result"]["stdout"], "hello world\n")
+        self.assertEqual(updates[-1], 1.0)
+        self.assertEqual(updates, sorted(updates))
+
+    def test_failure_skips_dependents(self):
+        plan = Plan.from_dict({"steps": [step("a", "exit 3"), step("b", "echo never", ["a"])]})
+        result = plan.call()
+        self.assertFalse(result["success"])
+        self.assertEqual(result["steps"]["a"]["status"], FAILED)
+        self.assertEqual(result["steps"]["a"]["result"]["return_code"], 3)
+        self.assertEqual(result["steps"]["b"], {"status": SKIPPED})
+        self.assertIn("step a", result["error"])
+
+    def test_outputs_are_quoted_into_commands(self):
+        with tempfile.TemporaryDirectory() as home:
+            canary = os.path.join(home, "canary")
+            open(canary, "w").close()
+            plan = Plan.from_dict({"steps": [
+                step("a", f"printf '%s' 'hi; rm -rf ~; rm {canary}'"),
+                step("b", "echo {{a.stdout}}"),
+                step("c", "echo {{a}}"),
+            ]})
+            result = plan.call()
+            self.assertTrue(os.path.exists(canary))
+        self.assertTrue(result["success"], result)
+        self.assertEqual(result["steps"]["b"]["result"]["stdout"], f"hi; rm -rf ~; rm {canary}\n")
+        self.assertIn("rm -rf ~", result["steps"]["c"]["result"]["stdout"])
+
+    def test_depends_on_implied_by_templates(self):
+        plan = Plan.from_dict({"steps": [step("b", "echo {{a.return_code}}"), step("a", "echo first")]})
+        self.assertEqual(plan.steps[0].depends_on, ["a"])
+        result = plan.call()
+        self.assertEqual(result["steps"]["b"]["status"], COMPLETED)
+        self.assertEqual(result["steps"]["b"]["result"]["stdout"], "0\n")
+
+if __name__ == "__main__":
+    unittest.main()
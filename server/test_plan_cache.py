@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+from plan_cache import PlanCache, prune_periodically
+
+class FakeStore:
+    """In-memory stand-in for the plan_cache table"""
+    def __init__(self):
+        self.plans = {}
+        self.prunes = []
+
+    def get_cached_plan(self, key, max_age):
+        return self.plans.get(key)
+
+    def put_cached_plan(self, key, plan):
+        self.plans[key] = plan
+
+    def prune_cached_plans(self, max_age):
+        self.prunes.append(max_age)
+        if len(self.prunes) == 2:
+            raise Exception("connection lost")
+        return 0
+
+PLAN = {"integration": "email", "action": "draft", "args": {"subject": "Weekly status"}, "webhook": "EMAIL"}
+
+class TestPlanCache(unittest.TestCase):
+
+    def test_normalized_hit(self):
+        cache = PlanCache("instruction")
+        self.assertIsNone(cache.get("Draft weekly status email"))
+        cache.put("Draft weekly status email", PLAN)
+        self.assertEqual(cache.get("  draft WEEKLY status   email"), PLAN)
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_instruction_change_misses(self):
+        store = FakeStore()
+        PlanCache("v1", store=store).put("draft weekly status email", PLAN)
+        self.assertIsNone(PlanCache("v2", store=store).get("draft weekly status email"))
+
+    def test_store_tier_shared(self):
+        store = FakeStore()
+        PlanCache("v1", store=store).put("draft weekly status email", PLAN)
+        other_worker = PlanCache("v1", store=store)
+        self.assertEqual(other_worker.get("draft weekly status email"), PLAN)
+        self.assertEqual(other_worker.stats()["store_hits"], 1)
+
+    def test_returns_copies(self):
+        cache = PlanCache("instruction")
+        cache.put("task", PLAN)
+        cache.get("task")["args"]["subject"] = "changed"
+        self.assertEqual(cache.get("task")["args"]["subject"], "Weekly status")
+
+class TestPrune(unittest.TestCase):
+
+    def test_prunes_until_cancelled_despite_errors(self):
+        store = FakeStore()
+        async def main():
+            pruner = asyncio.create_task(prune_periodically(store, ttl=60, interval=0.01))
+            await asyncio.sleep(0.1)
+            pruner.cancel()
+        asyncio.run(main())
+        self.assertGreater(len(store.prunes), 2)
+        self.assertEqual(set(store.prunes), {60})
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
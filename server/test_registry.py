@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from action import Action
+from registry import REGISTRY, InvalidAction
+
+PLAN = {
+    "integration": "notion",
+    "action": "create",
+    "args": {"page_name": "Socrates", "page_content": "gadfly"},
+    "webhook": "NOTION",
+}
+
+class TestActionRegistry(unittest.TestCase):
+
+    def test_valid_plan(self):
+        self.assertEqual(REGISTRY.errors(PLAN), [])
+        self.assertIs(REGISTRY.resolve(PLAN), REGISTRY.get("notion", "create"))
+
+    def test_defaults_are_optional(self):
+        plan = {"integration": "sheets", "action": "create", "args": {"title": "Budget"}, "webhook": "SHEETS"}
+        self.assertEqual(REGISTRY.errors(plan), [])
+
+    def test_invalid_plans(self):
+        self.assertTrue(REGISTRY.errors([PLAN]))
+        self.assertTrue(REGISTRY.errors({**PLAN, "action": "explode"}))
+        self.assertTrue(REGISTRY.errors({**PLAN, "webhook": "EMAIL"}))
+        self.assertTrue(REGISTRY.errors({**PLAN, "args": {"page_name": "x"}}))
+        self.assertTrue(REGISTRY.errors({**PLAN, "args": {**PLAN["args"], "query": "x"}}))
+        self.assertTrue(REGISTRY.errors({**PLAN, "args": {**PLAN["args"], "page_name": 3}}))
+        missing = dict(PLAN)
+        del missing["args"]
+        self.assertEqual(REGISTRY.errors(missing), ["missing keys: args"])
+
+    def test_action_rejects_bad_plan_before_dispatch(self):
+        with mock.patch("webhook.webhook") as dispatch:
+            with self.assertRaises(InvalidAction):
+                Action(model_dump={**PLAN, "args": {"page_name": "x"}})
+            with self.assertRaises(InvalidAction):
+                Action(integration="notion", action="create", args={}, webhook="NOTION")
+            template = Action(integration="notion", action="create", args={}, webhook="NOTION", template=True)
+            with self.assertRaises(InvalidAction):
+                template.call_with_args({"page_name": "x"})
+            dispatch.assert_not_called()
+
+    def test_local_actions_dispatch_locally(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.txt")
+            action = Action(integration="file", action="modify", args={"filepath": path, "content": "hi"}, webhook="FILES")
+            self.assertTrue(action.call()["success"])
+            with open(path) as f:
+                self.assertEqual(f.read(), "hi")
+
+if __name__ == "__main__":
+    unittest.main()
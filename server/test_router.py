@@ -0,0 +1,59 @@
+import json
+import unittest
+from router import ToolRouter, build_instruction, estimate_tokens
+
+with open("actions.json") as f:
+    ACTIONS = json.load(f)
+
+class TestToolRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = ToolRouter(ACTIONS, top_k=2)
+
+    def integrations(self, query):
+        return {spec["integration"] for spec in self.router.route(query)}
+
+    def test_routes_to_relevant_integrations(self):
+        self.assertIn("sheets", self.integrations("make a budget spreadsheet"))
+        self.assertIn("gcal", self.integrations("schedule a meeting with sam tomorrow"))
+        self.assertIn("notion", self.integrations("write some notes about Socrates"))
+        self.assertIn("email", self.integrations("draft an email to my boss"))
+
+    def test_recall_on_realistic_requests(self):
+        # the right tool must always be offered; leaving everything in is fine when the router is unsure
+        requests = {
+            "Fix the typo in src/main.py": "file",
+            "set up a react app": "terminal",
+            "look up what Jane said about the launch": "email",
+            "reply to Tom about the invoice": "email",
+            "did Maria get back to me about the contract": "email",
+            "track my expenses for march": "sheets",
+            "start a new django project": "terminal",
+            "refactor the login handler": "file",
+            "clone the repo and install dependencies": "terminal",
+            "rename the variable foo to bar in utils.js": "file",
+            "find the notes from the design review": "notion",
+            "remind me to call mom on sunday": "gcal",
+            "what's on my calendar friday": "gcal",
+            "send the quarterly report to finance": "email",
+        }
+        for query, integration in requests.items():
+            self.assertIn(integration, self.integrations(query), query)
+
+    def test_close_call_offers_every_tool(self):
+        self.assertEqual(len(self.router.route("set up a react app")), len(ACTIONS))
+
+    def test_keeps_every_action_of_a_chosen_integration(self):
+        tools = self.router.route("schedule a meeting with sam tomorrow")
+        self.assertTrue({("gcal", "create"), ("gcal", "search")} <= {(t["integration"], t["action"]) for t in tools})
+
+    def test_no_match_falls_back_to_all_tools(self):
+        self.assertEqual(len(self.router.route("zzqx")), len(ACTIONS))
+
+    def test_routed_instruction_is_smaller(self):
+        full = estimate_tokens(build_instruction("", ACTIONS))
+        routed = estimate_tokens(build_instruction("", self.router.route("make a budget spreadsheet")))
+        self.assertLess(routed, full / 2)
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
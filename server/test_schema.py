@@ -0,0 +1,41 @@
+import json
+import unittest
+from schema import PlanError, compile_args, parse, response_schema
+
+with open("actions.json") as f:
+    ACTIONS = json.load(f)
+
+PLAN = {
+    "integration": "notion",
+    "action": "create",
+    "args": {"page_name": "Socrates", "page_content": "gadfly"},
+    "webhook": "NOTION",
+}
+
+class TestSchema(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse("```json\n" + json.dumps(PLAN) + "\n```"), PLAN)
+        self.assertEqual(parse(json.dumps(PLAN)), PLAN)
+        with self.assertRaises(PlanError):
+            parse("```json\n{\"integration\": ")
+        with self.assertRaises(PlanError):
+            parse("")
+
+    def test_compiled_args(self):
+        check = compile_args({"n": {"type": "integer"}, "name": {"type": "string", "default": "x"}})
+        self.assertEqual(check({"n": 3}), [])
+        self.assertEqual(check({"n": True}), ["arg n must be a integer"])
+        self.assertEqual(check({}), ["missing arg n"])
+        self.assertEqual(check({"n": 1, "other": 2}), ["unexpected arg other"])
+        self.assertEqual(check([]), ["args must be an object"])
+
+    def test_response_schema_enumerates_offered_tools(self):
+        gcal = [spec for spec in ACTIONS if spec["integration"] == "gcal"]
+        schema = response_schema(gcal)
+        self.assertEqual(schema["properties"]["integration"]["enum"], ["gcal"])
+        self.assertEqual(schema["properties"]["action"]["enum"], ["create", "search"])
+        self.assertIn("start_time", schema["properties"]["args"]["properties"])
+
+if __name__ == "__main__":
+    unittest.main()
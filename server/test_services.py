@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from unittest import mock
+from services import LazyService, ServiceUnavailable, timed_import, IMPORT_TIMES
+
+_sleep = asyncio.sleep
+
+async def no_backoff(seconds):
+    await _sleep(0)
+
+class Flaky:
+    """Factory that fails `failures` times before returning a value."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError(f"attempt {self.calls} failed")
+        return "value"
+
+class TestLazyService(unittest.TestCase):
+
+    def test_not_ready_until_built(self):
+        service = LazyService("svc", Flaky(0))
+        self.assertFalse(service.ready)
+        with self.assertRaisesRegex(ServiceUnavailable, "svc is still starting: not ready yet"):
+            service.wait(timeout=0)
+
+    def test_get_builds_once(self):
+        factory = Flaky(0)
+        service = LazyService("svc", factory)
+        async def get_twice():
+            return await service.get(), await service.get()
+        self.assertEqual(asyncio.run(get_twice()), ("value", "value"))
+        self.assertTrue(service.ready)
+        self.assertEqual(service.wait(timeout=0), "value")
+        self.assertEqual(factory.calls, 1)
+        status = service.status()
+        self.assertEqual((status["ready"], status["attempts"], status["error"]), (True, 1, None))
+        self.assertIsNotNone(status["build_ms"])
+
+    def test_retries_failures(self):
+        service = LazyService("svc", Flaky(2))
+        with mock.patch("asyncio.sleep", no_backoff):
+            self.assertEqual(asyncio.run(service.get()), "value")
+        self.assertEqual(service.attempts, 3)
+        self.assertIsNone(service.error)
+
+    def test_get_times_out_with_last_error(self):
+        async def get():
+            with mock.patch("asyncio.sleep", no_backoff):
+                return await service.get(timeout=0.05)
+        service = LazyService("svc", Flaky(10 ** 6))
+        with self.assertRaisesRegex(ServiceUnavailable, "svc is still starting: attempt \\d+ failed"):
+            asyncio.run(get())
+        self.assertFalse(service.ready)
+        self.assertGreater(service.status()["attempts"], 1)
+
+class TestTimedImport(unittest.TestCase):
+
+    def test_records_first_import(self):
+        IMPORT_TIMES.pop("json", None)
+        module = timed_import("json")
+        first = IMPORT_TIMES["json"]
+        self.assertEqual(module.__name__, "json")
+        timed_import("json")
+        self.assertEqual(IMPORT_TIMES["json"], first)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from similarity import PlanIndex, adapt
+
+EMAIL = {"integration": "email", "action": "draft", "args": {"subject": "Weekly status", "message": "..."}, "webhook": "EMAIL"}
+SEARCH = {"integration": "notion", "action": "search", "args": {"query": "notes about socrates"}, "webhook": "NOTION"}
+
+class TestPlanIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PlanIndex(threshold=0.9)
+        self.index.add(1, "Draft weekly status email", EMAIL)
+        self.index.add(2, "notes about socrates", SEARCH)
+        self.index.add(3, "schedule dentist appointment next tuesday", EMAIL)
+
+    def test_near_duplicate_reused(self):
+        self.assertEqual(self.index.best_match("draft weekly status email."), EMAIL)
+        self.assertEqual(self.index.stats()["hits"], 1)
+
+    def test_different_task_not_reused(self):
+        self.assertIsNone(self.index.best_match("notes about plato"))
+        self.assertIsNone(self.index.best_match("write an email to bob"))
+
+    def test_adapts_description_args(self):
+        plan = self.index.best_match("Notes about Socrates!")
+        self.assertEqual(plan["args"]["query"], "Notes about Socrates!")
+
+    def test_remove_and_description_change(self):
+        self.index.remove(1)
+        self.assertIsNone(self.index.best_match("draft weekly status email"))
+        self.index.description_changed(2, "notes about socrates")
+        self.assertEqual(len(self.index), 2)
+        self.index.description_changed(2, "notes about aristotle")
+        self.assertEqual(len(self.index), 1)
+
+    def test_ignores_tasks_without_action(self):
+        self.index.add(4, "empty action", {})
+        self.assertEqual(len(self.index), 3)
+
+    def test_near_misses_not_reused(self):
+        # a low threshold, so it's the details check that turns these down, not the score
+        index = PlanIndex(threshold=0.5)
+        setup = {"integration": "terminal", "action": "execute", "webhook": "TERMINAL",
+                 "args": {"command": "git init", "working_dir": "~/code/alpha"}}
+        email = {"integration": "email", "action": "draft", "webhook": "EMAIL",
+                 "args": {"subject": "Release notes", "message": "They go out Thursday."}}
+        summary = {"integration": "notion", "action": "create", "webhook": "NOTION",
+                   "args": {"page_name": "Meetings", "page_content": "..."}}
+        notes = {"integration": "notion", "action": "search", "webhook": "NOTION", "args": {"query": "meeting notes monday"}}
+        index.add(1, "set up project in ~/code/alpha", setup)
+        index.add(2, "email the team the release notes on Thursday", email)
+        index.add(3, "create a notion summary of my meetings on Monday", summary)
+        index.add(4, "find my meeting notes from monday", notes)
+        for description in ("set up project in ~/code/beta", "email the team the release notes on Friday",
+                            "create a notion summary of my meetings on Tuesday", "find my meeting notes from tuesday"):
+            self.assertGreaterEqual(index.search(description)[0][0], 0.5)
+            self.assertIsNone(index.best_match(description), description)
+        # same words, or a read-only action whose args don't mention the difference
+        self.assertEqual(index.best_match("Set up project in ~/code/alpha!"), setup)
+        self.assertEqual(index.best_match("please find my meeting notes from monday"), notes)
+
+    def test_adapt_copies(self):
+        adapted = adapt(SEARCH, "notes about socrates", "socrates notes")
+        self.assertEqual(adapted["args"]["query"], "socrates notes")
+        self.assertEqual(SEARCH["args"]["query"], "notes about socrates")
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,60 @@
+import json
+import unittest
+from stream_parse import ActionStreamParser
+
+PLAN = {
+    "integration": "notion",
+    "action": "create",
+    "args": {"page_name": "Socrates", "page_content": "Socrates was a \"gadfly\".\nHe wrote nothing é.", "tags": [1, 2.5, True, None]},
+    "webhook": "NOTION",
+}
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class TestActionStreamParser(unittest.TestCase):
+
+    def test_any_chunking_gives_the_full_plan(self):
+        text = "```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+        for size in (1, 3, 7, 64, len(text)):
+            parser = ActionStreamParser()
+            for chunk in chunks(text, size):
+                parser.feed(chunk)
+                parser.partial()
+            self.assertEqual(parser.result(), PLAN)
+
+    def test_header_known_before_args_finish(self):
+        plan = {"integration": "notion", "action": "create", "webhook": "NOTION", "args": {"page_content": "x" * 500}}
+        text = json.dumps(plan)
+        parser = ActionStreamParser()
+        parser.feed(text[:text.index("xxx") + 3])
+        self.assertEqual(parser.header(), {"integration": "notion", "action": "create", "webhook": "NOTION"})
+        partial = parser.partial()
+        self.assertEqual(partial["args"]["page_content"], "xxx")
+
+    def test_partial_is_always_valid_or_none(self):
+        text = json.dumps(PLAN)
+        parser = ActionStreamParser()
+        self.assertIsNone(parser.partial())
+        seen = []
+        for ch in text:
+            parser.feed(ch)
+            partial = parser.partial()
+            self.assertIsNotNone(partial)
+            seen.append(partial)
+        self.assertEqual(seen[-1], PLAN)
+        self.assertIn({"integration": "notion"}, seen)
+
+    def test_nested_strings_are_not_header_fields(self):
+        parser = ActionStreamParser()
+        parser.feed('{"args": {"integration": "sheets"}, "integration": "gcal"')
+        self.assertEqual(parser.fields, {"integration": "gcal"})
+
+    def test_incomplete_stream_raises(self):
+        parser = ActionStreamParser()
+        parser.feed('{"integration": "notion", "args": {')
+        with self.assertRaises(ValueError):
+            parser.result()
+
+if __name__ == "__main__":
+    unittest.main()
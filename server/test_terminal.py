@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from pathlib import Path
+import terminal
+from terminal import OutputBuffer
+
+class TestOutputBuffer(unittest.TestCase):
+
+    def test_keeps_tail_and_spills_everything(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            buffer = OutputBuffer("stdout", cap=10, spill_dir=Path(tmp))
+            for i in range(10):
+                buffer.write(f"line{i}\n".encode())
+            buffer.close()
+            self.assertEqual(bytes(buffer.tail), b"ne8\nline9\n")
+            self.assertEqual(buffer.total, 60)
+            self.assertEqual(buffer.spill_path.read_bytes(), b"".join(f"line{i}\n".encode() for i in range(10)))
+
+    def test_small_output_stays_in_memory(self):
+        buffer = OutputBuffer("stdout", cap=100)
+        buffer.write(b"hi")
+        buffer.close()
+        result = {}
+        buffer.describe(result)
+        self.assertEqual(result, {"stdout": "hi", "stdout_bytes": 2})
+
+class TestRunCommand(unittest.TestCase):
+
+    def test_success(self):
+        result = terminal.execute("echo out; echo err >&2; exit 3")
+        self.assertEqual((result["stdout"], result["stderr"], result["return_code"]), ("out\n", "err\n", 3))
+        self.assertFalse(result["success"])
+
+    def test_timeout_keeps_partial_output(self):
+        result = terminal.execute("echo started; sleep 5; echo never", timeout=0.5)
+        self.assertIn("timed out", result["error"])
+        self.assertEqual(result["stdout"], "started\n")
+        self.assertLess(result["duration"], 4)
+
+    def test_progress_heartbeats(self):
+        updates = []
+        async def run():
+            return await terminal.run_command("sleep 0.35", on_progress=lambda f, d: updates.append(f), heartbeat=0.1)
+        import asyncio
+        asyncio.run(run())
+        self.assertGreaterEqual(len(updates), 2)
+        self.assertEqual(updates, sorted(updates))
+
+if __name__ == "__main__":
+    unittest.main()
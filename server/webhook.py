@@ -1,6 +1,13 @@
 import os
+import time
+import random
+import breaker
 import requests
 import logging
+import http_clients
+import terminal
+import file_write
+from local_exec import LOCAL_EXECUTOR, limit_child
 import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
@@ -8,7 +15,16 @@ from dotenv import load_dotenv
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-LOCAL_WEBHOOKS = ["TERMINAL", "FILE"]
+LOCAL_WEBHOOKS = ["TERMINAL", "FILES"]
+
+# actions that read without side effects, so a failed call can safely be repeated
+IDEMPOTENT_ACTIONS = {"search"}
+# extra attempts for idempotent actions after a transient failure (connection error, timeout, 5xx, 429)
+WEBHOOK_RETRIES = int(os.getenv("WEBHOOK_RETRIES", "2"))
+# seconds; the backoff ceiling doubles per attempt up to WEBHOOK_BACKOFF_MAX
+WEBHOOK_BACKOFF = float(os.getenv("WEBHOOK_BACKOFF", "0.5"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "5"))
+RETRY_STATUSES = {429}
 
 def webhook(integration: str, action: str, args: dict, webhook: str):
     """
@@ -17,24 +33,63 @@ def webhook(integration: str, action: str, args: dict, webhook: str):
         action: the action to perform (i.e. create)
         args: the information for the webhook (i.e. {page_name: ..., page_content: ...})
         webhook: the env variable for the webhook (i.e. {NOTION_N8N_WEBHOOK})
+
+    Idempotent actions are retried on transient failures; a webhook whose circuit breaker is open
+    isn't called at all (see breaker.py).
     """
     if webhook in LOCAL_WEBHOOKS:
         return local_webhook(integration, action, args, webhook)
-    try:
-        payload = {
-            "integration": integration,
-            "action": action,
-            "args": args,
-        }
-        url = os.getenv(webhook)
-        response = requests.post(url, json=payload, timeout=30)
-        logging.info(payload)
-        logging.info(response)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"webhook error: {payload}: {e}")
+    payload = {
+        "integration": integration,
+        "action": action,
+        "args": args,
+    }
+    url = os.getenv(webhook)
+    if not url:
+        logging.error(f"webhook error: {payload}: {webhook} is not set")
         return None
+    circuit = breaker.get(webhook)
+    if not circuit.allow():
+        return circuit_open(webhook, circuit)
+
+    for attempt in range(attempts(integration, action)):
+        if attempt:
+            time.sleep(backoff(attempt))
+        try:
+            response = http_clients.session().post(url, json=payload, timeout=http_clients.timeout_for(webhook))
+            logging.info(payload)
+            logging.info(response)
+            response.raise_for_status()
+            result = response.json()
+        except requests.exceptions.RequestException as e:
+            error = e
+            if transient(e):
+                continue
+            circuit.record_success()  # the endpoint is up; it rejected this request
+            break
+        circuit.record_success()
+        return result
+    else:
+        circuit.record_failure()
+    logging.error(f"webhook error: {payload}: {error}")
+    return None
+
+def attempts(integration: str, action: str) -> int:
+    """Only actions that are safe to repeat get retried."""
+    return 1 + WEBHOOK_RETRIES if action in IDEMPOTENT_ACTIONS else 1
+
+def transient(e: requests.exceptions.RequestException) -> bool:
+    """Failures worth another attempt (and that count against the circuit): no answer, 5xx or 429."""
+    status = e.response.status_code if e.response is not None else None
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or status in RETRY_STATUSES or (status or 0) >= 500
+
+def backoff(attempt: int) -> float:
+    """Full jitter: uniform in [0, base * 2^(attempt - 1)], capped."""
+    return random.uniform(0, min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF * 2 ** (attempt - 1)))
+
+def circuit_open(webhook: str, circuit) -> dict:
+    logging.warning(f"not dispatching to {webhook}: circuit open for another {circuit.retry_in():.0f}s")
+    return {"error": f"{webhook} is unavailable (circuit open), retry in {circuit.retry_in():.0f}s"}
 
 def local_webhook(integration: str, action: str, args: dict, webhook: str):
     """
@@ -60,28 +115,14 @@ def process_file(action: str, args: dict):
     """
     if action == "modify":
         filepath = args.get("filepath")
-        content = args.get("content", "")
+        content = args.get("content")
+        patch = args.get("patch")
         
         if not filepath:
             return {"error": "filepath is required"}
         
-        try:
-            # Create parent directories if they don't exist
-            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write content to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            logging.info(f"Successfully wrote {len(content)} characters to {filepath}")
-            return {
-                "success": True,
-                "filepath": filepath,
-                "message": f"File {filepath} created/modified successfully"
-            }
-            
-        except Exception as e:
-            return {"error": f"Failed to write file {filepath}: {str(e)}"}
+        # one writer per directory at a time, under the local concurrency cap
+        return LOCAL_EXECUTOR.run(str(Path(filepath).parent), file_write.modify, filepath, content, patch)
     
     elif action == "open":
         filepath = args.get("filepath")
@@ -111,9 +152,10 @@ def process_file(action: str, args: dict):
     else:
         return {"error": f"Unknown file action: {action}"}
 
-def process_terminal(action: str, args: dict):
+def process_terminal(action: str, args: dict, progress=None):
     """
-    Handle terminal command execution
+    Handle terminal command execution. Output is streamed (see terminal.py); `progress` is called
+    with (fraction, details) every few seconds while the command runs
     """
     if action == "execute":
         command = args.get("command")
@@ -131,47 +173,25 @@ def process_terminal(action: str, args: dict):
                 return {"error": f"Failed to create working directory {working_dir}: {str(e)}"}
         
         try:
-            # Execute the command
-            result = subprocess.run(
-                command,
-                shell=True,
-                cwd=working_dir,
-                capture_output=True,
-                text=True,
-                timeout=60  # 60 second timeout
+            response = LOCAL_EXECUTOR.run(
+                working_dir, terminal.execute, command, working_dir, on_progress=progress, preexec_fn=limit_child
             )
-            
-            success = result.returncode == 0
-            
-            response = {
-                "success": success,
-                "command": command,
-                "working_dir": working_dir,
-                "return_code": result.returncode,
-                "stdout": result.stdout,
-                "stderr": result.stderr
-            }
-            
-            if success:
-                logging.info(f"Command executed successfully: {command}")
-            else:
-                logging.warning(f"Command failed with return code {result.returncode}: {command}")
-                logging.warning(f"stderr: {result.stderr}")
-            
-            return response
-            
-        except subprocess.TimeoutExpired:
-            return {
-                "error": "Command timed out after 60 seconds",
-                "command": command,
-                "working_dir": working_dir
-            }
         except Exception as e:
             return {
                 "error": f"Failed to execute command: {str(e)}",
                 "command": command,
                 "working_dir": working_dir
             }
+
+        if "error" in response:
+            logging.warning(f"{response['error']}: {command} (kept {response['stdout_bytes']} bytes of stdout)")
+        elif response["success"]:
+            logging.info(f"Command executed successfully: {command}")
+        else:
+            logging.warning(f"Command failed with return code {response['return_code']}: {command}")
+            logging.warning(f"stderr: {response['stderr']}")
+
+        return response
     
     else:
         return {"error": f"Unknown terminal action: {action}"}
@@ -1,7 +1,7 @@
 export interface Task {
   id: number;
   description: string;
-  action: object;
+  action?: object;
   status: string;
   progress: number;
   created_at: string;
@@ -14,7 +14,26 @@ export interface TaskRequest {
   progress: number;
 }
 
+export interface TaskEvent {
+  op: 'INSERT' | 'UPDATE' | 'DELETE' | 'RESYNC';
+  task?: Partial<Task> & { id: number };
+  truncated?: boolean;
+}
+
+export interface BatchOutcome {
+  index: number;
+  ok: boolean;
+  id?: number;
+  error?: string;
+}
+
+export interface TaskPage {
+  tasks: Task[];
+  nextCursor: string | null;
+}
+
 export interface ApiResponse<T> {
   status_code: number;
   content: T;
+  next_cursor?: string | null;
 }
\ No newline at end of file